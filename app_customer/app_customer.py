@@ -1,11 +1,25 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from routes.customer_routes import router as customer_router
 from routes.auth_routes import router as auth_router 
-from database import Base, engine
+from database import Base, engine, upgrade_schema
+from services.customer_service import load_username_filter, open_missing_ledgers, start_wallet_snapshotter
+from services.idempotency_service import start_idempotency_purger
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    stop_snapshotter = start_wallet_snapshotter()
+    stop_purger = start_idempotency_purger()
+    yield
+    stop_snapshotter.set()
+    stop_purger.set()
+
+app = FastAPI(lifespan=lifespan)
 
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
+open_missing_ledgers(engine)
+load_username_filter(engine)
 
 app.include_router(customer_router, prefix="/api")
 app.include_router(auth_router, prefix="/auth")
@@ -13,4 +27,3 @@ app.include_router(auth_router, prefix="/auth")
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app_customer:app", host="127.0.0.1", port=8000, reload=True)
-
@@ -1,11 +1,21 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from database import Base, engine
+from database import Base, engine, upgrade_schema
 from routes.inventory_routes import router as inventory_router
+from services.inventory_service import create_search_index, start_reservation_sweeper
 from routes.auth_routes import router as auth_router 
 
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
+create_search_index(engine)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    stop_sweeper = start_reservation_sweeper()
+    yield
+    stop_sweeper.set()
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(inventory_router, prefix="/api", tags=["Inventory"])
 app.include_router(auth_router, prefix="/auth")
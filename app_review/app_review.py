@@ -1,9 +1,12 @@
 from fastapi import FastAPI
-from database import Base, engine
+from database import Base, engine, upgrade_schema
 from routes.review_routes import router as review_router
 from routes.auth_routes import router as auth_router 
+from services.review_service import backfill_rating_stats
 
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
+backfill_rating_stats(engine)
 
 app = FastAPI()
 
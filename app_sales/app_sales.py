@@ -1,11 +1,22 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from routes.sales_routes import router as sales_router
-from database import Base, engine
+from database import Base, engine, upgrade_schema
 from routes.auth_routes import router as auth_router 
+from services.idempotency_service import start_idempotency_purger
+from services.sales_service import load_sales_leaderboard
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    stop_purger = start_idempotency_purger()
+    yield
+    stop_purger.set()
+
+app = FastAPI(lifespan=lifespan)
 
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
+load_sales_leaderboard(engine)
 
 app.include_router(sales_router, prefix="/api", tags=["Sales"])
 app.include_router(auth_router, prefix="/auth")
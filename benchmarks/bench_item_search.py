@@ -0,0 +1,117 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+"""
+Item Search Benchmark
+=====================
+
+Measures full-text item search against a throwaway SQLite database.
+
+The benchmark bulk-loads a synthetic catalog (1M items by default) through the
+FTS5 sync triggers, then times ranked search queries for single words, word
+pairs and deep pages reached through the keyset cursor.
+
+Usage
+-----
+
+    python benchmarks/bench_item_search.py --items 1000000 --queries 200
+"""
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models.inventory import Item
+from services.inventory_service import InventoryService, create_search_index
+
+ADJECTIVES = ["wireless", "ergonomic", "compact", "portable", "premium", "classic", "smart", "rugged", "slim", "quiet"]
+NOUNS = ["mouse", "keyboard", "monitor", "headset", "speaker", "charger", "cable", "camera", "router", "lamp"]
+CATEGORIES = ["Electronics", "Accessories", "Office", "Audio", "Lighting", "Networking"]
+FILLER = ["with", "usb", "bluetooth", "battery", "aluminium", "warranty", "black", "white", "fast", "durable"]
+
+
+def load_catalog(engine, count: int, chunk_size: int = 50_000):
+    """
+    Inserts `count` synthetic items in chunks.
+    """
+    rng = random.Random(42)
+    insert = text(
+        "INSERT INTO items (name, category, price, description, stock_count) "
+        "VALUES (:name, :category, :price, :description, :stock_count)"
+    )
+    for start in range(0, count, chunk_size):
+        rows = [
+            {
+                "name": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}",
+                "category": rng.choice(CATEGORIES),
+                "price": round(rng.uniform(1, 1000), 2),
+                "description": " ".join(rng.choices(FILLER, k=8)),
+                "stock_count": rng.randint(0, 100),
+            }
+            for i in range(start, min(start + chunk_size, count))
+        ]
+        with engine.begin() as connection:
+            connection.execute(insert, rows)
+
+
+def time_queries(session, service, queries, pages: int):
+    """
+    Runs every query, following the cursor for `pages` pages, and returns per-page latencies in milliseconds.
+    """
+    search = service.search_items.__wrapped__
+    latencies = []
+    for query in queries:
+        cursor = None
+        for _ in range(pages):
+            start = time.perf_counter()
+            _, cursor = search(service, session, query, limit=20, cursor=cursor)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not cursor:
+                break
+    return sorted(latencies)
+
+
+def report(label: str, latencies):
+    """
+    Prints latency percentiles.
+    """
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+    print(f"{label:<24} n={len(latencies):<6} p50={percentile(0.5):8.2f}ms p95={percentile(0.95):8.2f}ms p99={percentile(0.99):8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full-text item search.")
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(bind=engine, tables=[Item.__table__])
+        create_search_index(engine)
+
+        start = time.perf_counter()
+        load_catalog(engine, args.items)
+        elapsed = time.perf_counter() - start
+        print(f"Loaded {args.items} items in {elapsed:.1f}s ({args.items / elapsed:,.0f} rows/s, FTS triggers included)")
+
+        rng = random.Random(7)
+        session = sessionmaker(bind=engine)()
+        service = InventoryService()
+        single = [rng.choice(ADJECTIVES + NOUNS) for _ in range(args.queries)]
+        pairs = [f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}" for _ in range(args.queries)]
+        report("single word, page 1", time_queries(session, service, single, pages=1))
+        report("word pair, page 1", time_queries(session, service, pairs, pages=1))
+        report("word pair, pages 1-10", time_queries(session, service, pairs[: max(1, args.queries // 10)], pages=10))
+        session.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+"""
+Moderation Queue Benchmark
+==========================
+
+Measures reviews moderated per second through the leased moderation queue
+against a throwaway SQLite database, with several moderator threads each
+claiming a batch, deciding and completing it in a loop.
+
+The queue is pre-filled with `--pending` reviews (1M by default) so the
+claim cost can be compared across queue sizes; each claim only reads the
+first `--batch` entries of the moderation queue index. A slice of the
+reviews is given an already expired lease, as if a moderator had walked
+away. Afterwards the benchmark checks that no review was moderated twice.
+
+Usage
+-----
+
+    python benchmarks/bench_moderation_queue.py --pending 1000000 --moderators 5 --batch 20
+"""
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine, event, func, text
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models.customer import Customer
+from models.review import ProductRatingStats, Review
+from services.review_service import ReviewService
+
+START = datetime(2025, 1, 1)
+
+
+def load_reviews(engine, count: int, expired: float, chunk_size: int = 100_000):
+    """
+    Inserts `count` pending reviews in submission order, an `expired` fraction of them under an expired lease.
+    """
+    rng = random.Random(42)
+    insert = text(
+        "INSERT INTO reviews (product_id, customer_id, rating, comment, moderation_status, available_at, lease_id) "
+        "VALUES (:product_id, :customer_id, :rating, :comment, 'Pending', :available_at, :lease_id)"
+    )
+    for start in range(0, count, chunk_size):
+        rows = []
+        for i in range(start, min(start + chunk_size, count)):
+            leased = rng.random() < expired
+            rows.append({
+                "product_id": rng.randrange(10_000),
+                "customer_id": rng.randrange(100_000),
+                "rating": rng.randint(1, 5),
+                "comment": "Works as described.",
+                "available_at": (START + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S.%f"),
+                "lease_id": "abandoned" if leased else None,
+            })
+        with engine.begin() as connection:
+            connection.execute(insert, rows)
+
+
+def unwrap(method):
+    """
+    Returns a method without its profiling wrapper, if any.
+    """
+    return getattr(method, "__wrapped__", method)
+
+
+def run(session_factory, moderators: int, batches: int, batch_size: int):
+    """
+    Runs the moderators and returns the moderated review IDs and claim timings.
+    """
+    service = ReviewService()
+    claim = unwrap(ReviewService.claim_reviews)
+    complete = unwrap(ReviewService.complete_reviews)
+    moderated = []
+    claim_timings = []
+    lock = threading.Lock()
+
+    def moderator(seed_value):
+        rng = random.Random(seed_value)
+        db = session_factory()
+        local_ids, local_timings = [], []
+        for _ in range(batches):
+            start = time.perf_counter()
+            lease = claim(service, db, batch_size, 60)
+            local_timings.append(time.perf_counter() - start)
+            decisions = [
+                {"review_id": review["id"], "status": "Approved" if rng.random() < 0.8 else "Rejected"}
+                for review in lease["reviews"]
+            ]
+            result = complete(service, db, lease["lease_id"], decisions)
+            local_ids.extend(result["completed"])
+        db.close()
+        with lock:
+            moderated.extend(local_ids)
+            claim_timings.extend(local_timings)
+
+    threads = [threading.Thread(target=moderator, args=(i,)) for i in range(moderators)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return moderated, claim_timings, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the leased moderation queue.")
+    parser.add_argument("--pending", type=int, default=1_000_000)
+    parser.add_argument("--expired", type=float, default=0.01, help="Fraction of reviews under an expired lease.")
+    parser.add_argument("--moderators", type=int, default=5)
+    parser.add_argument("--batches", type=int, default=200, help="Claims per moderator.")
+    parser.add_argument("--batch", type=int, default=20, help="Reviews per claim.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(directory, 'bench.db')}",
+            connect_args={"check_same_thread": False, "timeout": 60},
+            pool_size=args.moderators,
+        )
+
+        @event.listens_for(engine, "connect")
+        def set_wal(connection, _):
+            connection.execute("PRAGMA journal_mode=WAL")
+
+        Base.metadata.create_all(bind=engine, tables=[Customer.__table__, Review.__table__, ProductRatingStats.__table__])
+        start = time.perf_counter()
+        load_reviews(engine, args.pending, args.expired)
+        print(f"Loaded {args.pending} pending reviews in {time.perf_counter() - start:.1f}s")
+
+        with engine.connect() as connection:
+            plan = connection.execute(text(
+                "EXPLAIN QUERY PLAN SELECT id FROM reviews WHERE moderation_status = 'Pending' "
+                "AND available_at <= :now ORDER BY available_at, id LIMIT 20"
+            ), {"now": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")}).all()
+        print("claim plan: " + "; ".join(row[-1] for row in plan))
+
+        session_factory = sessionmaker(bind=engine)
+        moderated, timings, elapsed = run(session_factory, args.moderators, args.batches, args.batch)
+        timings.sort()
+        print(f"moderators={args.moderators} batch={args.batch} moderated={len(moderated)} "
+              f"throughput={len(moderated) / elapsed:,.0f} reviews/s")
+        print(f"claim latency p50={timings[len(timings) // 2] * 1000:.2f}ms "
+              f"p99={timings[int(len(timings) * 0.99)] * 1000:.2f}ms")
+
+        db = session_factory()
+        done = db.query(func.count(Review.id)).filter(Review.moderation_status != "Pending").scalar()
+        approved = db.query(func.sum(ProductRatingStats.rating_count)).scalar() or 0
+        db.close()
+        print(f"unique moderated={len(set(moderated))} rows moderated={done} approved in stats={approved}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+"""
+Purchase Benchmark
+==================
+
+Measures purchases per second through `SalesService.purchase` against a
+throwaway SQLite database shared by the sales, inventory and customer tables.
+
+The default mode runs every purchase as one local transaction (stock
+decrement, wallet debit and sale insert). `--orchestrated` runs the same
+workload the way clients had to before, as three separately committed steps
+(deduct the stock, deduct the wallet, record the sale), for comparison. Both
+modes check afterwards that no stock or money went missing.
+
+Usage
+-----
+
+    python benchmarks/bench_purchase.py --threads 8 --purchases 500
+"""
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models.customer import Customer, WalletLedgerEntry
+from models.inventory import Item, StockReservation, CatalogVersion, ItemChange
+from models.sales import Sale
+from services.sales_service import SalesService
+
+TABLES = [
+    Customer.__table__, WalletLedgerEntry.__table__, Item.__table__, StockReservation.__table__,
+    CatalogVersion.__table__, ItemChange.__table__, Sale.__table__,
+]
+
+
+def unwrap(method):
+    """
+    Returns a method without its profiling wrapper, if any.
+    """
+    return getattr(method, "__wrapped__", method)
+
+
+def orchestrated_purchase(service, db, username, item_id, quantity):
+    """
+    The previous client-orchestrated flow: three calls, each committed on its own.
+    """
+    item = service.inventory_service.take_stock(db, item_id, quantity)
+    if item is None:
+        db.rollback()
+        raise ValueError("Insufficient stock available")
+    db.commit()
+    amount_cents = round(item.price * 100) * quantity
+    customer = service.customer_service.update_wallet(db, username, -amount_cents, "deduct")
+    if customer is None:
+        db.rollback()
+        raise ValueError("Insufficient funds")
+    db.commit()
+    unwrap(SalesService.create_sale)(service, db, {
+        "customer_id": customer["id"], "item_id": item_id, "amount": amount_cents / 100, "quantity": quantity,
+    })
+
+
+def seed(session_factory, customers: int, items: int):
+    """
+    Inserts customers with large wallets and items with large stock counts.
+    """
+    db = session_factory()
+    db.bulk_insert_mappings(Customer, [
+        {
+            "full_name": f"Buyer {i}", "username": f"buyer{i}", "password": "x", "age": 30,
+            "address": "-", "gender": "-", "marital_status": "-", "wallet_balance": 1_000_000.0,
+        }
+        for i in range(customers)
+    ])
+    db.bulk_insert_mappings(Item, [
+        {"name": f"Item {i}", "category": "Bench", "price": 9.99, "description": "", "stock_count": 1_000_000}
+        for i in range(items)
+    ])
+    db.commit()
+    db.close()
+
+
+def run(session_factory, threads: int, purchases: int, customers: int, items: int, orchestrated: bool):
+    """
+    Runs the workload and returns the counters.
+    """
+    service = SalesService()
+    purchase = unwrap(SalesService.purchase)
+    counters = {"completed": 0, "failed": 0}
+    lock = threading.Lock()
+
+    def worker(seed_value):
+        rng = random.Random(seed_value)
+        db = session_factory()
+        local = dict.fromkeys(counters, 0)
+        for _ in range(purchases):
+            username = f"buyer{rng.randrange(customers)}"
+            item_id = rng.randrange(items) + 1
+            try:
+                if orchestrated:
+                    orchestrated_purchase(service, db, username, item_id, 1)
+                else:
+                    purchase(service, db, username, item_id, 1)
+                local["completed"] += 1
+            except Exception:
+                db.rollback()
+                local["failed"] += 1
+        db.close()
+        with lock:
+            for key, value in local.items():
+                counters[key] += value
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    counters["elapsed"] = time.perf_counter() - start
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end purchases.")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--purchases", type=int, default=500, help="Purchases per thread.")
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--orchestrated", action="store_true", help="Commit each step separately.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(directory, 'bench.db')}",
+            connect_args={"check_same_thread": False, "timeout": 60},
+            pool_size=args.threads,
+        )
+
+        @event.listens_for(engine, "connect")
+        def set_wal(connection, _):
+            connection.execute("PRAGMA journal_mode=WAL")
+
+        Base.metadata.create_all(bind=engine, tables=TABLES)
+        session_factory = sessionmaker(bind=engine)
+        seed(session_factory, args.customers, args.items)
+
+        counters = run(session_factory, args.threads, args.purchases, args.customers, args.items, args.orchestrated)
+
+        db = session_factory()
+        sold = db.query(func.count(Sale.id)).scalar()
+        stock_taken = args.items * 1_000_000 - db.query(func.sum(Item.stock_count)).scalar()
+        spent = round(args.customers * 1_000_000 - db.query(func.sum(Customer.wallet_balance)).scalar(), 2)
+        revenue = round(db.query(func.sum(Sale.amount)).scalar() or 0, 2)
+        db.close()
+        print(f"mode={'orchestrated' if args.orchestrated else 'single transaction'} threads={args.threads}")
+        print(f"purchases={counters['completed']} failed={counters['failed']} "
+              f"throughput={counters['completed'] / counters['elapsed']:,.0f} purchases/s")
+        print(f"sales={sold} stock taken={stock_taken} wallet debits={spent:.2f} sales revenue={revenue:.2f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
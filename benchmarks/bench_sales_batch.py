@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+"""
+Sales Batch Ingestion Benchmark
+===============================
+
+Measures sales recorded per second through the API against a throwaway
+SQLite database: one `POST /api/sales` per sale, as the POS sync does today,
+versus `POST /api/sales/batch` with a JSON array or an NDJSON body.
+
+Requests go through the FastAPI test client, so every call pays routing,
+authentication and (de)serialization the way a real client would, minus the
+network.
+
+Usage
+-----
+
+    python benchmarks/bench_sales_batch.py --sales 20000 --batch-size 1000
+"""
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from decouple import config
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from database import Base, get_db
+from models.sales import Sale, SalesItemDaily, SalesCustomerDaily
+from routes.sales_routes import router
+
+HEADERS = {"Authorization": f"Bearer {config('ADMIN_TOKEN')}"}
+
+
+def make_sales(count: int, customers: int, items: int):
+    """
+    Returns `count` synthetic sales in the `POST /api/sales` format.
+    """
+    rng = random.Random(42)
+    return [
+        {
+            "customer_id": rng.randrange(customers) + 1,
+            "item_id": rng.randrange(items) + 1,
+            "amount": round(rng.uniform(1, 200), 2),
+            "quantity": rng.randint(1, 3),
+        }
+        for _ in range(count)
+    ]
+
+
+def per_row(client, sales, batch_size):
+    for sale in sales:
+        assert client.post("/api/sales", json=sale, headers=HEADERS).status_code == 200
+
+
+def json_batches(client, sales, batch_size):
+    for start in range(0, len(sales), batch_size):
+        response = client.post("/api/sales/batch", json=sales[start:start + batch_size], headers=HEADERS)
+        assert response.json()["failed"] == 0
+
+
+def ndjson_batches(client, sales, batch_size):
+    headers = {**HEADERS, "Content-Type": "application/x-ndjson"}
+    for start in range(0, len(sales), batch_size):
+        body = "\n".join(json.dumps(sale) for sale in sales[start:start + batch_size])
+        response = client.post("/api/sales/batch", content=body, headers=headers)
+        assert response.json()["failed"] == 0
+
+
+MODES = {"per-row": per_row, "json-batch": json_batches, "ndjson-batch": ndjson_batches}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched sale ingestion.")
+    parser.add_argument("--sales", type=int, default=20_000)
+    parser.add_argument("--per-row-sales", type=int, default=2_000, help="Sales sent one by one (slower mode).")
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    parser.add_argument("--customers", type=int, default=1_000)
+    parser.add_argument("--items", type=int, default=1_000)
+    args = parser.parse_args()
+
+    for mode, send in MODES.items():
+        count = args.per_row_sales if mode == "per-row" else args.sales
+        sales = make_sales(count, args.customers, args.items)
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine(
+                f"sqlite:///{os.path.join(directory, 'bench.db')}", connect_args={"check_same_thread": False},
+            )
+            Base.metadata.create_all(
+                bind=engine, tables=[Sale.__table__, SalesItemDaily.__table__, SalesCustomerDaily.__table__],
+            )
+            session_factory = sessionmaker(bind=engine)
+
+            def override_get_db():
+                db = session_factory()
+                try:
+                    yield db
+                finally:
+                    db.close()
+
+            app = FastAPI()
+            app.include_router(router, prefix="/api")
+            app.dependency_overrides[get_db] = override_get_db
+            with TestClient(app) as client:
+                start = time.perf_counter()
+                send(client, sales, args.batch_size)
+                elapsed = time.perf_counter() - start
+
+            db = session_factory()
+            recorded = db.query(func.count(Sale.id)).scalar()
+            rolled_up = db.query(func.sum(SalesItemDaily.sales)).scalar()
+            db.close()
+            engine.dispose()
+        print(f"{mode:<13} sales={recorded:<7} rolled up={rolled_up:<7} "
+              f"elapsed={elapsed:6.2f}s throughput={count / elapsed:9,.0f} sales/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+"""
+Sales Statistics Benchmark
+==========================
+
+Measures `SalesService.get_sales_stats` against a throwaway SQLite database.
+
+The benchmark bulk-loads synthetic sales (10M by default) spread over one
+year, then times every grouping over the whole year and over the last 30
+days, which the index on `created_at` narrows down.
+
+Usage
+-----
+
+    python benchmarks/bench_sales_stats.py --sales 10000000 --repeat 3
+"""
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models.sales import Sale
+from services.sales_service import SalesService, STATS_GROUPS
+
+START = datetime(2025, 1, 1)
+
+
+def load_sales(engine, count: int, customers: int, items: int, chunk_size: int = 100_000):
+    """
+    Inserts `count` synthetic sales in chunks, in time order.
+    """
+    rng = random.Random(42)
+    insert = text(
+        "INSERT INTO sales (customer_id, item_id, amount, quantity, created_at) "
+        "VALUES (:customer_id, :item_id, :amount, :quantity, :created_at)"
+    )
+    step = 365 * 86400 / count
+    for start in range(0, count, chunk_size):
+        rows = []
+        for i in range(start, min(start + chunk_size, count)):
+            quantity = rng.randint(1, 3)
+            rows.append({
+                "customer_id": rng.randrange(customers),
+                "item_id": rng.randrange(items),
+                "amount": round(rng.uniform(1, 200), 2) * quantity,
+                "quantity": quantity,
+                "created_at": (START + timedelta(seconds=i * step)).strftime("%Y-%m-%d %H:%M:%S.%f"),
+            })
+        with engine.begin() as connection:
+            connection.execute(insert, rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SQL-side sales statistics.")
+    parser.add_argument("--sales", type=int, default=10_000_000)
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(bind=engine, tables=[Sale.__table__])
+
+        start = time.perf_counter()
+        load_sales(engine, args.sales, args.customers, args.items)
+        elapsed = time.perf_counter() - start
+        print(f"Loaded {args.sales} sales in {elapsed:.1f}s ({args.sales / elapsed:,.0f} rows/s, index included)")
+
+        session = sessionmaker(bind=engine)()
+        service = SalesService()
+        stats = getattr(SalesService.get_sales_stats, "__wrapped__", SalesService.get_sales_stats)
+        ranges = {
+            "full year": (None, None),
+            "last 30 days": (START + timedelta(days=335), START + timedelta(days=365)),
+        }
+        for label, (range_start, range_end) in ranges.items():
+            for group_by in STATS_GROUPS:
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    rows = stats(service, session, group_by, range_start, range_end, limit=1000)
+                    timings.append(time.perf_counter() - start)
+                print(f"{label:<13} group_by={group_by:<9} groups={len(rows):<5} best={min(timings) * 1000:9.1f}ms")
+        session.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
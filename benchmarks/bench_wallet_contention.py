@@ -0,0 +1,125 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+"""
+Wallet Contention Benchmark
+===========================
+
+Hammers a single customer's wallet from many threads and checks that no
+update is lost.
+
+Every thread alternates charges and deductions of the same amount through
+`CustomerService`, so the final balance must equal the starting balance plus
+the total charged minus the deductions that succeeded. The `--naive` flag runs
+the same workload with the old load-modify-commit implementation for
+comparison; with the customer version column in place its conflicting commits
+fail (counted as errors) instead of silently overwriting each other.
+
+Usage
+-----
+
+    python benchmarks/bench_wallet_contention.py --threads 16 --operations 500
+"""
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models.customer import Customer
+from services.customer_service import CustomerService
+
+
+def naive_charge(db, username, amount):
+    """
+    The previous read-modify-write implementation of a wallet update.
+    """
+    customer = db.query(Customer).filter(Customer.username == username).first()
+    customer.wallet_balance += amount
+    db.commit()
+
+
+def run(session_factory, threads: int, operations: int, naive: bool):
+    """
+    Runs the workload and returns the counters.
+    """
+    service = CustomerService()
+    charge = service.charge_wallet.__wrapped__
+    deduct = service.deduct_wallet.__wrapped__
+    counters = {"charged": 0, "deducted": 0, "refused": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def worker():
+        db = session_factory()
+        local = dict.fromkeys(counters, 0)
+        for i in range(operations):
+            try:
+                if naive:
+                    naive_charge(db, "bench", 1 if i % 2 == 0 else -1)
+                    local["charged" if i % 2 == 0 else "deducted"] += 1
+                elif i % 2 == 0:
+                    charge(service, db, "bench", 1)
+                    local["charged"] += 1
+                else:
+                    deduct(service, db, "bench", 1)
+                    local["deducted"] += 1
+            except ValueError:
+                local["refused"] += 1
+            except Exception:
+                db.rollback()
+                local["errors"] += 1
+        db.close()
+        with lock:
+            for key, value in local.items():
+                counters[key] += value
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    counters["elapsed"] = time.perf_counter() - start
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent wallet updates.")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--operations", type=int, default=500, help="Operations per thread.")
+    parser.add_argument("--naive", action="store_true", help="Use the old read-modify-write updates.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(directory, 'bench.db')}",
+            connect_args={"check_same_thread": False, "timeout": 60},
+            pool_size=args.threads,
+        )
+        Base.metadata.create_all(bind=engine, tables=[Customer.__table__])
+        session_factory = sessionmaker(bind=engine)
+        db = session_factory()
+        db.add(Customer(
+            full_name="Bench", username="bench", password="x", age=30, address="-",
+            gender="-", marital_status="-", wallet_balance=0.0,
+        ))
+        db.commit()
+
+        counters = run(session_factory, args.threads, args.operations, args.naive)
+
+        balance = db.query(Customer.wallet_balance).filter(Customer.username == "bench").scalar()
+        expected = counters["charged"] - counters["deducted"]
+        total = counters["charged"] + counters["deducted"] + counters["refused"]
+        print(f"mode={'naive' if args.naive else 'atomic'} threads={args.threads} operations={total}")
+        print(f"throughput={total / counters['elapsed']:,.0f} ops/s errors={counters['errors']} refused={counters['refused']}")
+        print(f"final balance={balance:.0f} expected={expected} lost updates={expected - balance:.0f}")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
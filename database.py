@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -19,6 +19,8 @@ Configuration:
 Functions:
     - get_db(): Provides a database session for FastAPI dependency injection.
       Ensures proper session lifecycle management (creation and closure).
+    - upgrade_schema(): Adds columns and indexes declared on the models that
+      are missing from an already existing database.
 
 Usage:
     - Import `Base` to define database models in the application.
@@ -46,3 +48,35 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def upgrade_schema(bind=engine):
+    """
+    Brings existing tables up to date with the declared models.
+
+    `Base.metadata.create_all` only creates tables that do not exist yet, so
+    columns and indexes added to a model afterwards never reach a database
+    created by an older release. This adds them in place. New columns that are
+    not nullable must declare a `server_default`.
+
+    Args:
+        bind (Engine): The engine to upgrade. Defaults to the application engine.
+    """
+    inspector = inspect(bind)
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=bind.dialect)}"
+                if column.server_default is not None:
+                    default = column.server_default.arg
+                    if isinstance(default, str):
+                        default = f"'{default}'"
+                    ddl += f" DEFAULT {default}"
+                connection.execute(text(ddl))
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
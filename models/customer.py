@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Index
 from database import Base
 
 class Customer(Base):
@@ -24,9 +24,12 @@ class Customer(Base):
     marital_status : str
         The marital status of the customer (e.g., Single, Married).
     wallet_balance : float
-        The current balance of the customer's wallet. Defaults to 0.0.
+        The current balance of the customer's wallet. Defaults to 0.0. This is
+        a cached value; the wallet ledger is the record of every change to it.
     is_admin : bool
         Indicates whether the customer has admin privileges. Defaults to False.
+    version : int
+        Incremented on every update; used for optimistic concurrency control.
     """
     __tablename__ = "customers"
 
@@ -39,4 +42,66 @@ class Customer(Base):
     gender = Column(String, nullable=False)
     marital_status = Column(String, nullable=False)
     wallet_balance = Column(Float, default=0.0)
-    is_admin = Column(Boolean, default=False)
\ No newline at end of file
+    is_admin = Column(Boolean, default=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+class WalletLedgerEntry(Base):
+    """
+    SQLAlchemy model representing one change to a customer's wallet.
+
+    Entries are only ever appended; the wallet balance is the sum of a
+    customer's entries.
+
+    Attributes
+    ----------
+    id : int
+        The primary key of the entry; increases with time.
+    customer_id : int
+        The ID of the customer whose wallet changed.
+    amount_cents : int
+        The signed change in cents (positive for credits).
+    entry_type : str
+        opening, charge, deduct or adjustment.
+    created_at : datetime
+        When the entry was recorded (UTC).
+    """
+    __tablename__ = "wallet_ledger"
+    __table_args__ = (Index("ix_wallet_ledger_customer_id_id", "customer_id", "id"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
+    amount_cents = Column(Integer, nullable=False)
+    entry_type = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+
+class WalletSnapshot(Base):
+    """
+    SQLAlchemy model representing a customer's wallet balance at a ledger position.
+
+    Attributes
+    ----------
+    id : int
+        The primary key of the snapshot.
+    customer_id : int
+        The ID of the customer.
+    ledger_entry_id : int
+        The ID of the last ledger entry included in the balance.
+    balance_cents : int
+        The balance in cents after that entry.
+    created_at : datetime
+        When the snapshot was taken (UTC).
+    """
+    __tablename__ = "wallet_snapshots"
+    # Unique, so a snapshot taken twice at the same position cannot fan out
+    # the join of the next snapshot with its predecessor.
+    __table_args__ = (Index("uq_wallet_snapshots_customer_id_entry", "customer_id", "ledger_entry_id", unique=True),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
+    ledger_entry_id = Column(Integer, nullable=False)
+    balance_cents = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False)
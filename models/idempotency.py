@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from database import Base
+
+class IdempotencyKey(Base):
+    """
+    SQLAlchemy model recording the outcome of a request sent with an `Idempotency-Key` header.
+
+    Attributes
+    ----------
+    key : str
+        The client-supplied idempotency key.
+    scope : str
+        The caller, method and path the key was used with, e.g. "admin POST /sales".
+    request_hash : str
+        SHA-256 of the request body, used to reject a key reused for a different request.
+    status_code : int
+        The HTTP status of the stored response; NULL while the first request is still running.
+    response_body : str
+        The stored response as JSON; NULL while the first request is still running.
+    claim_id : str
+        Identifies the execution currently holding the key.
+    executed_at : datetime
+        When the first request committed a write, in the same transaction;
+        a key executed without a stored response is never claimed again.
+    created_at : datetime
+        When the key was first received (UTC).
+    expires_at : datetime
+        When the key may be purged (UTC).
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (Index("ix_idempotency_keys_expires_at", "expires_at"),)
+
+    key = Column(String, primary_key=True)
+    scope = Column(String, primary_key=True)
+    request_hash = Column(String, nullable=False)
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    claim_id = Column(String(32), nullable=True)
+    executed_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
 from database import Base
 
 class Item(Base):
@@ -19,12 +19,99 @@ class Item(Base):
         A brief description of the item.
     stock_count : int
         The number of items available in stock.
+    version : int
+        Incremented on every change to the item; used to build its ETag.
     """
     __tablename__ = "items"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    category = Column(String, nullable=False)
-    price = Column(Float, nullable=False)
+    category = Column(String, nullable=False, index=True)
+    price = Column(Float, nullable=False, index=True)
     description = Column(String)
-    stock_count = Column(Integer, nullable=False)
\ No newline at end of file
+    stock_count = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+
+class CatalogVersion(Base):
+    """
+    SQLAlchemy model holding a version counter for a whole collection.
+
+    Attributes
+    ----------
+    name : str
+        The name of the collection (e.g. "items").
+    version : int
+        Incremented on every write to the collection; used to build catalog ETags.
+    """
+    __tablename__ = "catalog_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class StockReservation(Base):
+    """
+    SQLAlchemy model representing a temporary hold on item stock.
+
+    Attributes
+    ----------
+    id : int
+        The primary key of the reservation.
+    item_id : int
+        The ID of the reserved item.
+    quantity : int
+        The number of units held.
+    status : str
+        Active, Confirmed, Released or Expired. Only active holds that have
+        not reached `expires_at` count against the available stock.
+    created_at : datetime
+        When the hold was placed (UTC).
+    expires_at : datetime
+        When the hold lapses if it is not confirmed or released (UTC).
+    """
+    __tablename__ = "stock_reservations"
+    __table_args__ = (
+        Index("ix_stock_reservations_item_status_expires", "item_id", "status", "expires_at"),
+        Index("ix_stock_reservations_status_expires", "status", "expires_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    item_id = Column(Integer, ForeignKey("items.id", ondelete="CASCADE"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default="Active")
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class ItemChange(Base):
+    """
+    SQLAlchemy model representing an entry of the inventory change log.
+
+    The log feeds the change stream. Its IDs are never reused, so clients can
+    resume from the last ID they saw.
+
+    Attributes
+    ----------
+    id : int
+        The sequence number of the change.
+    item_id : int, optional
+        The ID of the changed item. Empty when the whole catalog was cleared.
+    change_type : str
+        created, updated, deleted or cleared.
+    stock_count : int, optional
+        The stock count of the item after the change.
+    price : float, optional
+        The price of the item after the change.
+    created_at : datetime
+        When the change was committed (UTC).
+    """
+    __tablename__ = "item_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    item_id = Column(Integer)
+    change_type = Column(String, nullable=False)
+    stock_count = Column(Integer)
+    price = Column(Float)
+    created_at = Column(DateTime, nullable=False, index=True)
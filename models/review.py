@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Float, Index, Integer, String, ForeignKey
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -20,8 +21,16 @@ class Review(Base):
         The rating's description.
     moderation_status : str
         The number of items available in stock.
+    available_at : datetime
+        When the review can next be claimed from the moderation queue (UTC):
+        its submission time, or the end of its current lease.
+    lease_id : str, optional
+        The moderation lease the review was last claimed under.
     """
     __tablename__ = "reviews"
+    __table_args__ = (
+        Index("ix_reviews_moderation_queue", "moderation_status", "available_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     product_id = Column(Integer, nullable=False)
@@ -29,3 +38,39 @@ class Review(Base):
     rating = Column(Integer, nullable=False)
     comment = Column(String, nullable=True)
     moderation_status = Column(String, default="Pending")
+    available_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow, server_default="1970-01-01 00:00:00.000000"
+    )
+    lease_id = Column(String(32), nullable=True)
+
+
+class ProductRatingStats(Base):
+    """
+    SQLAlchemy model holding the rating aggregates of one product.
+
+    Only approved reviews are counted. Rows are maintained incrementally by
+    `ReviewService` in the same transaction as the review change they
+    reflect, and can be rebuilt from the `reviews` table.
+
+    Attributes
+    ----------
+    product_id : int
+        The id of the item.
+    rating_count : int
+        The number of approved reviews.
+    rating_sum : float
+        The sum of their ratings.
+    stars_1 .. stars_5 : int
+        The number of approved reviews per star, a rating counting towards
+        the whole star below it (4.5 counts as 4).
+    """
+    __tablename__ = "product_rating_stats"
+
+    product_id = Column(Integer, primary_key=True)
+    rating_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0.0)
+    stars_1 = Column(Integer, nullable=False, default=0)
+    stars_2 = Column(Integer, nullable=False, default=0)
+    stars_3 = Column(Integer, nullable=False, default=0)
+    stars_4 = Column(Integer, nullable=False, default=0)
+    stars_5 = Column(Integer, nullable=False, default=0)
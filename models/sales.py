@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, Float
+from datetime import datetime
+from sqlalchemy import Column, Integer, Float, String, Date, DateTime, Index
 from database import Base
 
 class Sale(Base):
@@ -15,10 +16,113 @@ class Sale(Base):
         The ID of the item being sold.
     amount : float
         The monetary amount of the sale.
+    quantity : int
+        The number of units sold. Defaults to 1.
+    created_at : datetime
+        When the sale was recorded (UTC). NULL for sales recorded before the column existed.
     """
     __tablename__ = "sales"
+    __table_args__ = (
+        Index("ix_sales_created_at", "created_at"),
+        Index("ix_sales_customer_id_created_at_id", "customer_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     customer_id = Column(Integer, nullable=False)
     item_id = Column(Integer, nullable=False)
     amount = Column(Float, nullable=False)
+    quantity = Column(Integer, nullable=False, default=1, server_default="1")
+    created_at = Column(DateTime, nullable=True, default=datetime.utcnow)
+
+
+class SalesItemDaily(Base):
+    """
+    SQLAlchemy model holding the sales totals of one item on one day.
+
+    Rows are maintained incrementally by `SalesService` in the same
+    transaction as the sale they summarise, and can be rebuilt from the
+    `sales` table.
+
+    Attributes
+    ----------
+    item_id : int
+        The ID of the item.
+    day : date
+        The day (UTC) the sales were recorded on.
+    revenue : float
+        The total amount of the sales.
+    units : int
+        The total quantity sold.
+    sales : int
+        The number of sales.
+    """
+    __tablename__ = "sales_item_daily"
+
+    item_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    revenue = Column(Float, nullable=False, default=0.0)
+    units = Column(Integer, nullable=False, default=0)
+    sales = Column(Integer, nullable=False, default=0)
+
+
+class SalesCustomerDaily(Base):
+    """
+    SQLAlchemy model holding the sales totals of one customer on one day.
+
+    Rows are maintained incrementally by `SalesService` in the same
+    transaction as the sale they summarise, and can be rebuilt from the
+    `sales` table.
+
+    Attributes
+    ----------
+    customer_id : int
+        The ID of the customer.
+    day : date
+        The day (UTC) the sales were recorded on.
+    revenue : float
+        The total amount of the sales.
+    units : int
+        The total quantity bought.
+    sales : int
+        The number of sales.
+    """
+    __tablename__ = "sales_customer_daily"
+
+    customer_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    revenue = Column(Float, nullable=False, default=0.0)
+    units = Column(Integer, nullable=False, default=0)
+    sales = Column(Integer, nullable=False, default=0)
+
+
+class SalesPartition(Base):
+    """
+    SQLAlchemy model cataloguing a closed month of sales moved to an archive file.
+
+    The sales of an archived month are removed from the `sales` table and
+    kept in a compacted, read-only SQLite file that `SalesService` still
+    queries when a request's time range overlaps the month.
+
+    Attributes
+    ----------
+    month : str
+        The archived month, e.g. "2024-01".
+    starts_at : datetime
+        The first instant of the month (UTC).
+    ends_at : datetime
+        The first instant of the next month (UTC).
+    path : str
+        The path of the archive file.
+    row_count : int
+        The number of sales in the archive.
+    archived_at : datetime
+        When the month was archived (UTC).
+    """
+    __tablename__ = "sales_partitions"
+
+    month = Column(String(7), primary_key=True)
+    starts_at = Column(DateTime, nullable=False)
+    ends_at = Column(DateTime, nullable=False)
+    path = Column(String, nullable=False)
+    row_count = Column(Integer, nullable=False, default=0)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
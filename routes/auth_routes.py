@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from services.auth_service import AuthService
 from database import get_db
@@ -40,6 +40,20 @@ def register(customer_data: CustomerCreate, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/username-available")
+def username_available(u: str = Query(..., min_length=1), db: Session = Depends(get_db)):
+    """
+    Checks whether a username is free to register.
+
+    Args:
+        u (str): The username to check.
+        db (Session): The database session dependency.
+
+    Returns:
+        dict: The username and whether it is available.
+    """
+    return {"username": u, "available": auth_service.is_username_available(db, u)}
+
 @router.post("/login")
 def login(request: LoginRequest):
     """
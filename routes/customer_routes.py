@@ -1,10 +1,17 @@
 import os
+import json
 import logging
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from database import get_db
-from services.customer_service import CustomerService
-from dependencies.auth_dependency import get_current_user
+from database import get_db, SessionLocal
+from schemas.customer_schema import CustomerPublic
+from services.customer_service import CustomerService, DEFAULT_PAGE_SIZE, IMPORT_CHUNK_SIZE, MAX_PAGE_SIZE
+from services.idempotency_service import IdempotencyService
+from routes.streaming import read_ndjson_lines
+from dependencies.auth_dependency import get_current_user, require_admin
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
@@ -22,6 +29,10 @@ Main Features
 - **Wallet Operations**:
   - Charge a customer's wallet with a specified amount.
   - Deduct an amount from a customer's wallet.
+- **Idempotency**:
+  - Wallet charges and deductions sent with an `Idempotency-Key` header are
+    executed once; retries with the same key from the same caller replay the
+    first response.
 - **Logging**:
   - Logs all operations and errors for debugging and auditing purposes.
 - **Dependencies**:
@@ -45,18 +56,29 @@ Routes Summary
 --------------
 - `POST /customers`:
   - Create a new customer.
+- `GET /customers/cache/stats`:
+  - Retrieve the username cache hit ratio and eviction counts (admin only).
 - `GET /customers/{username}`:
   - Retrieve a specific customer by username.
 - `GET /customers`:
-  - Retrieve all customers.
+  - Retrieve a page of customers, without passwords. The cursor of the next
+    page is returned in the `X-Next-Cursor` header. `format=ndjson` streams
+    every customer as newline-delimited JSON instead.
+- `POST /customers/import`:
+  - Import customers from an NDJSON request body (admin only). The body is
+    read and inserted in chunks, and rejected lines are reported with their
+    line number.
 - `PUT /customers/{username}`:
   - Update a customer's information.
 - `DELETE /customers/{username}`:
   - Delete a customer by username.
 - `POST /customers/{username}/charge`:
-  - Charge a customer's wallet.
+  - Charge a customer's wallet. Accepts an `Idempotency-Key` header.
 - `POST /customers/{username}/deduct`:
-  - Deduct an amount from a customer's wallet.
+  - Deduct an amount from a customer's wallet. Accepts an `Idempotency-Key` header.
+- `GET /customers/{username}/ledger`:
+  - Retrieve a page of a customer's wallet ledger, newest first. The cursor
+    of the next page is returned in the `X-Next-Cursor` header.
 """
 
 
@@ -70,6 +92,9 @@ logging.basicConfig(
 limiter = Limiter(key_func=get_remote_address)  # Throttling mechanism
 router = APIRouter()
 customer_service = CustomerService() 
+idempotency_service = IdempotencyService()
+
+MAX_REPORTED_FAILURES = 1000
 
 @router.post("/customers", dependencies=[Depends(get_current_user)])
 def create_customer_route(customer_data: dict, db: Session = Depends(get_db)):
@@ -95,6 +120,17 @@ def create_customer_route(customer_data: dict, db: Session = Depends(get_db)):
         logging.error(f"Error creating customer: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/customers/cache/stats", dependencies=[Depends(require_admin)])
+def get_cache_stats():
+    """
+    Retrieve the username cache counters.
+
+    Returns:
+        dict: The cache size, hits, misses, hit ratio, evictions and expirations.
+    """
+    logging.info("GET /customers/cache/stats")
+    return customer_service.cache_stats()
+
 @router.get("/customers/{username}", dependencies=[Depends(get_current_user)])
 def get_customer_by_username(username: str, db: Session = Depends(get_db)):
     """
@@ -119,22 +155,91 @@ def get_customer_by_username(username: str, db: Session = Depends(get_db)):
     logging.info(f"Customer retrieved: {customer}")
     return customer
 
-@router.get("/customers", dependencies=[Depends(get_current_user)])
-def get_all_customers_route(db: Session = Depends(get_db)):
+def export_customers():
+    """
+    Yields every customer as a line of NDJSON, using its own database session.
     """
-    Retrieve all customers.
+    db = SessionLocal()
+    try:
+        for customer in customer_service.iter_customers(db):
+            yield json.dumps(customer) + "\n"
+    finally:
+        db.close()
+
+@router.get("/customers", dependencies=[Depends(get_current_user)], response_model=List[CustomerPublic])
+def get_all_customers_route(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = None,
+    format: str = "json",
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieve a page of customers, or stream all of them as NDJSON.
 
     Args:
+        response (Response): The outgoing response, used to set the `X-Next-Cursor` header.
+        limit (int): The page size.
+        cursor (int, optional): The `X-Next-Cursor` value of the previous page.
+        format (str): "json" for a page of customers or "ndjson" to stream every customer.
         db (Session): The database session dependency.
 
     Returns:
-        list: A list of all customers.
+        list: A page of customers without their passwords.
+
+    Raises:
+        HTTPException: If the format is not supported.
     """
-    logging.info("GET /customers")
-    customers = customer_service.get_all_customers(db)
-    logging.info(f"All customers retrieved: {len(customers)} customers")
+    logging.info(f"GET /customers - limit={limit} cursor={cursor} format={format}")
+    if format == "ndjson":
+        return StreamingResponse(export_customers(), media_type="application/x-ndjson")
+    if format != "json":
+        raise HTTPException(status_code=400, detail="Format must be 'json' or 'ndjson'")
+    customers, next_cursor = customer_service.list_customers(db, limit=limit, cursor=cursor)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    logging.info(f"Customers retrieved: {len(customers)} customers")
     return customers
 
+@router.post("/customers/import", dependencies=[Depends(require_admin)])
+async def import_customers_route(request: Request, db: Session = Depends(get_db)):
+    """
+    Import customers from a newline-delimited JSON request body.
+
+    Each line holds one customer in the `POST /customers` format. Lines are
+    validated and inserted in chunks of `IMPORT_CHUNK_SIZE` as the body is
+    received, so memory use does not grow with the size of the import.
+
+    Args:
+        request (Request): The incoming request whose body is read as a stream.
+        db (Session): The database session dependency.
+
+    Returns:
+        dict: The number of imported and rejected customers, and the first
+        rejected lines with their errors.
+    """
+    logging.info("POST /customers/import")
+    imported = failed = 0
+    failures = []
+
+    async def flush(batch):
+        nonlocal imported, failed
+        count, errors = await run_in_threadpool(customer_service.import_customer_batch, db, batch)
+        imported += count
+        failed += len(errors)
+        failures.extend(errors[: MAX_REPORTED_FAILURES - len(failures)])
+
+    batch = []
+    async for line in read_ndjson_lines(request):
+        batch.append(line)
+        if len(batch) >= IMPORT_CHUNK_SIZE:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    logging.info(f"Customers imported: {imported} imported, {failed} failed")
+    return {"imported": imported, "failed": failed, "failures": failures}
+
 @router.put("/customers/{username}", dependencies=[Depends(get_current_user)])
 def update_customer_route(username: str, updates: dict, db: Session = Depends(get_db)):
     """
@@ -159,6 +264,8 @@ def update_customer_route(username: str, updates: dict, db: Session = Depends(ge
         return {"message": "Customer updated successfully", "customer": updated_customer}
     except ValueError as e:
         logging.error(f"Error updating customer {username}: {e}")
+        if str(e) == "Customer was modified concurrently":
+            raise HTTPException(status_code=409, detail=str(e))
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/customers/{username}", dependencies=[Depends(get_current_user)])
@@ -186,8 +293,14 @@ def delete_customer_route(username: str, db: Session = Depends(get_db)):
         logging.error(f"Error deleting customer {username}: {e}")
         raise HTTPException(status_code=404, detail=str(e))
 
-@router.post("/customers/{username}/charge", dependencies=[Depends(get_current_user)])
-def charge_wallet_route(username: str, data: dict, db: Session = Depends(get_db)):
+@router.post("/customers/{username}/charge")
+def charge_wallet_route(
+    username: str,
+    data: dict,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    current_user: dict = Depends(get_current_user),
+):
     """
     Charge a customer's wallet.
 
@@ -195,28 +308,44 @@ def charge_wallet_route(username: str, data: dict, db: Session = Depends(get_db)
         username (str): The username of the customer to charge.
         data (dict): Contains the 'amount' to charge.
         db (Session): The database session dependency.
+        idempotency_key (str, optional): The `Idempotency-Key` header; retries
+            with the same key return the first response without charging again.
+        current_user (dict): The authenticated caller; idempotency keys are scoped to it.
 
     Returns:
         dict: A message and the updated customer data.
 
     Raises:
-        HTTPException: If the 'amount' key is missing or the charge fails.
+        HTTPException: If the 'amount' key is missing, the customer is not found or the charge fails.
     """
-    print([username])
-    try:
-        amount = data["amount"]
-        charged_customer = customer_service.charge_wallet(db, username, amount)
-        logging.info(f"Wallet charged for {username}: {charged_customer}")
-        return {"message": "Wallet charged successfully", "customer": charged_customer}
-    except KeyError as e:
-        logging.error(f"KeyError: {e}")
-        raise HTTPException(status_code=422, detail=f"Missing 'amount' in request data: {e}")
-    except ValueError as e:
-        logging.error(f"Error charging wallet for {username}: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
-
-@router.post("/customers/{username}/deduct", dependencies=[Depends(get_current_user)])
-def deduct_wallet_route(username: str, data: dict, db: Session = Depends(get_db)):
+    def charge():
+        try:
+            amount = data["amount"]
+            charged_customer = customer_service.charge_wallet(db, username, amount)
+            if not charged_customer:
+                logging.warning(f"Customer not found: {username}")
+                raise HTTPException(status_code=404, detail="Customer not found")
+            logging.info(f"Wallet charged for {username}: {charged_customer}")
+            return {"message": "Wallet charged successfully", "customer": charged_customer}
+        except KeyError as e:
+            logging.error(f"KeyError: {e}")
+            raise HTTPException(status_code=422, detail=f"Missing 'amount' in request data: {e}")
+        except ValueError as e:
+            logging.error(f"Error charging wallet for {username}: {e}")
+            raise HTTPException(status_code=400, detail=str(e))
+
+    if idempotency_key:
+        return idempotency_service.run(db, idempotency_key, f"POST /customers/{username}/charge", current_user["sub"], data, charge)
+    return charge()
+
+@router.post("/customers/{username}/deduct")
+def deduct_wallet_route(
+    username: str,
+    data: dict,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    current_user: dict = Depends(get_current_user),
+):
     """
     Deduct an amount from a customer's wallet.
 
@@ -224,19 +353,67 @@ def deduct_wallet_route(username: str, data: dict, db: Session = Depends(get_db)
         username (str): The username of the customer.
         data (dict): Contains the 'amount' to deduct.
         db (Session): The database session dependency.
+        idempotency_key (str, optional): The `Idempotency-Key` header; retries
+            with the same key return the first response without deducting again.
+        current_user (dict): The authenticated caller; idempotency keys are scoped to it.
 
     Returns:
         dict: A message and the updated customer data.
 
     Raises:
-        HTTPException: If the deduction fails.
+        HTTPException: If the customer is not found, the balance is insufficient or the deduction fails.
     """
-    amount = data["amount"]
+    amount = data.get("amount")
     logging.info(f"POST /customers/{username}/deduct - Amount: {amount}")
-    try:
-        deducted_customer = customer_service.deduct_wallet(db, username, amount)
-        logging.info(f"Wallet deducted for customer {username}: {deducted_customer}")
-        return {"message": "Wallet deducted successfully", "customer": deducted_customer}
-    except ValueError as e:
-        logging.error(f"Error deducting wallet for {username}: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
+
+    def deduct():
+        try:
+            deducted_customer = customer_service.deduct_wallet(db, username, amount)
+            if not deducted_customer:
+                logging.warning(f"Customer not found: {username}")
+                raise HTTPException(status_code=404, detail="Customer not found")
+            logging.info(f"Wallet deducted for customer {username}: {deducted_customer}")
+            return {"message": "Wallet deducted successfully", "customer": deducted_customer}
+        except ValueError as e:
+            logging.error(f"Error deducting wallet for {username}: {e}")
+            raise HTTPException(status_code=400, detail=str(e))
+
+    if idempotency_key:
+        return idempotency_service.run(db, idempotency_key, f"POST /customers/{username}/deduct", current_user["sub"], data, deduct)
+    return deduct()
+
+@router.get("/customers/{username}/ledger", dependencies=[Depends(get_current_user)])
+def get_wallet_ledger_route(
+    username: str,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieve a page of a customer's wallet ledger, newest first.
+
+    Args:
+        username (str): The username of the customer.
+        response (Response): The outgoing response, used to set the `X-Next-Cursor` header.
+        limit (int): The page size.
+        cursor (int, optional): The `X-Next-Cursor` value of the previous page.
+        db (Session): The database session dependency.
+
+    Returns:
+        list: Ledger entries with signed amounts in cents.
+
+    Raises:
+        HTTPException: If the customer is not found.
+    """
+    username = username.strip()
+    logging.info(f"GET /customers/{username}/ledger - limit={limit} cursor={cursor}")
+    page = customer_service.get_ledger(db, username, limit=limit, cursor=cursor)
+    if page is None:
+        logging.warning(f"Customer not found: {username}")
+        raise HTTPException(status_code=404, detail="Customer not found")
+    entries, next_cursor = page
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    logging.info(f"Ledger retrieved for {username}: {len(entries)} entries")
+    return entries
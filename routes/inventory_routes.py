@@ -1,10 +1,17 @@
 import os
+import asyncio
+import hashlib
+import json
 import logging
-from fastapi import APIRouter, Depends, HTTPException
+import time
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from database import get_db
-from services.inventory_service import InventoryService
-from dependencies.auth_dependency import get_current_user
+from database import get_db, SessionLocal
+from services.inventory_service import InventoryService, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, RESERVATION_TTL
+from dependencies.auth_dependency import get_current_user, require_admin
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
@@ -33,19 +40,43 @@ Features
 - **Throttling**:
   - Implements request throttling using `SlowAPI` to limit excessive API usage.
 
+- **Conditional Requests**:
+  - `GET /items` and `GET /items/{item_id}` return strong ETags built from the
+    catalog version and the item version. A matching `If-None-Match` header is
+    answered with 304 before the listing query runs or the body is serialized.
+
 Routes
 ------
 
 - **GET /items**:
-  Retrieve all items in the inventory.
+  Retrieve a filtered, sorted page of items. The cursor of the next page is
+  returned in the `X-Next-Cursor` response header.
+- **GET /items/changes**:
+  Stream stock and price changes as server-sent events, or long-poll for them
+  with `mode=poll`. Clients resume with `Last-Event-ID` or `since`.
+- **GET /items/search**:
+  Full-text search over item names, categories and descriptions, ranked by
+  relevance. The cursor of the next page is returned in `X-Next-Cursor`.
 - **GET /items/{item_id}**:
   Retrieve a specific item by its ID.
+- **GET /items/cache/stats**:
+  Retrieve the item cache hit ratio and eviction counts (admin only).
 - **POST /items**:
   Create a new item in the inventory.
 - **PUT /items/{item_id}**:
   Update an existing inventory item.
+- **POST /items/bulk-update**:
+  Update every item matching a filter in chunked set-based statements (admin only).
 - **POST /items/{item_id}/deduct**:
   Deduct stock from a specific item.
+- **GET /items/{item_id}/availability**:
+  Retrieve the stock of an item that is not held by reservations.
+- **POST /items/{item_id}/reserve**:
+  Hold units of an item for a limited time during checkout.
+- **POST /reservations/{reservation_id}/confirm**:
+  Convert a hold into a stock deduction.
+- **POST /reservations/{reservation_id}/release**:
+  Release a hold, returning its units to the available stock.
 - **DELETE /items/{item_id}**:
   Delete an inventory item by ID.
 - **DELETE /items**:
@@ -75,33 +106,258 @@ router = APIRouter()
 inventory_service = InventoryService()
 limiter = Limiter(key_func=get_remote_address)
 
+CHANGE_POLL_INTERVAL = 1.0
+CHANGE_HEARTBEAT_INTERVAL = 15.0
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Checks whether an `If-None-Match` header matches an ETag.
+
+    Args:
+        if_none_match (str, optional): The raw header value.
+        etag (str): The current ETag, including quotes.
+
+    Returns:
+        bool: True if the client already holds the current representation.
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
 @router.get("/items", dependencies=[Depends(get_current_user)])
-def get_all_items(db: Session = Depends(get_db)):
+def get_all_items(
+    request: Request,
+    response: Response,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: Optional[bool] = None,
+    sort: str = "id",
+    order: str = "asc",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    ids: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
-    Retrieve all items in the inventory.
+    Retrieve a filtered, sorted page of inventory items.
 
     Args:
+        request (Request): The incoming request, whose query string is part of the ETag.
+        response (Response): The outgoing response, used to set the `ETag` and `X-Next-Cursor` headers.
+        category (str, optional): Only return items in this category.
+        min_price (float, optional): Lower bound on the item price.
+        max_price (float, optional): Upper bound on the item price.
+        in_stock (bool, optional): Only return items with (or without) stock.
+        sort (str): The column to sort by.
+        order (str): The sort direction, "asc" or "desc".
+        limit (int): The page size.
+        cursor (str, optional): The `X-Next-Cursor` value of the previous page.
+        fields (str, optional): Comma-separated list of columns to return.
+        ids (str, optional): Comma-separated list of item IDs to return.
+        if_none_match (str, optional): The ETag of the page the client already holds.
         db (Session): The database session dependency.
 
     Returns:
-        list: A list of all inventory items.
+        list: A page of inventory items, or an empty 304 response if unchanged.
+
+    Raises:
+        HTTPException: If the filters, sort or cursor are invalid.
     """
-    logging.info("GET /items")
-    items = inventory_service.get_all_items(db)
-    logging.info(f"All items retrieved: {len(items)} items")
+    logging.info(f"GET /items - category={category} min_price={min_price} max_price={max_price} "
+                 f"in_stock={in_stock} sort={sort} order={order} limit={limit} cursor={cursor} fields={fields} ids={ids}")
+    query_key = hashlib.sha1(str(sorted(request.query_params.multi_items())).encode()).hexdigest()[:16]
+    etag = f'"items-{inventory_service.get_catalog_version(db)}-{query_key}"'
+    if etag_matches(if_none_match, etag):
+        logging.info("Items not modified")
+        return Response(status_code=304, headers={"ETag": etag})
+
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    try:
+        id_list = [int(item_id) for item_id in ids.split(",") if item_id.strip()] if ids else None
+        items, next_cursor = inventory_service.list_items(
+            db,
+            category=category,
+            min_price=min_price,
+            max_price=max_price,
+            in_stock=in_stock,
+            sort=sort,
+            order=order,
+            limit=limit,
+            cursor=cursor,
+            fields=field_list,
+            ids=id_list,
+        )
+    except ValueError as e:
+        logging.error(f"Error listing items: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    response.headers["ETag"] = etag
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    logging.info(f"Items retrieved: {len(items)} items")
+    return items
+
+def read_changes(since: Optional[int]):
+    """
+    Reads the changes after a sequence number in a short-lived session.
+
+    Args:
+        since (int, optional): The last sequence number seen. None starts at the newest change.
+
+    Returns:
+        tuple[int, bool, list[dict]]: The sequence number to continue from,
+        whether the requested changes were already pruned, and the changes found.
+    """
+    db = SessionLocal()
+    try:
+        if since is None:
+            return inventory_service.get_latest_change_id(db), False, []
+        if inventory_service.changes_truncated(db, since):
+            return inventory_service.get_latest_change_id(db), True, []
+        changes = inventory_service.get_changes(db, since)
+        return (changes[-1]["id"] if changes else since), False, changes
+    finally:
+        db.close()
+
+def format_event(change: dict) -> str:
+    """
+    Formats a change as a server-sent event.
+
+    Args:
+        change (dict): The change log entry.
+
+    Returns:
+        str: The event frame.
+    """
+    return f"id: {change['id']}\nevent: {change['change_type']}\ndata: {json.dumps(change)}\n\n"
+
+@router.get("/items/changes", dependencies=[Depends(get_current_user)])
+async def get_item_changes(
+    since: Optional[int] = None,
+    mode: str = "stream",
+    timeout: float = Query(300.0, gt=0, le=3600),
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Stream inventory changes, or long-poll for them.
+
+    In stream mode the response is a `text/event-stream` that stays open for
+    `timeout` seconds; clients reconnect with the `Last-Event-ID` header to
+    resume. In poll mode the request returns as soon as changes are
+    available, or with an empty list after `timeout` seconds. If the requested
+    changes were already pruned, a `reset` event (or `"reset": true`) tells
+    the client to reload the catalog before continuing.
+
+    Args:
+        since (int, optional): The last sequence number seen. Defaults to the newest change.
+        mode (str): "stream" for server-sent events or "poll" for a long-poll JSON response.
+        timeout (float): How long to keep the request open, in seconds.
+        last_event_id (str, optional): The `Last-Event-ID` header sent by reconnecting clients.
+
+    Returns:
+        StreamingResponse or dict: The event stream, or the changes and the last sequence number.
+
+    Raises:
+        HTTPException: If the mode or sequence number is invalid.
+    """
+    if mode not in ("stream", "poll"):
+        raise HTTPException(status_code=400, detail="Mode must be 'stream' or 'poll'")
+    if last_event_id is not None:
+        try:
+            since = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    logging.info(f"GET /items/changes - mode={mode} since={since}")
+    deadline = time.monotonic() + timeout
+
+    if mode == "poll":
+        while True:
+            last_id, reset, changes = await run_in_threadpool(read_changes, since)
+            if reset or changes or time.monotonic() >= deadline:
+                return {"changes": changes, "last_event_id": last_id, "reset": reset}
+            since = last_id
+            await asyncio.sleep(min(CHANGE_POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+
+    async def event_stream():
+        last_id = since
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            last_id, reset, changes = await run_in_threadpool(read_changes, last_id)
+            if reset:
+                yield f"id: {last_id}\nevent: reset\ndata: {json.dumps({'last_event_id': last_id})}\n\n"
+            for change in changes:
+                yield format_event(change)
+            if reset or changes:
+                last_sent = time.monotonic()
+                continue
+            if time.monotonic() - last_sent >= CHANGE_HEARTBEAT_INTERVAL:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(min(CHANGE_POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/items/search", dependencies=[Depends(get_current_user)])
+def search_items(
+    response: Response,
+    q: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Search items by name, category and description.
+
+    Args:
+        response (Response): The outgoing response, used to set the `X-Next-Cursor` header.
+        q (str): The text to search for.
+        limit (int): The page size.
+        cursor (str, optional): The `X-Next-Cursor` value of the previous page.
+        db (Session): The database session dependency.
+
+    Returns:
+        list: A page of matching items, best match first.
+
+    Raises:
+        HTTPException: If the query or cursor is invalid.
+    """
+    logging.info(f"GET /items/search - q={q} limit={limit} cursor={cursor}")
+    try:
+        items, next_cursor = inventory_service.search_items(db, q, limit=limit, cursor=cursor)
+    except ValueError as e:
+        logging.error(f"Error searching items: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    logging.info(f"Search results retrieved: {len(items)} items")
     return items
 
 @router.get("/items/{item_id}", dependencies=[Depends(get_current_user)])
-def get_item(item_id: int, db: Session = Depends(get_db)):
+def get_item(
+    item_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     Retrieve a specific item by its ID.
 
     Args:
         item_id (int): The ID of the item to retrieve.
+        response (Response): The outgoing response, used to set the `ETag` header.
+        if_none_match (str, optional): The ETag of the item the client already holds.
         db (Session): The database session dependency.
 
     Returns:
-        dict: The retrieved item details.
+        dict: The retrieved item details, or an empty 304 response if unchanged.
 
     Raises:
         HTTPException: If the item is not found.
@@ -111,9 +367,25 @@ def get_item(item_id: int, db: Session = Depends(get_db)):
     if not item:
         logging.warning(f"Item not found: {item_id}")
         raise HTTPException(status_code=404, detail="Item not found")
+    etag = f'"item-{item.id}-{item.version}"'
+    if etag_matches(if_none_match, etag):
+        logging.info(f"Item not modified: {item_id}")
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     logging.info(f"Item retrieved: {item}")
     return item
 
+@router.get("/items/cache/stats", dependencies=[Depends(require_admin)])
+def get_cache_stats():
+    """
+    Retrieve the item cache counters.
+
+    Returns:
+        dict: The cache size, hits, misses, hit ratio, evictions and expirations.
+    """
+    logging.info("GET /items/cache/stats")
+    return inventory_service.cache_stats()
+
 @router.post("/items", dependencies=[Depends(get_current_user)])
 def create_item(data: dict, db: Session = Depends(get_db)):
     """
@@ -138,6 +410,35 @@ def create_item(data: dict, db: Session = Depends(get_db)):
         logging.error(f"Error creating item: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/items/bulk-update", dependencies=[Depends(require_admin)])
+def bulk_update_items(data: dict, db: Session = Depends(get_db)):
+    """
+    Update every item matching a filter.
+
+    Example body::
+
+        {"filter": {"category": "Shoes"}, "update": {"price": {"op": "multiply", "value": 0.9}}}
+
+    Args:
+        data (dict): Contains the 'filter' (category, ids, min_price, max_price)
+            and the 'update' to apply per field (set, add or multiply).
+        db (Session): The database session dependency.
+
+    Returns:
+        dict: A message and the number of items updated.
+
+    Raises:
+        HTTPException: If the filter or update is invalid.
+    """
+    logging.info(f"POST /items/bulk-update - Data: {data}")
+    try:
+        updated = inventory_service.bulk_update_items(db, data.get("filter"), data.get("update"))
+        logging.info(f"Items bulk updated: {updated}")
+        return {"message": "Items updated successfully", "updated": updated}
+    except ValueError as e:
+        logging.error(f"Error bulk updating items: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.put("/items/{item_id}", dependencies=[Depends(get_current_user)])
 def update_item(item_id: int, updates: dict, db: Session = Depends(get_db)):
     """
@@ -190,6 +491,104 @@ def deduct_item(item_id: int, db: Session = Depends(get_db)):
         logging.error(f"Error deducting item {item_id}: {e}")
         raise HTTPException(status_code=404, detail=str(e))
 
+@router.get("/items/{item_id}/availability", dependencies=[Depends(get_current_user)])
+def get_item_availability(item_id: int, db: Session = Depends(get_db)):
+    """
+    Retrieve the stock of an item that is not held by reservations.
+
+    Args:
+        item_id (int): The ID of the item.
+        db (Session): The database session dependency.
+
+    Returns:
+        dict: The item ID and its available stock.
+
+    Raises:
+        HTTPException: If the item is not found.
+    """
+    logging.info(f"GET /items/{item_id}/availability")
+    try:
+        available = inventory_service.get_available_stock(db, item_id)
+        return {"item_id": item_id, "available": available}
+    except ValueError as e:
+        logging.error(f"Error reading availability of item {item_id}: {e}")
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/items/{item_id}/reserve", dependencies=[Depends(get_current_user)])
+def reserve_item(item_id: int, data: dict, db: Session = Depends(get_db)):
+    """
+    Hold units of an item for a limited time.
+
+    Args:
+        item_id (int): The ID of the item to reserve.
+        data (dict): Contains the 'quantity' to hold and an optional 'ttl_seconds'.
+        db (Session): The database session dependency.
+
+    Returns:
+        dict: A message and the created reservation.
+
+    Raises:
+        HTTPException: If the item is not found or not enough stock is available.
+    """
+    logging.info(f"POST /items/{item_id}/reserve - Data: {data}")
+    try:
+        reservation = inventory_service.reserve_item(
+            db, item_id, data.get("quantity", 1), data.get("ttl_seconds", RESERVATION_TTL)
+        )
+        logging.info(f"Stock reserved: {reservation}")
+        return {"message": "Stock reserved successfully", "reservation": reservation}
+    except ValueError as e:
+        logging.warning(f"Reservation failed for item {item_id}: {e}")
+        raise HTTPException(status_code=404 if str(e) == "Item not found" else 400, detail=str(e))
+
+@router.post("/reservations/{reservation_id}/confirm", dependencies=[Depends(get_current_user)])
+def confirm_reservation(reservation_id: int, db: Session = Depends(get_db)):
+    """
+    Convert a hold into a stock deduction.
+
+    Args:
+        reservation_id (int): The ID of the reservation.
+        db (Session): The database session dependency.
+
+    Returns:
+        dict: A message and the confirmed reservation.
+
+    Raises:
+        HTTPException: If the reservation is not found or is no longer active.
+    """
+    logging.info(f"POST /reservations/{reservation_id}/confirm")
+    try:
+        reservation = inventory_service.confirm_reservation(db, reservation_id)
+        logging.info(f"Reservation confirmed: {reservation}")
+        return {"message": "Reservation confirmed successfully", "reservation": reservation}
+    except ValueError as e:
+        logging.warning(f"Confirming reservation {reservation_id} failed: {e}")
+        raise HTTPException(status_code=404 if str(e) == "Reservation not found" else 409, detail=str(e))
+
+@router.post("/reservations/{reservation_id}/release", dependencies=[Depends(get_current_user)])
+def release_reservation(reservation_id: int, db: Session = Depends(get_db)):
+    """
+    Release a hold, returning its units to the available stock.
+
+    Args:
+        reservation_id (int): The ID of the reservation.
+        db (Session): The database session dependency.
+
+    Returns:
+        dict: A message and the released reservation.
+
+    Raises:
+        HTTPException: If the reservation is not found or is no longer active.
+    """
+    logging.info(f"POST /reservations/{reservation_id}/release")
+    try:
+        reservation = inventory_service.release_reservation(db, reservation_id)
+        logging.info(f"Reservation released: {reservation}")
+        return {"message": "Reservation released successfully", "reservation": reservation}
+    except ValueError as e:
+        logging.warning(f"Releasing reservation {reservation_id} failed: {e}")
+        raise HTTPException(status_code=404 if str(e) == "Reservation not found" else 409, detail=str(e))
+
 @router.delete("/items/{item_id}", dependencies=[Depends(get_current_user)])
 def delete_item(item_id: int, db: Session = Depends(get_db)):
     """
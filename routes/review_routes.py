@@ -2,7 +2,7 @@ import os
 import logging
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from services.review_service import ReviewService
+from services.review_service import ReviewService, DEFAULT_CLAIM_SIZE, MODERATION_LEASE_SECONDS
 from database import get_db
 from dependencies.auth_dependency import get_current_user, require_admin
 from pydantic import BaseModel
@@ -21,8 +21,12 @@ Features
 - **Review Management**:
   - Submit, update, and delete reviews.
   - Retrieve reviews by product or customer.
+  - Summarize the approved ratings of a product from precomputed aggregates.
   - Moderate reviews by approving or rejecting them.
   - Fetch all reviews pending moderation.
+  - Share the moderation work through a leased queue: each moderator claims
+    a batch of pending reviews that nobody else receives until its lease
+    expires, then submits the decisions in bulk.
 
 - **Logging**:
   - Logs all review-related operations for monitoring and debugging.
@@ -46,12 +50,18 @@ Routes
   Delete a review by its ID.
 - **GET /reviews/product/{product_id}**:
   Retrieve reviews for a specific product.
+- **GET /reviews/product/{product_id}/summary**:
+  Retrieve the review count, average rating and star histogram of a product.
 - **GET /reviews/customer/{customer_id}**:
   Retrieve reviews submitted by a specific customer.
 - **PUT /reviews/{review_id}/moderate**:
   Approve or reject a review (admin only).
 - **GET /reviews/pending**:
   Retrieve all reviews pending moderation (admin only).
+- **POST /reviews/moderation/claim**:
+  Lease the next pending reviews (admin only).
+- **POST /reviews/moderation/complete**:
+  Approve or reject leased reviews in bulk (admin only).
 
 Dependencies
 ------------
@@ -170,6 +180,23 @@ def get_product_reviews(product_id: int, db: Session = Depends(get_db)):
     logging.info(f"Product reviews retrieved for product_id={product_id}: {len(reviews)} reviews")
     return reviews
 
+@router.get("/reviews/product/{product_id}/summary", dependencies=[Depends(get_current_user)])
+def get_product_rating_summary(product_id: int, db: Session = Depends(get_db)):
+    """
+    Retrieve the rating summary of a specific product.
+
+    Args:
+        product_id (int): The ID of the product.
+        db (Session): The database session dependency.
+
+    Returns:
+        dict: The number of approved reviews, their average rating and the number of reviews per star.
+    """
+    logging.info(f"GET /reviews/product/{product_id}/summary")
+    summary = review_service.get_rating_summary(db, product_id)
+    logging.info(f"Rating summary retrieved for product_id={product_id}: {summary['count']} reviews")
+    return summary
+
 @router.get("/reviews/customer/{customer_id}", dependencies=[Depends(get_current_user)])
 def get_customer_reviews(customer_id: int, db: Session = Depends(get_db)):
     """
@@ -240,3 +267,89 @@ def get_pending_reviews_route(db: Session = Depends(get_db)):
     except Exception as e:
         logging.error(f"Error fetching pending reviews: {e}")
         raise HTTPException(status_code=400, detail=str(e))
+
+class ModerationClaimRequest(BaseModel):
+    """
+    Schema for a moderation queue claim.
+
+    Attributes:
+        limit (int): The number of reviews to lease.
+        lease_seconds (int): How long the reviews stay leased.
+    """
+    limit: int = DEFAULT_CLAIM_SIZE
+    lease_seconds: int = MODERATION_LEASE_SECONDS
+
+class ModerationDecision(BaseModel):
+    """
+    Schema for one moderation decision.
+
+    Attributes:
+        review_id (int): The ID of the leased review.
+        status (str): The moderation status ('Approved' or 'Rejected').
+    """
+    review_id: int
+    status: str
+
+class ModerationCompleteRequest(BaseModel):
+    """
+    Schema for a bulk moderation request.
+
+    Attributes:
+        lease_id (str): The lease the reviews were claimed under.
+        decisions (list[ModerationDecision]): One decision per review.
+    """
+    lease_id: str
+    decisions: list[ModerationDecision]
+
+@router.post("/reviews/moderation/claim", dependencies=[Depends(require_admin)])
+def claim_reviews_route(request: ModerationClaimRequest, db: Session = Depends(get_db)):
+    """
+    Lease the next pending reviews to the calling moderator.
+
+    Args:
+        request (ModerationClaimRequest): The number of reviews and the lease duration.
+        db (Session): The database session dependency.
+
+    Returns:
+        dict: The lease ID, its expiry time and the leased reviews.
+
+    Raises:
+        HTTPException: If the limit or the lease duration is out of range.
+    """
+    logging.info(f"POST /reviews/moderation/claim - Limit: {request.limit}, Lease: {request.lease_seconds}s")
+    try:
+        lease = review_service.claim_reviews(db, request.limit, request.lease_seconds)
+        logging.info(f"Reviews claimed under lease {lease['lease_id']}: {len(lease['reviews'])} reviews")
+        return lease
+    except ValueError as e:
+        logging.error(f"Error claiming reviews: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/reviews/moderation/complete", dependencies=[Depends(require_admin)])
+def complete_reviews_route(request: ModerationCompleteRequest, db: Session = Depends(get_db)):
+    """
+    Approve or reject reviews leased by `POST /reviews/moderation/claim`.
+
+    Decisions on reviews whose lease expired or is held by another claim are
+    refused and reported; the others are applied together.
+
+    Args:
+        request (ModerationCompleteRequest): The lease ID and the decisions.
+        db (Session): The database session dependency.
+
+    Returns:
+        dict: The IDs of the moderated reviews and the refused decisions.
+
+    Raises:
+        HTTPException: If a status is invalid or the decisions cannot be saved.
+    """
+    logging.info(f"POST /reviews/moderation/complete - Lease: {request.lease_id}, Decisions: {len(request.decisions)}")
+    try:
+        result = review_service.complete_reviews(
+            db, request.lease_id, [decision.model_dump() for decision in request.decisions]
+        )
+        logging.info(f"Reviews moderated under lease {request.lease_id}: {len(result['completed'])} completed, {len(result['failed'])} refused")
+        return result
+    except ValueError as e:
+        logging.error(f"Error completing reviews under lease {request.lease_id}: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,10 +1,23 @@
 import os
+import json
 import logging
-from fastapi import APIRouter, Depends, HTTPException
+import tempfile
+from datetime import date, datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from database import get_db
-from services.sales_service import SalesService
-from dependencies.auth_dependency import get_current_user
+from services.sales_service import (
+    SalesService, DEFAULT_HISTORY_PAGE_SIZE, DEFAULT_STATS_LIMIT, DEFAULT_TOP_ITEMS, MAX_HISTORY_PAGE_SIZE,
+    MAX_STATS_LIMIT, MAX_TOP_ITEMS, SALES_BATCH_CHUNK_SIZE,
+)
+from services.idempotency_service import IdempotencyService
+from services.sales_export import EXPORT_MEDIA_TYPES, export_sales, resolve_format
+from routes.streaming import read_ndjson_lines
+from dependencies.auth_dependency import get_current_user, require_admin
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
@@ -19,9 +32,21 @@ Features
 
 - **Sales Management**:
   - Create new sales records.
-  - Retrieve sales by customer or item.
+  - Record batches of sales sent as a JSON array or NDJSON.
+  - Purchase an item for a customer at its catalog price, taking the stock
+    and debiting the wallet in the same operation.
+  - Retrieve sales by customer or item, archived months included.
+  - Page through a customer's purchase history with item details.
   - Update existing sales records.
   - Delete specific sales records.
+  - Aggregate revenue, units and buyers per item, customer or period.
+  - Read per-item and per-customer totals from daily rollups.
+  - Rank the best-selling items of the last 24 hours, 7 days or 30 days.
+  - Export the sales table to an Arrow or NumPy file for offline analytics.
+
+- **Idempotency**:
+  - Sales created with an `Idempotency-Key` header are recorded once; retries
+    with the same key from the same caller replay the first response.
 
 - **Logging**:
   - Logs all sales-related operations for auditing and debugging.
@@ -37,11 +62,33 @@ Routes
 ------
 
 - **POST /sales**:
-  Create a new sale record.
+  Create a new sale record. Accepts an `Idempotency-Key` header.
+- **POST /sales/purchase**:
+  Sell units of an item to a customer. Accepts an `Idempotency-Key` header.
+- **GET /sales/stats**:
+  Aggregate sales per item, customer, day, week or month over a time range,
+  including archived months (admin only).
+- **GET /sales/top-items**:
+  Retrieve the best-selling items of a time window by units or revenue.
+- **GET /sales/rollups/{by}**:
+  Read item or customer totals, or the daily series of one of them, from the daily rollups (admin only).
+- **GET /sales/export**:
+  Download the sales, optionally within a time range and archived months
+  included, as an Arrow IPC or NumPy `.npz` file (admin only).
+- **POST /sales/batch**:
+  Record many sales in one request, with one result (ID or error) per row.
+- **GET /sales/partitions**:
+  List the months of sales moved to archive files (admin only).
 - **GET /sales/customer/{customer_id}**:
-  Retrieve all sales records for a specific customer.
+  Retrieve the sales records of a specific customer, optionally within a time
+  range, including archived months.
+- **GET /sales/customer/{customer_id}/history**:
+  Retrieve a page of a customer's sales, newest first, with the name, category
+  and price of each item. The cursor of the next page is returned in the
+  `X-Next-Cursor` response header.
 - **GET /sales/item/{item_id}**:
-  Retrieve all sales records for a specific item.
+  Retrieve the sales records of a specific item, optionally within a time
+  range, including archived months.
 - **DELETE /sales/{sale_id}**:
   Delete a specific sale record by ID.
 - **PUT /sales/{sale_id}**:
@@ -71,15 +118,24 @@ logging.basicConfig(
 limiter = Limiter(key_func=get_remote_address)
 router = APIRouter()
 sales_service = SalesService()
-
-@router.post("/sales", dependencies=[Depends(get_current_user)])
-def create_sale(data: dict, db: Session = Depends(get_db)):
+idempotency_service = IdempotencyService()
+
+@router.post("/sales")
+def create_sale(
+    data: dict,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    current_user: dict = Depends(get_current_user),
+):
     """
     Create a new sale record.
 
     Args:
         data (dict): The sale data including customer ID, item ID, and sale amount.
         db (Session): The database session dependency.
+        idempotency_key (str, optional): The `Idempotency-Key` header; retries
+            with the same key return the first response without recording another sale.
+        current_user (dict): The authenticated caller; idempotency keys are scoped to it.
 
     Returns:
         dict: A success message and the created sale record.
@@ -88,51 +144,388 @@ def create_sale(data: dict, db: Session = Depends(get_db)):
         HTTPException: If the sale creation fails.
     """
     logging.info(f"POST /sales - Data: {data}")
+
+    def create():
+        try:
+            new_sale = sales_service.create_sale(db, data)
+            logging.info(f"Sale created: {new_sale}")
+            return {"message": "Sale created successfully", "sale": new_sale}
+        except ValueError as e:
+            logging.error(f"Error creating sale: {e}")
+            raise HTTPException(status_code=400, detail=str(e))
+
+    if idempotency_key:
+        return idempotency_service.run(db, idempotency_key, "POST /sales", current_user["sub"], data, create)
+    return create()
+
+@router.post("/sales/batch", dependencies=[Depends(get_current_user)])
+async def create_sales_batch(request: Request, db: Session = Depends(get_db)):
+    """
+    Record many sales in one request.
+
+    The body is either a JSON array of sales or, with an
+    `application/x-ndjson` content type, one sale per line, read as it
+    arrives. Each sale has the `POST /sales` fields. Rows are validated and
+    inserted in chunks of `SALES_BATCH_CHUNK_SIZE`, with one executemany and
+    one commit per chunk; invalid rows are reported without rejecting the
+    rest.
+
+    Args:
+        request (Request): The incoming request.
+        db (Session): The database session dependency.
+
+    Returns:
+        dict: The number of created and rejected sales, and one result per row
+        (`{"row", "id"}` or `{"row", "error"}`, rows numbered from 1).
+
+    Raises:
+        HTTPException: If a JSON body is not a valid array.
+    """
+    logging.info(f"POST /sales/batch - Content-Type: {request.headers.get('content-type')}")
+
+    async def each(rows):
+        for row in rows:
+            yield row
+
+    if "ndjson" in request.headers.get("content-type", ""):
+        rows = read_ndjson_lines(request)
+    else:
+        body = await request.body()
+        if body.lstrip().startswith(b"["):
+            try:
+                sales = json.loads(body)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid JSON array: {e}")
+            if not isinstance(sales, list):
+                raise HTTPException(status_code=400, detail="Expected a JSON array of sales")
+            rows = each(enumerate(sales, start=1))
+        else:
+            lines = enumerate(body.decode("utf-8", errors="replace").split("\n"), start=1)
+            rows = each((number, line) for number, line in lines if line.strip())
+
+    results = []
+
+    async def flush(batch):
+        try:
+            results.extend(await run_in_threadpool(sales_service.create_sales_batch, db, batch))
+        except ValueError as e:
+            logging.error(f"Error creating sales batch: {e}")
+            results.extend({"row": row, "error": str(e)} for row, _ in batch)
+
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= SALES_BATCH_CHUNK_SIZE:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+
+    created = sum(1 for result in results if "id" in result)
+    logging.info(f"Sales batch recorded: {created} created, {len(results) - created} failed")
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+@router.post("/sales/purchase")
+def purchase(
+    data: dict,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Sell units of an item to a customer at the item's catalog price.
+
+    Args:
+        data (dict): The 'username' of the customer, the 'item_id' and an optional 'quantity' (default 1).
+        db (Session): The database session dependency.
+        idempotency_key (str, optional): The `Idempotency-Key` header; retries
+            with the same key return the first response without buying again.
+        current_user (dict): The authenticated caller; idempotency keys are scoped to it.
+
+    Returns:
+        dict: A success message and the recorded sale.
+
+    Raises:
+        HTTPException: If a field is missing (422), the customer or item is not
+            found (404), the stock or balance is insufficient (400), or another
+            service is unavailable (503).
+    """
+    logging.info(f"POST /sales/purchase - Data: {data}")
+
+    def buy():
+        try:
+            sale = sales_service.purchase(db, data["username"], data["item_id"], data.get("quantity", 1))
+            logging.info(f"Purchase completed: {sale}")
+            return {"message": "Purchase completed successfully", "sale": sale}
+        except KeyError as e:
+            raise HTTPException(status_code=422, detail=f"Missing {e} in request data")
+        except ValueError as e:
+            logging.error(f"Purchase failed: {e}")
+            raise HTTPException(status_code=404 if str(e).endswith("not found") else 400, detail=str(e))
+        except Exception as e:
+            logging.error(f"Purchase failed: {e}")
+            raise HTTPException(status_code=503, detail=str(e))
+
+    if idempotency_key:
+        return idempotency_service.run(db, idempotency_key, "POST /sales/purchase", current_user["sub"], data, buy)
+    return buy()
+
+@router.get("/sales/stats", dependencies=[Depends(require_admin)])
+def get_sales_stats(
+    group_by: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(DEFAULT_STATS_LIMIT, ge=1, le=MAX_STATS_LIMIT),
+    db: Session = Depends(get_db),
+):
+    """
+    Aggregate sales per item, customer, day, week or month.
+
+    Args:
+        group_by (str): item, customer, day, week or month.
+        start (datetime, optional): Only sales at or after this time (UTC).
+        end (datetime, optional): Only sales before this time (UTC).
+        limit (int): The maximum number of groups returned.
+        db (Session): The database session dependency.
+
+    Returns:
+        list: One entry per group with its key, revenue, units, sales and distinct buyers.
+
+    Raises:
+        HTTPException: If the grouping or the time range is invalid, or an
+        archive file cannot be read.
+    """
+    logging.info(f"GET /sales/stats - group_by={group_by} start={start} end={end} limit={limit}")
     try:
-        new_sale = sales_service.create_sale(db, data)
-        logging.info(f"Sale created: {new_sale}")
-        return {"message": "Sale created successfully", "sale": new_sale}
+        return sales_service.get_sales_stats(db, group_by, start, end, limit)
     except ValueError as e:
-        logging.error(f"Error creating sale: {e}")
+        logging.error(f"Error computing sales statistics: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/sales/top-items", dependencies=[Depends(get_current_user)])
+def get_top_items(
+    window: str = "24h",
+    limit: int = Query(DEFAULT_TOP_ITEMS, ge=1, le=MAX_TOP_ITEMS),
+    by: str = "units",
+):
+    """
+    Retrieve the best-selling items of a time window.
+
+    The ranking is served from in-memory counters, without querying the database.
+
+    Args:
+        window (str): 24h, 7d or 30d.
+        limit (int): The maximum number of items returned.
+        by (str): Rank by units or revenue.
+
+    Returns:
+        list: The items with their units, revenue and number of sales, best first.
+
+    Raises:
+        HTTPException: If the window or the ranking is invalid.
+    """
+    try:
+        return sales_service.get_top_items(window, limit, by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/sales/rollups/{by}", dependencies=[Depends(require_admin)])
+def get_sales_rollups(
+    by: str,
+    id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = Query(DEFAULT_STATS_LIMIT, ge=1, le=MAX_STATS_LIMIT),
+    db: Session = Depends(get_db),
+):
+    """
+    Read sales totals per item or customer from the daily rollups.
+
+    Args:
+        by (str): item or customer.
+        id (int, optional): The item or customer to return the daily series of.
+        start (date, optional): The first day included (UTC).
+        end (date, optional): The first day excluded (UTC).
+        limit (int): The maximum number of rows returned.
+        db (Session): The database session dependency.
+
+    Returns:
+        list: One entry per item, customer or day with its revenue, units and sales.
+
+    Raises:
+        HTTPException: If the dimension or the date range is invalid.
+    """
+    logging.info(f"GET /sales/rollups/{by} - id={id} start={start} end={end} limit={limit}")
+    try:
+        return sales_service.get_rollup_totals(db, by, start, end, id, limit)
+    except ValueError as e:
+        logging.error(f"Error reading sales rollups: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/sales/partitions", dependencies=[Depends(require_admin)])
+def get_sales_partitions(db: Session = Depends(get_db)):
+    """
+    List the months of sales moved to archive files.
+
+    Args:
+        db (Session): The database session dependency.
+
+    Returns:
+        list: The archived months with their time range, file and number of sales.
+    """
+    logging.info("GET /sales/partitions")
+    return sales_service.get_partitions(db)
+
+@router.get("/sales/export", dependencies=[Depends(require_admin)])
+def export_sales_file(
+    format: str = "auto",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Export the sales to a columnar file.
+
+    The file is written chunk by chunk to a temporary file, streamed to the
+    client, then deleted.
+
+    Args:
+        format (str): auto, arrow or npz; auto prefers Arrow when pyarrow is installed.
+        start (datetime, optional): Only sales at or after this time (UTC).
+        end (datetime, optional): Only sales before this time (UTC).
+        db (Session): The database session dependency.
+
+    Returns:
+        FileResponse: The export file.
+
+    Raises:
+        HTTPException: If the format or the time range is invalid (400), or
+        the library the format needs is not installed (501).
+    """
+    logging.info(f"GET /sales/export - format={format} start={start} end={end}")
+    try:
+        export_format = resolve_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    export_file = tempfile.NamedTemporaryFile(suffix=f".{export_format}", delete=False)
+    path = export_file.name
+    try:
+        with export_file:
+            rows = export_sales(db, export_file, export_format, start, end)
+    except ValueError as e:
+        os.remove(path)
+        logging.error(f"Error exporting sales: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        os.remove(path)
+        raise
+    logging.info(f"Exported {rows} sales as {export_format}")
+    return FileResponse(
+        path,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        filename=f"sales.{export_format}",
+        headers={"X-Row-Count": str(rows)},
+        background=BackgroundTask(os.remove, path),
+    )
+
 @router.get("/sales/customer/{customer_id}", dependencies=[Depends(get_current_user)])
-def get_sales_by_customer(customer_id: int, db: Session = Depends(get_db)):
+def get_sales_by_customer(
+    customer_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
     """
     Retrieve sales for a specific customer.
 
     Args:
         customer_id (int): The ID of the customer.
+        start (datetime, optional): Only sales at or after this time (UTC).
+        end (datetime, optional): Only sales before this time (UTC); archived
+            months outside the range are not read.
         db (Session): The database session dependency.
 
     Returns:
         list: A list of sales records associated with the customer.
 
     Raises:
-        HTTPException: If no sales records are found for the customer.
+        HTTPException: If the sales cannot be read.
     """
-    logging.info(f"GET /sales/customer/{customer_id}")
-    sales = sales_service.get_sales_by_customer(db, customer_id)
+    logging.info(f"GET /sales/customer/{customer_id} - start={start} end={end}")
+    try:
+        sales = sales_service.get_sales_by_customer(db, customer_id, start, end)
+    except ValueError as e:
+        logging.error(f"Error retrieving sales: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
     logging.info(f"Sales retrieved for customer_id={customer_id}: {len(sales)} sales")
     return sales
 
+@router.get("/sales/customer/{customer_id}/history", dependencies=[Depends(get_current_user)])
+def get_customer_history(
+    customer_id: int,
+    response: Response,
+    limit: int = Query(DEFAULT_HISTORY_PAGE_SIZE, ge=1, le=MAX_HISTORY_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieve a page of a customer's purchase history, newest first.
+
+    Args:
+        customer_id (int): The ID of the customer.
+        response (Response): The outgoing response, used to set the `X-Next-Cursor` header.
+        limit (int): The page size.
+        cursor (str, optional): The `X-Next-Cursor` value of the previous page.
+        db (Session): The database session dependency.
+
+    Returns:
+        list: The sales with their item name, category and price.
+
+    Raises:
+        HTTPException: If the cursor is invalid.
+    """
+    logging.info(f"GET /sales/customer/{customer_id}/history - limit={limit} cursor={cursor}")
+    try:
+        history, next_cursor = sales_service.get_customer_history(db, customer_id, limit, cursor)
+    except ValueError as e:
+        logging.error(f"Error retrieving purchase history: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return history
+
 @router.get("/sales/item/{item_id}", dependencies=[Depends(get_current_user)])
-def get_sales_by_item(item_id: int, db: Session = Depends(get_db)):
+def get_sales_by_item(
+    item_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
     """
     Retrieve sales for a specific item.
 
     Args:
         item_id (int): The ID of the item.
+        start (datetime, optional): Only sales at or after this time (UTC).
+        end (datetime, optional): Only sales before this time (UTC); archived
+            months outside the range are not read.
         db (Session): The database session dependency.
 
     Returns:
         list: A list of sales records associated with the item.
 
     Raises:
-        HTTPException: If no sales records are found for the item.
+        HTTPException: If the sales cannot be read.
     """
-    logging.info(f"GET /sales/item/{item_id}")
-    sales = sales_service.get_sales_by_item(db, item_id)
+    logging.info(f"GET /sales/item/{item_id} - start={start} end={end}")
+    try:
+        sales = sales_service.get_sales_by_item(db, item_id, start, end)
+    except ValueError as e:
+        logging.error(f"Error retrieving sales: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
     logging.info(f"Sales retrieved for item_id={item_id}: {len(sales)} sales")
     return sales
 
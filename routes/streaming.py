@@ -0,0 +1,32 @@
+from fastapi import Request
+
+"""
+Streaming Request Helpers
+=========================
+
+Helpers shared by the routes that accept large request bodies, so that the
+bodies are processed as they arrive instead of being read into memory first.
+
+Functions
+---------
+
+- `read_ndjson_lines(request: Request)`:
+    Yields the non-empty lines of an NDJSON request body with their line numbers.
+"""
+
+
+async def read_ndjson_lines(request: Request):
+    """
+    Yields (line number, line) for every non-empty line of an NDJSON request body as it arrives.
+    """
+    buffer = b""
+    line_number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, line.decode("utf-8", errors="replace")
+    if buffer.strip():
+        yield line_number + 1, buffer.decode("utf-8", errors="replace")
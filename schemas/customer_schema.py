@@ -25,3 +25,15 @@ class CustomerResponse(CustomerBase):
     class Config:
         orm_mode = True
         from_attributes = True
+
+
+class CustomerPublic(CustomerResponse):
+    full_name: str
+    age: int
+    address: str
+    gender: str
+    marital_status: str
+
+    class Config:
+        orm_mode = True
+        from_attributes = True
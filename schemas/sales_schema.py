@@ -0,0 +1,13 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, Field
+
+class SaleCreate(BaseModel):
+    customer_id: int
+    item_id: int
+    amount: float
+    quantity: int = Field(1, ge=1)
+    created_at: Optional[datetime] = None
+
+    class Config:
+        extra = "forbid"
@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+from datetime import date
+
+"""
+Sales Archival
+==============
+
+Moves closed months of sales out of the `sales` table into compacted,
+read-only SQLite files, one per month, that the sales API still reads when a
+request's time range overlaps them. Run it periodically, e.g. monthly from
+cron.
+
+The archive directory (`--archive-dir`, SALES_ARCHIVE_DIR) must be an
+absolute path that every sales process mounts at the same place, e.g. the
+`sales_archive` volume of docker-compose.yml at /var/lib/sales-archive, since
+the catalogue records where each file was written and the API reads it from
+there.
+
+Usage
+-----
+
+    python scripts/archive_sales.py --keep-months 12
+    python scripts/archive_sales.py --month 2024-01 --archive-dir /var/lib/sales-archive
+    python scripts/archive_sales.py --keep-months 12 --vacuum
+"""
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import text
+from database import Base, SessionLocal, engine, upgrade_schema
+from services.sales_service import SALES_ARCHIVE_DIR, SALES_ARCHIVE_KEEP_MONTHS, SalesService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive closed months of sales.")
+    parser.add_argument("--keep-months", type=int, default=SALES_ARCHIVE_KEEP_MONTHS,
+                        help="Past months kept in the sales table.")
+    parser.add_argument("--month", type=lambda value: date.fromisoformat(f"{value}-01"),
+                        help="Archive only this month, e.g. 2024-01.")
+    parser.add_argument("--archive-dir", default=SALES_ARCHIVE_DIR,
+                        help="Absolute directory shared by every sales process.")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="Reclaim the space of the archived sales (SQLite only).")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    service = SalesService()
+    db = SessionLocal()
+    try:
+        if args.month:
+            partitions = [service.archive_month(db, args.month, args.archive_dir)]
+        else:
+            partitions = service.archive_sales(db, args.keep_months, args.archive_dir)
+        for partition in partitions:
+            print(f"{partition.month}: {partition.row_count} sales -> {partition.path}")
+    except ValueError as e:
+        parser.exit(1, f"Archival failed: {e}\n")
+    finally:
+        db.close()
+    print(f"Archived {len(partitions)} months")
+
+    if args.vacuum and partitions and engine.dialect.name == "sqlite":
+        with engine.connect() as connection:
+            connection.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+        print("Vacuumed the sales database")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+"""
+Sales Export
+============
+
+Exports the `sales` table, optionally within a time range, to an Arrow IPC
+file or a NumPy `.npz` archive for offline analytics. Rows are read in chunks,
+so memory stays bounded whatever the size of the table.
+
+Usage
+-----
+
+    python scripts/export_sales.py sales.arrow
+    python scripts/export_sales.py sales.npz --format npz --start 2025-01-01 --end 2025-02-01
+"""
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import SessionLocal
+from services.sales_export import EXPORT_CHUNK_SIZE, export_sales
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the sales to a columnar file.")
+    parser.add_argument("output", help="Path of the file to write.")
+    parser.add_argument("--format", default="auto", choices=["auto", "arrow", "npz"])
+    parser.add_argument("--start", type=datetime.fromisoformat, help="Only sales at or after this time (UTC).")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="Only sales before this time (UTC).")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    start = time.perf_counter()
+    try:
+        with open(args.output, "wb") as output:
+            rows = export_sales(db, output, args.format, args.start, args.end, args.chunk_size)
+    except (ValueError, RuntimeError) as e:
+        os.remove(args.output)
+        parser.exit(1, f"Export failed: {e}\n")
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - start
+    print(f"Exported {rows} sales to {args.output} in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import os
+import sys
+
+"""
+Review Import
+=============
+
+Imports reviews from a newline-delimited JSON file, one review per line in
+the `POST /reviews` format. Lines are validated and inserted in chunks, and
+the comments of each chunk are sanitized in a pool of worker processes.
+Imported reviews are pending moderation.
+
+Usage
+-----
+
+    python scripts/import_reviews.py reviews.ndjson
+    python scripts/import_reviews.py reviews.ndjson --chunk-size 20000 --workers 4
+"""
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import Base, SessionLocal, engine, upgrade_schema
+from services.review_service import ReviewService
+
+MAX_REPORTED_FAILURES = 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import reviews from an NDJSON file.")
+    parser.add_argument("path", help="The NDJSON file to import.")
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="Reviews per transaction.")
+    parser.add_argument("--workers", type=int, help="Sanitizer processes; defaults to SANITIZE_WORKERS or the CPU count.")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    service = ReviewService()
+    db = SessionLocal()
+    imported = 0
+    failures = []
+
+    def flush(batch):
+        nonlocal imported
+        count, errors = service.import_review_batch(db, batch, args.workers)
+        imported += count
+        failures.extend(errors)
+
+    try:
+        with open(args.path, encoding="utf-8") as source:
+            batch = []
+            for line_number, line in enumerate(source, start=1):
+                if line.strip():
+                    batch.append((line_number, line))
+                if len(batch) >= args.chunk_size:
+                    flush(batch)
+                    batch = []
+            if batch:
+                flush(batch)
+    except ValueError as e:
+        parser.exit(1, f"Import failed after {imported} reviews: {e}\n")
+    finally:
+        db.close()
+    for failure in failures[:MAX_REPORTED_FAILURES]:
+        print(f"line {failure['line']}: {failure['error']}")
+    print(f"Imported {imported} reviews, {len(failures)} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+
+"""
+Rating Stats Rebuild
+====================
+
+Recomputes the per-product rating aggregates from the reviews table, e.g.
+after reviews were changed without going through `ReviewService`. The review
+service fills an empty aggregates table at startup; run this instead when a
+database was upgraded while reviews were already being approved.
+
+Usage
+-----
+
+    python scripts/rebuild_rating_stats.py
+    python scripts/rebuild_rating_stats.py --product-id 42
+"""
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import Base, SessionLocal, engine, upgrade_schema
+from services.review_service import ReviewService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the product rating aggregates.")
+    parser.add_argument("--product-id", type=int, help="Only rebuild this product.")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    db = SessionLocal()
+    try:
+        written = ReviewService().rebuild_rating_stats(db, args.product_id)
+    except ValueError as e:
+        parser.exit(1, f"Rebuild failed: {e}\n")
+    finally:
+        db.close()
+    print(f"Rebuilt the rating stats of {written} products")
+
+
+if __name__ == "__main__":
+    main()
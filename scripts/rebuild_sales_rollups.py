@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+from datetime import date
+
+"""
+Sales Rollup Rebuild
+====================
+
+Recomputes the per-item and per-customer daily sales rollups from the sales
+table, e.g. after a backfill or a bulk import that bypassed `SalesService`.
+
+Usage
+-----
+
+    python scripts/rebuild_sales_rollups.py
+    python scripts/rebuild_sales_rollups.py --start 2025-01-01 --end 2025-02-01
+"""
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import Base, SessionLocal, engine, upgrade_schema
+from services.sales_service import SalesService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the daily sales rollups.")
+    parser.add_argument("--start", type=date.fromisoformat, help="First day rebuilt (UTC), e.g. 2025-01-01.")
+    parser.add_argument("--end", type=date.fromisoformat, help="First day not rebuilt (UTC).")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    db = SessionLocal()
+    try:
+        written = SalesService().rebuild_rollups(db, args.start, args.end)
+    finally:
+        db.close()
+    print(f"Rebuilt {written} rollup rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,10 @@ from fastapi import HTTPException
 from pydantic import BaseModel
 from models.customer import Customer
 from database import SessionLocal
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from schemas.customer_schema import CustomerResponse
+from services.customer_service import record_wallet_entry, to_cents, username_cache, username_filter, username_may_exist
 from decouple import config
 
 """
@@ -23,6 +25,7 @@ Features
 
 - **User Management**:
   - Register new users in the database.
+  - Check username availability against the unique username index.
   - Authenticate users and generate access tokens.
 
 Classes
@@ -36,6 +39,7 @@ Classes
   - Creating access tokens.
   - Verifying tokens.
   - Registering new users.
+  - Checking username availability.
   - Logging in users.
 
 Environment Variables
@@ -88,6 +92,9 @@ class AuthService:
         register(db: Session, customer_data: dict):
             Registers a new customer in the database.
         
+        is_username_available(db: Session, username: str) -> bool:
+            Checks whether a username is free to register.
+        
         login(username: str, password: str):
             Authenticates a user and generates an access token.
     """
@@ -135,6 +142,11 @@ class AuthService:
         """
         Registers a new customer in the database.
 
+        The existing username query is skipped when the username filter says
+        the name is definitely free. The filter only knows the names added in
+        this process, so the unique constraint on the username column is what
+        rejects a duplicate that slips through.
+
         Args:
             db (Session): The database session.
             customer_data (dict): The customer data to register.
@@ -145,16 +157,44 @@ class AuthService:
         Raises:
             HTTPException: If the username already exists.
         """
-        existing_customer = db.query(Customer).filter(Customer.username == customer_data['username']).first()
-        if existing_customer:
-            raise HTTPException(status_code=400, detail="Username already exists")
+        username = customer_data['username']
+        if username_may_exist(username):
+            existing_customer = db.query(Customer.id).filter(Customer.username == username).first()
+            if existing_customer:
+                raise HTTPException(status_code=400, detail="Username already exists")
 
         new_customer = Customer(**customer_data)
         db.add(new_customer)
-        db.commit()
+        try:
+            if new_customer.wallet_balance:
+                db.flush()
+                record_wallet_entry(db, new_customer.id, to_cents(new_customer.wallet_balance), "opening")
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Username already exists")
         db.refresh(new_customer)
+        username_filter.add(username)
+        username_cache.invalidate(username)
         return new_customer
 
+    def is_username_available(self, db: Session, username: str):
+        """
+        Checks whether a username is free to register.
+
+        Always answered by the username index: the username filter is loaded
+        with every name at startup, but may be missing the names registered
+        by other apps and workers sharing the database since then.
+
+        Args:
+            db (Session): The database session.
+            username (str): The username to check.
+
+        Returns:
+            bool: True if no customer has the username.
+        """
+        return db.query(Customer.id).filter(Customer.username == username).first() is None
+
     def login(self, username: str, password: str):
         """
         Authenticates a user and generates an access token.
@@ -0,0 +1,131 @@
+import hashlib
+import math
+import threading
+
+"""
+Bloom Filter Module
+===================
+
+This module provides a probabilistic set used by the service classes to
+answer "does this value exist?" without a database round trip.
+
+Classes
+-------
+
+- **CountingBloomFilter**:
+  A thread-safe Bloom filter with one small counter per slot instead of one
+  bit, so values can be removed as well as added. A negative answer is always
+  correct; a positive answer is wrong with roughly the configured error rate
+  while the filter holds no more than its capacity.
+"""
+
+
+class CountingBloomFilter:
+    """
+    A Bloom filter that supports removal through 8-bit counters.
+
+    Counters that reach 255 are never decremented again, which keeps removals
+    from ever producing a false negative.
+
+    Attributes:
+        capacity (int): The number of values the filter is sized for.
+        error_rate (float): The target false positive rate at capacity.
+        size (int): The number of counters.
+        hash_count (int): The number of counters set per value.
+        loaded (bool): Whether the filter holds every existing value.
+
+    Methods:
+        add(value): Adds a value.
+        remove(value): Removes a value previously added.
+        might_contain(value): Returns False if the value was definitely never added.
+        clear(): Removes every value.
+        stats(): Returns the filter counters.
+    """
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.loaded = False
+        self._counters = bytearray(self.size)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, value: str):
+        """
+        Returns the counter positions of a value, derived from one digest by double hashing.
+        """
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, value: str):
+        """
+        Adds a value to the filter.
+
+        Args:
+            value (str): The value to add.
+        """
+        positions = self._positions(value)
+        with self._lock:
+            for position in positions:
+                if self._counters[position] < 255:
+                    self._counters[position] += 1
+            self._count += 1
+
+    def remove(self, value: str):
+        """
+        Removes a value previously added to the filter.
+
+        Args:
+            value (str): The value to remove.
+        """
+        positions = self._positions(value)
+        with self._lock:
+            if any(self._counters[position] == 0 for position in positions):
+                return
+            for position in positions:
+                if self._counters[position] < 255:
+                    self._counters[position] -= 1
+            self._count -= 1
+
+    def might_contain(self, value: str) -> bool:
+        """
+        Checks whether a value may have been added to the filter.
+
+        Args:
+            value (str): The value to look up.
+
+        Returns:
+            bool: False if the value was definitely never added, True otherwise.
+        """
+        counters = self._counters
+        return all(counters[position] for position in self._positions(value))
+
+    def clear(self):
+        """
+        Removes every value from the filter.
+        """
+        with self._lock:
+            self._counters = bytearray(self.size)
+            self._count = 0
+            self.loaded = False
+
+    def stats(self) -> dict:
+        """
+        Returns the filter counters.
+
+        Returns:
+            dict: The number of values, the capacity, and the expected false positive rate.
+        """
+        with self._lock:
+            count = self._count
+        expected = (1 - math.exp(-self.hash_count * count / self.size)) ** self.hash_count
+        return {
+            "count": count,
+            "capacity": self.capacity,
+            "size": self.size,
+            "hash_count": self.hash_count,
+            "false_positive_rate": expected,
+        }
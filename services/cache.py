@@ -0,0 +1,138 @@
+from collections import OrderedDict
+import threading
+import time
+
+"""
+Cache Module
+============
+
+This module provides a small in-process cache used by the service classes to
+avoid repeated database lookups for rows that are read far more often than
+they are written.
+
+Classes
+-------
+
+- **TTLCache**:
+  A thread-safe cache bounded both in size (least recently used entries are
+  evicted first) and in age (entries expire after a fixed time to live). It
+  keeps hit, miss, eviction and expiration counters for monitoring, and a
+  generation counter that lets a slow load detect an invalidation that
+  happened while it was reading.
+"""
+
+
+class TTLCache:
+    """
+    A thread-safe LRU cache whose entries expire after a time to live.
+
+    Attributes:
+        maxsize (int): The maximum number of entries kept in the cache.
+        ttl (float): The number of seconds an entry stays valid.
+        generation (int): Incremented by every invalidation.
+
+    Methods:
+        get(key, default=None): Returns a cached value, or `default` on a miss.
+        set(key, value, generation=None): Stores a value, evicting the least recently used entry if full.
+        invalidate(key): Removes a single entry.
+        clear(): Removes every entry.
+        stats(): Returns the cache counters.
+    """
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.generation = 0
+
+    def get(self, key, default=None):
+        """
+        Returns a cached value and marks it as most recently used.
+
+        Args:
+            key: The cache key.
+            default: The value returned when the key is missing or expired.
+
+        Returns:
+            The cached value, or `default`.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, generation: int = None):
+        """
+        Stores a value, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key: The cache key.
+            value: The value to cache.
+            generation (int, optional): The `generation` read before the value
+                was loaded. The value is not stored if anything was
+                invalidated since, as it may predate that write.
+
+        Returns:
+            bool: Whether the value was stored.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, key):
+        """
+        Removes a single entry from the cache.
+
+        Args:
+            key: The cache key.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self.generation += 1
+
+    def clear(self):
+        """
+        Removes every entry from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The size, hit, miss, eviction and expiration counts and the hit ratio.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -1,6 +1,19 @@
+from datetime import datetime
+from sqlalchemy import and_, exists, func, insert, literal, select, update, DateTime
+from sqlalchemy.dialects import postgresql, sqlite
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
-from models.customer import Customer
+from sqlalchemy.orm.exc import StaleDataError
+from models.customer import Customer, WalletLedgerEntry, WalletSnapshot
+from schemas.customer_schema import CustomerCreate
 from memory_profiler import profile
+from database import SessionLocal
+from decouple import config
+from services.bloom import CountingBloomFilter
+from services.cache import TTLCache
+import logging
+import threading
 import pybreaker
 import requests
 
@@ -21,7 +34,33 @@ Features
   - Fetch customers by username or retrieve all customers.
 
 - **Wallet Management**:
-  - Charge or deduct amounts from customer wallets.
+  - Charge or deduct amounts from customer wallets. Each operation is a
+    single conditional UPDATE, so concurrent requests never lose updates and
+    a deduction never overdraws the wallet.
+
+- **Wallet Ledger**:
+  - Every change to a wallet is appended to the wallet ledger in integer
+    cents, in the same transaction as the update of the cached
+    `wallet_balance`. Periodic snapshots keep balance reconstruction
+    proportional to the entries recorded since the last snapshot.
+
+- **Username Cache**:
+  - Lookups by username are served from a bounded in-process cache of
+    customer snapshots, including negative entries for unknown usernames.
+    Every write made through this module refreshes or invalidates the entry.
+
+- **Username Filter**:
+  - A counting Bloom filter of every username, loaded at startup and kept up
+    to date by writes, answers "definitely free" without a query. The unique
+    constraint on the username column remains the final arbiter.
+
+- **Bulk Import**:
+  - Import customers from NDJSON in chunks, checking usernames with one query
+    per chunk and inserting each chunk with a single executemany.
+
+- **Optimistic Concurrency**:
+  - Customers carry a version number. Updates fail with a conflict when the
+    row changed since it was read, or when the caller's expected version is stale.
 
 - **API Integration**:
   - Use a circuit breaker pattern to handle customer-related API calls.
@@ -53,6 +92,10 @@ Classes
             Retrieves a customer by their username.
         - `get_all_customers(db: Session) -> list[Customer]`:
             Retrieves all customer records.
+        - `list_customers(db: Session, limit: int, cursor: int) -> tuple[list[dict], int]`:
+            Retrieves a page of customers without their passwords.
+        - `iter_customers(db: Session, batch_size: int) -> Iterator[dict]`:
+            Streams every customer without their passwords.
         - `update_customer(db: Session, username: str, updates: dict) -> Customer`:
             Updates customer information.
         - `delete_customer(db: Session, username: str) -> Customer`:
@@ -61,26 +104,214 @@ Classes
             Charges a customer's wallet with a specified amount.
         - `deduct_wallet(db: Session, username: str, amount: float) -> Customer`:
             Deducts a specified amount from a customer's wallet.
+        - `update_wallet(db: Session, username: str, amount_cents: int, entry_type: str) -> dict`:
+            Applies a signed wallet change within the caller's transaction.
+        - `get_ledger(db: Session, username: str, limit: int, cursor: int) -> tuple[list[dict], int]`:
+            Retrieves a page of a customer's wallet ledger, newest first.
+        - `get_ledger_balance(db: Session, customer_id: int) -> int`:
+            Reconstructs a wallet balance from the latest snapshot and later entries.
+        - `snapshot_wallets(db: Session) -> int`:
+            Snapshots the balance of every wallet with new ledger entries.
+        - `import_customer_batch(db: Session, lines: list[tuple[int, str]]) -> tuple[int, list[dict]]`:
+            Validates and inserts a chunk of NDJSON customer records.
+        - `cache_stats() -> dict`:
+            Returns the username cache counters.
+
+- **Functions**:
+    - `load_username_filter(bind) -> int`:
+        Rebuilds the username filter by streaming the username column.
+    - `username_may_exist(username: str) -> bool`:
+        Returns False only when the username is definitely not taken.
 
 """
 
 
 circuit_breaker = pybreaker.CircuitBreaker(fail_max=5, reset_timeout=30)
 
+WALLET_SNAPSHOT_INTERVAL = config("WALLET_SNAPSHOT_INTERVAL", default=300, cast=float)
+IMPORT_CHUNK_SIZE = config("IMPORT_CHUNK_SIZE", default=1000, cast=int)
+CUSTOMER_CACHE_SIZE = config("CUSTOMER_CACHE_SIZE", default=4096, cast=int)
+CUSTOMER_CACHE_TTL = config("CUSTOMER_CACHE_TTL", default=60, cast=float)
+USERNAME_FILTER_CAPACITY = config("USERNAME_FILTER_CAPACITY", default=1_000_000, cast=int)
+USERNAME_FILTER_ERROR_RATE = config("USERNAME_FILTER_ERROR_RATE", default=0.01, cast=float)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
+# Columns safe to return to API clients; the password is never loaded.
+PUBLIC_FIELDS = (
+    "id", "full_name", "username", "age", "address", "gender",
+    "marital_status", "wallet_balance", "is_admin",
+)
+CUSTOMER_FIELDS = PUBLIC_FIELDS + ("password", "version")
+
+# Maps usernames to customer snapshots, or to None for unknown usernames.
+# Shared by every CustomerService instance and by registration, so a write
+# through any of them is seen by the others.
+username_cache = TTLCache(maxsize=CUSTOMER_CACHE_SIZE, ttl=CUSTOMER_CACHE_TTL)
+_MISSING = object()
+
+# Every existing username; see load_username_filter() and username_may_exist().
+username_filter = CountingBloomFilter(capacity=USERNAME_FILTER_CAPACITY, error_rate=USERNAME_FILTER_ERROR_RATE)
+
+def to_cents(amount) -> int:
+    """
+    Converts a wallet amount to integer cents.
+
+    Args:
+        amount (float): The amount, with at most two decimal places.
+
+    Returns:
+        int: The amount in cents.
+
+    Raises:
+        ValueError: If the amount has more than two decimal places.
+    """
+    cents = round(amount * 100)
+    if abs(amount * 100 - cents) > 1e-6:
+        raise ValueError("Amount cannot have more than two decimal places")
+    return cents
+
+
+def record_wallet_entry(db: Session, customer_id: int, amount_cents: int, entry_type: str):
+    """
+    Appends an entry to the wallet ledger within the current transaction.
+
+    Args:
+        db (Session): The database session.
+        customer_id (int): The ID of the customer.
+        amount_cents (int): The signed change in cents.
+        entry_type (str): opening, charge, deduct or adjustment.
+    """
+    db.add(WalletLedgerEntry(
+        customer_id=customer_id,
+        amount_cents=amount_cents,
+        entry_type=entry_type,
+        created_at=datetime.utcnow(),
+    ))
+
+
+def open_missing_ledgers(bind):
+    """
+    Records an opening ledger entry for every wallet that predates the ledger.
+
+    Customers created before the ledger existed have a balance but no
+    entries; this makes their ledger add up to their balance. It is a no-op
+    once every customer has an entry.
+
+    Args:
+        bind (Engine): The engine of the customer database.
+    """
+    has_entries = exists().where(WalletLedgerEntry.customer_id == Customer.id)
+    statement = insert(WalletLedgerEntry).from_select(
+        ["customer_id", "amount_cents", "entry_type", "created_at"],
+        select(
+            Customer.id,
+            func.round(Customer.wallet_balance * 100),
+            literal("opening"),
+            literal(datetime.utcnow(), DateTime),
+        ).where(Customer.wallet_balance != 0, ~has_entries),
+    )
+    with bind.begin() as connection:
+        connection.execute(statement)
+
+
+def load_username_filter(bind, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Rebuilds the username filter from the customers table.
+
+    The username column is streamed `batch_size` rows at a time, so memory
+    use is bounded by the size of the filter, not of the table.
+
+    Args:
+        bind (Engine): The engine of the customer database.
+        batch_size (int): The number of rows fetched per round trip.
+
+    Returns:
+        int: The number of usernames loaded.
+    """
+    username_filter.clear()
+    count = 0
+    with bind.connect() as connection:
+        result = connection.execution_options(yield_per=batch_size).execute(select(Customer.username))
+        for (username,) in result:
+            username_filter.add(username)
+            count += 1
+    username_filter.loaded = True
+    return count
+
+
+def username_may_exist(username: str) -> bool:
+    """
+    Checks the username filter.
+
+    Args:
+        username (str): The username to look up.
+
+    Returns:
+        bool: False if the username is definitely not taken, True if it may
+        be (or if the filter has not been loaded).
+    """
+    return not username_filter.loaded or username_filter.might_contain(username)
+
+
+def start_wallet_snapshotter(session_factory=SessionLocal, interval: float = WALLET_SNAPSHOT_INTERVAL):
+    """
+    Starts a daemon thread that periodically snapshots wallet balances.
+
+    Args:
+        session_factory (sessionmaker): Creates the sessions used by the snapshotter.
+        interval (float): The number of seconds between snapshots.
+
+    Returns:
+        threading.Event: Set it to stop the snapshotter.
+    """
+    stop = threading.Event()
+    service = CustomerService()
+
+    def snapshot():
+        while not stop.wait(interval):
+            db = session_factory()
+            try:
+                service.snapshot_wallets(db)
+            except Exception as e:
+                logging.error(f"Wallet snapshot failed: {e}")
+            finally:
+                db.close()
+
+    threading.Thread(target=snapshot, name="wallet-snapshotter", daemon=True).start()
+    return stop
+
+
 class CustomerService:
     """
     A service class for managing customer-related operations.
 
+    Lookups by username go through the shared username cache. Entries expire
+    after CUSTOMER_CACHE_TTL seconds; writes made through this service store
+    the new snapshot of the customer, or a negative entry once it is deleted.
+
     Methods:
         call_customer_api(): Makes an API call to the customer API.
         create_customer(): Creates a new customer in the database.
         get_customer_by_username(): Retrieves a customer by their username.
         get_all_customers(): Retrieves all customers from the database.
+        list_customers(): Retrieves a page of customers without their passwords.
+        iter_customers(): Streams every customer without their passwords.
         update_customer(): Updates customer details in the database.
         delete_customer(): Deletes a customer from the database.
         charge_wallet(): Charges a customer's wallet with a specified amount.
         deduct_wallet(): Deducts a specified amount from a customer's wallet.
+        update_wallet(): Applies a signed wallet change without committing.
+        get_ledger(): Retrieves a page of a customer's wallet ledger.
+        get_ledger_balance(): Reconstructs a wallet balance from the ledger.
+        snapshot_wallets(): Snapshots the balance of every wallet with new entries.
+        import_customer_batch(): Validates and inserts a chunk of NDJSON customer records.
+        cache_stats(): Returns the username cache counters.
     """
+    def __init__(self):
+        self.username_cache = username_cache
+
     @circuit_breaker
     def call_customer_api(self, endpoint: str, data: dict):
         """
@@ -116,14 +347,22 @@ class CustomerService:
         """
         new_customer = Customer(**customer_data)
         db.add(new_customer)
+        if new_customer.wallet_balance:
+            db.flush()
+            record_wallet_entry(db, new_customer.id, to_cents(new_customer.wallet_balance), "opening")
         db.commit()
         db.refresh(new_customer)
+        username_filter.add(new_customer.username)
+        self._cache_customer(new_customer.username, new_customer)
         return new_customer
 
     @profile
     def get_customer_by_username(self, db: Session, username: str):
         """
-        Retrieves a customer by their username.
+        Retrieves a customer by their username through the username cache.
+
+        Cache hits return a detached copy of the cached row, so callers that
+        modify the customer must load it from the session instead.
 
         Args:
             username (str): The username of the customer to retrieve.
@@ -131,7 +370,41 @@ class CustomerService:
         Returns:
             Customer or None: The customer if found, else None.
         """
-        return db.query(Customer).filter(Customer.username == username).first()
+        snapshot = self.username_cache.get(username, _MISSING)
+        if snapshot is not _MISSING:
+            return Customer(**snapshot) if snapshot is not None else None
+        customer = db.query(Customer).filter(Customer.username == username).first()
+        self._cache_customer(username, customer)
+        return customer
+
+    def _cache_customer(self, username: str, customer):
+        """
+        Stores the snapshot of a customer, or a negative entry, in the username cache.
+
+        Args:
+            username (str): The username looked up.
+            customer (Customer or dict or None): The customer row, its column values, or None if not found.
+
+        Returns:
+            dict or None: The cached snapshot.
+        """
+        snapshot = None
+        if customer is not None:
+            if isinstance(customer, dict):
+                snapshot = {field: customer[field] for field in CUSTOMER_FIELDS}
+            else:
+                snapshot = {field: getattr(customer, field) for field in CUSTOMER_FIELDS}
+        self.username_cache.set(username, snapshot)
+        return snapshot
+
+    def cache_stats(self):
+        """
+        Returns the username cache counters.
+
+        Returns:
+            dict: The cache size, hits, misses, hit ratio, evictions and expirations.
+        """
+        return self.username_cache.stats()
 
     @profile
     def get_all_customers(self, db: Session):
@@ -146,11 +419,61 @@ class CustomerService:
         """
         return db.query(Customer).all()
 
+    @profile
+    def list_customers(self, db: Session, limit: int = DEFAULT_PAGE_SIZE, cursor: int = None):
+        """
+        Retrieves a page of customers ordered by ID, without their passwords.
+
+        Args:
+            db (Session): The database session.
+            limit (int): The page size, capped at MAX_PAGE_SIZE.
+            cursor (int, optional): The ID of the last customer of the previous page.
+
+        Returns:
+            tuple[list[dict], int or None]: The page of customers and the cursor of the next page.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        query = db.query(*[getattr(Customer, field) for field in PUBLIC_FIELDS])
+        if cursor is not None:
+            query = query.filter(Customer.id > cursor)
+        rows = query.order_by(Customer.id).limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1].id
+        return [dict(row._mapping) for row in rows], next_cursor
+
+    def iter_customers(self, db: Session, batch_size: int = EXPORT_BATCH_SIZE):
+        """
+        Streams every customer ordered by ID, without their passwords.
+
+        Rows are fetched `batch_size` at a time through a server-side cursor,
+        so memory use does not grow with the size of the table.
+
+        Args:
+            db (Session): The database session.
+            batch_size (int): The number of rows fetched per round trip.
+
+        Yields:
+            dict: One customer at a time.
+        """
+        query = (
+            db.query(*[getattr(Customer, field) for field in PUBLIC_FIELDS])
+            .order_by(Customer.id)
+            .execution_options(yield_per=batch_size)
+        )
+        for row in query:
+            yield dict(row._mapping)
+
     @profile
     def update_customer(self, db: Session, username: str, updates: dict):
         """
         Updates customer details in the database.
 
+        If `updates` contains a "version", the update only applies when it
+        matches the customer's current version. A change of the wallet balance
+        is recorded in the ledger as an adjustment.
+
         Args:
             db (Session): The database session.
             username (str): The username of the customer to update.
@@ -158,19 +481,46 @@ class CustomerService:
 
         Returns:
             Customer or None: The updated customer if found, else None.
+
+        Raises:
+            ValueError: If the wallet balance is invalid or the customer was modified concurrently.
         """
-        customer = self.get_customer_by_username(db, username)
+        updates = dict(updates)
+        expected_version = updates.pop("version", None)
+        if "wallet_balance" in updates:
+            balance = updates["wallet_balance"]
+            if isinstance(balance, bool) or not isinstance(balance, (int, float)) or not 0 <= balance < float("inf"):
+                raise ValueError("Wallet balance must be a non-negative number")
+            to_cents(balance)
+        customer = db.query(Customer).filter(Customer.username == username).first()
         if customer:
+            if expected_version is not None and expected_version != customer.version:
+                self.username_cache.invalidate(username)
+                raise ValueError("Customer was modified concurrently")
+            previous_cents = round((customer.wallet_balance or 0) * 100)
             for key, value in updates.items():
                 setattr(customer, key, value)
-            db.commit()
+            adjustment = to_cents(customer.wallet_balance or 0) - previous_cents
+            if adjustment:
+                record_wallet_entry(db, customer.id, adjustment, "adjustment")
+            try:
+                db.commit()
+            except StaleDataError:
+                db.rollback()
+                self.username_cache.invalidate(username)
+                raise ValueError("Customer was modified concurrently")
             db.refresh(customer)
+            if customer.username != username:
+                self.username_cache.invalidate(username)
+                username_filter.remove(username)
+                username_filter.add(customer.username)
+        self._cache_customer(customer.username if customer else username, customer)
         return customer
 
     @profile
     def delete_customer(self, db: Session, username: str):
         """
-        Deletes a customer from the database.
+        Deletes a customer from the database, along with their wallet ledger.
 
         Args:
             db (Session): The database session.
@@ -179,17 +529,104 @@ class CustomerService:
         Returns:
             Customer or None: The deleted customer if found, else None.
         """
-        customer = self.get_customer_by_username(db, username)
+        customer = db.query(Customer).filter(Customer.username == username).first()
         if customer:
+            db.query(WalletSnapshot).filter(WalletSnapshot.customer_id == customer.id).delete(synchronize_session=False)
+            db.query(WalletLedgerEntry).filter(WalletLedgerEntry.customer_id == customer.id).delete(synchronize_session=False)
             db.delete(customer)
             db.commit()
+            username_filter.remove(username)
+        self._cache_customer(username, None)
         return customer
 
+    def _validate_amount(self, amount):
+        """
+        Checks that a wallet amount is a positive number of cents.
+
+        Args:
+            amount: The amount to validate.
+
+        Returns:
+            int: The amount in cents.
+
+        Raises:
+            ValueError: If the amount is not a positive number with at most two decimal places.
+        """
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)) or amount <= 0:
+            raise ValueError("Amount must be a positive number")
+        return to_cents(amount)
+
+    def update_wallet(self, db: Session, username: str, amount_cents: int, entry_type: str):
+        """
+        Applies a signed change to a wallet within the current transaction.
+
+        The cached balance is updated by one UPDATE statement, conditional on
+        the balance staying non-negative, and the ledger entry is added to the
+        same transaction. Nothing is committed, so callers can combine the
+        change with writes to other tables; they should invalidate the
+        username cache entry once they commit.
+
+        Args:
+            db (Session): The database session.
+            username (str): The username of the customer.
+            amount_cents (int): The signed change in cents.
+            entry_type (str): charge, deduct or purchase.
+
+        Returns:
+            dict or None: The updated customer columns, or None if the
+            customer was not found or the balance is insufficient.
+        """
+        conditions = [Customer.username == username]
+        if amount_cents < 0:
+            conditions.append(func.round(Customer.wallet_balance * 100) >= -amount_cents)
+        statement = (
+            update(Customer)
+            .where(*conditions)
+            .values(
+                wallet_balance=func.round(Customer.wallet_balance + amount_cents / 100, 2),
+                version=Customer.version + 1,
+            )
+            .returning(*[getattr(Customer, field) for field in CUSTOMER_FIELDS])
+            .execution_options(synchronize_session=False)
+        )
+        row = db.execute(statement).first()
+        if row is None:
+            return None
+        record_wallet_entry(db, row.id, amount_cents, entry_type)
+        return dict(row._mapping)
+
+    def _apply_wallet_change(self, db: Session, username: str, amount_cents: int, entry_type: str):
+        """
+        Applies a signed change to a wallet, appends it to the ledger and commits.
+
+        The updated row is returned by the UPDATE itself and written through
+        to the username cache.
+
+        Args:
+            db (Session): The database session.
+            username (str): The username of the customer.
+            amount_cents (int): The signed change in cents.
+            entry_type (str): charge or deduct.
+
+        Returns:
+            dict or None: The updated customer snapshot, or None if the
+            customer was not found or the balance is insufficient.
+        """
+        row = self.update_wallet(db, username, amount_cents, entry_type)
+        if row is None:
+            db.rollback()
+            return None
+        db.commit()
+        return self._cache_customer(username, row)
+
     @profile
     def charge_wallet(self, db: Session, username: str, amount: float):
         """
         Charges a customer's wallet with a specified amount.
 
+        The balance is incremented by a single UPDATE statement, so concurrent
+        charges are all applied, and the charge is appended to the ledger.
+
         Args:
             db (Session): The database session.
             username (str): The username of the customer.
@@ -197,19 +634,27 @@ class CustomerService:
 
         Returns:
             Customer or None: The updated customer if found, else None.
+
+        Raises:
+            ValueError: If the amount is not a positive number of cents.
         """
-        customer = self.get_customer_by_username(db, username)
-        if customer:
-            customer.wallet_balance += amount
-            db.commit()
-            db.refresh(customer)
-        return customer
+        amount_cents = self._validate_amount(amount)
+        snapshot = self._apply_wallet_change(db, username, amount_cents, "charge")
+        if snapshot is None:
+            self._cache_customer(username, None)
+            return None
+        return Customer(**snapshot)
 
     @profile
     def deduct_wallet(self, db: Session, username: str, amount: float):
         """
         Deducts a specified amount from a customer's wallet.
 
+        The balance check and the decrement are a single conditional UPDATE
+        (`balance = balance - amount WHERE balance >= amount`), so concurrent
+        deductions can never overdraw the wallet. The deduction is appended to
+        the ledger.
+
         Args:
             db (Session): The database session.
             username (str): The username of the customer.
@@ -217,13 +662,213 @@ class CustomerService:
 
         Returns:
             Customer or None: The updated customer if found, else None.
+
+        Raises:
+            ValueError: If the amount is not a positive number of cents or the balance is insufficient.
+        """
+        amount_cents = self._validate_amount(amount)
+        snapshot = self._apply_wallet_change(db, username, -amount_cents, "deduct")
+        if snapshot is not None:
+            return Customer(**snapshot)
+        # Read past the customer cache, which may still hold a deleted customer.
+        if db.query(Customer.id).filter(Customer.username == username).first() is not None:
+            raise ValueError("Insufficient funds")
+        return None
+
+    @profile
+    def get_ledger(self, db: Session, username: str, limit: int = DEFAULT_PAGE_SIZE, cursor: int = None):
+        """
+        Retrieves a page of a customer's wallet ledger, newest entry first.
+
+        Args:
+            db (Session): The database session.
+            username (str): The username of the customer.
+            limit (int): The page size, capped at MAX_PAGE_SIZE.
+            cursor (int, optional): The ID of the last entry of the previous page.
+
+        Returns:
+            tuple[list[dict], int or None] or None: The page of entries and the
+            cursor of the next page, or None if the customer is not found.
         """
         customer = self.get_customer_by_username(db, username)
-        if customer and customer.wallet_balance >= amount:
-            customer.wallet_balance -= amount
-            db.commit()
-            db.refresh(customer)
-        return customer
+        if customer is None:
+            return None
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        query = db.query(WalletLedgerEntry).filter(WalletLedgerEntry.customer_id == customer.id)
+        if cursor is not None:
+            query = query.filter(WalletLedgerEntry.id < cursor)
+        entries = query.order_by(WalletLedgerEntry.id.desc()).limit(limit + 1).all()
+        next_cursor = None
+        if len(entries) > limit:
+            entries = entries[:limit]
+            next_cursor = entries[-1].id
+        return [
+            {
+                "id": entry.id,
+                "amount_cents": entry.amount_cents,
+                "entry_type": entry.entry_type,
+                "created_at": entry.created_at.isoformat(),
+            }
+            for entry in entries
+        ], next_cursor
+
+    def get_ledger_balance(self, db: Session, customer_id: int):
+        """
+        Reconstructs a wallet balance from the ledger.
+
+        Starts from the customer's latest snapshot and adds the entries
+        recorded after it, so the cost grows with the entries since the last
+        snapshot rather than with the whole history.
+
+        Args:
+            db (Session): The database session.
+            customer_id (int): The ID of the customer.
+
+        Returns:
+            int: The balance in cents.
+        """
+        snapshot = (
+            db.query(WalletSnapshot.ledger_entry_id, WalletSnapshot.balance_cents)
+            .filter(WalletSnapshot.customer_id == customer_id)
+            .order_by(WalletSnapshot.ledger_entry_id.desc())
+            .first()
+        )
+        last_entry_id, balance = snapshot if snapshot else (0, 0)
+        since = (
+            db.query(func.coalesce(func.sum(WalletLedgerEntry.amount_cents), 0))
+            .filter(WalletLedgerEntry.customer_id == customer_id, WalletLedgerEntry.id > last_entry_id)
+            .scalar()
+        )
+        return balance + since
+
+    def snapshot_wallets(self, db: Session):
+        """
+        Snapshots the balance of every wallet with entries since its last snapshot.
+
+        Runs as a single INSERT ... SELECT that adds each customer's new
+        entries to their previous snapshot. Snapshots are unique per customer
+        and ledger position, so a concurrent run that already took one is
+        skipped instead of duplicated.
+
+        Args:
+            db (Session): The database session.
+
+        Returns:
+            int: The number of snapshots taken.
+        """
+        latest = (
+            select(
+                WalletSnapshot.customer_id,
+                func.max(WalletSnapshot.ledger_entry_id).label("ledger_entry_id"),
+            )
+            .group_by(WalletSnapshot.customer_id)
+            .subquery()
+        )
+        previous = select(WalletSnapshot).subquery()
+        last_entry_id = func.coalesce(latest.c.ledger_entry_id, 0)
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        statement = dialect.insert(WalletSnapshot).from_select(
+            ["customer_id", "ledger_entry_id", "balance_cents", "created_at"],
+            select(
+                WalletLedgerEntry.customer_id,
+                func.max(WalletLedgerEntry.id),
+                func.coalesce(previous.c.balance_cents, 0) + func.sum(WalletLedgerEntry.amount_cents),
+                literal(datetime.utcnow(), DateTime),
+            )
+            .select_from(WalletLedgerEntry)
+            .outerjoin(latest, latest.c.customer_id == WalletLedgerEntry.customer_id)
+            .outerjoin(
+                previous,
+                and_(
+                    previous.c.customer_id == latest.c.customer_id,
+                    previous.c.ledger_entry_id == latest.c.ledger_entry_id,
+                ),
+            )
+            .where(WalletLedgerEntry.id > last_entry_id)
+            .group_by(WalletLedgerEntry.customer_id, previous.c.balance_cents),
+        ).on_conflict_do_nothing(index_elements=["customer_id", "ledger_entry_id"])
+        taken = db.execute(statement).rowcount
+        db.commit()
+        return taken
+
+    def import_customer_batch(self, db: Session, lines: list):
+        """
+        Validates and inserts a chunk of NDJSON customer records.
+
+        Usernames are checked against the rest of the chunk in memory. Valid
+        records are inserted with one executemany that skips usernames that
+        already exist (ON CONFLICT DO NOTHING), however many there are and
+        whoever inserted them, and reports each of them as a failure. The
+        opening wallet balances of the inserted customers are appended to the
+        ledger, and the chunk is committed as a whole.
+
+        Args:
+            db (Session): The database session.
+            lines (list[tuple[int, str]]): Line numbers and raw JSON records.
+
+        Returns:
+            tuple[int, list[dict]]: The number of customers imported and one
+            failure ({"line", "username", "error"}) per rejected record.
+
+        Raises:
+            ValueError: If the chunk cannot be written.
+        """
+        failures = []
+        candidates = []
+        seen = set()
+        for line_number, raw in lines:
+            try:
+                record = CustomerCreate.model_validate_json(raw).model_dump()
+                opening_cents = to_cents(record["wallet_balance"])
+            except ValidationError as e:
+                error = e.errors()[0]
+                location = ".".join(str(part) for part in error["loc"])
+                failures.append({"line": line_number, "username": None, "error": f"{location}: {error['msg']}" if location else error["msg"]})
+                continue
+            except ValueError as e:
+                failures.append({"line": line_number, "username": None, "error": str(e)})
+                continue
+            if record["username"] in seen:
+                failures.append({"line": line_number, "username": record["username"], "error": "Duplicate username in import"})
+                continue
+            seen.add(record["username"])
+            candidates.append((line_number, record, opening_cents))
+
+        imported = {}
+        if candidates:
+            dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+            try:
+                imported = {
+                    row.username: row.id
+                    for row in db.execute(
+                        dialect.insert(Customer)
+                        .on_conflict_do_nothing(index_elements=["username"])
+                        .returning(Customer.id, Customer.username),
+                        [record for _, record, _ in candidates],
+                    )
+                }
+                opening = [
+                    {"customer_id": imported[record["username"]], "amount_cents": cents, "entry_type": "opening", "created_at": datetime.utcnow()}
+                    for _, record, cents in candidates
+                    if cents and record["username"] in imported
+                ]
+                if opening:
+                    db.execute(insert(WalletLedgerEntry), opening)
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                raise ValueError(f"Failed to import customers: {e}")
+            for username in imported:
+                username_filter.add(username)
+                self.username_cache.invalidate(username)
+        failures.extend(
+            {"line": line, "username": record["username"], "error": "Username already exists"}
+            for line, record, _ in candidates
+            if record["username"] not in imported
+        )
+        failures.sort(key=lambda failure: failure["line"])
+        return len(imported), failures
+
 
 if __name__ == "__main__":
     from database import SessionLocal
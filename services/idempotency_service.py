@@ -0,0 +1,355 @@
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, event, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models.idempotency import IdempotencyKey
+from database import SessionLocal
+from decouple import config
+import hashlib
+import json
+import logging
+import threading
+import uuid
+
+"""
+Idempotency Service Module
+==========================
+
+This module lets clients retry mutating requests safely. A request sent with
+an `Idempotency-Key` header is executed once; the response of that first
+execution is stored and returned to every retry with the same key, without
+running the operation again.
+
+Features
+--------
+
+- **Key Claiming**:
+  - The first request with a key claims it by inserting a row, so concurrent
+    retries cannot both execute. A retry that arrives while the first request
+    is still running is rejected with 409.
+  - Keys are scoped to the authenticated caller as well as the method and
+    path, so one caller's key never replays another caller's response.
+
+- **Execution Marker**:
+  - The first commit made while the request runs also marks its key as
+    executed, in the same transaction as the write. An executed key is never
+    claimed again, even if its response could not be stored afterwards, so a
+    retry cannot repeat a write that may have committed; it is rejected with
+    409 instead. The marker is conditional on still holding the claim, so a
+    request that ran past the claim timeout and lost its key to a retry
+    fails its commit rather than writing twice.
+
+- **Response Replay**:
+  - Successful responses and client errors (4xx) are stored and replayed with
+    an `Idempotent-Replayed: true` header. Server errors release the key so the
+    request can be retried.
+  - Reusing a key with a different request body is rejected with 422.
+
+- **Expiry**:
+  - Stored responses expire after IDEMPOTENCY_KEY_TTL seconds and are purged
+    periodically. A claim whose request never completed (e.g. the process
+    died before writing anything) can be claimed again after
+    IDEMPOTENCY_CLAIM_TIMEOUT seconds.
+
+Classes
+-------
+
+- **IdempotencyService**:
+  A service class for claiming, completing and purging idempotency keys.
+
+    Methods:
+        - `claim(db: Session, key: str, scope: str, request_hash: str) -> tuple[str, IdempotencyKey]`:
+            Claims a key, or returns the existing record of a key already in use.
+        - `complete(db: Session, key: str, scope: str, claim_id: str, status_code: int, body) -> None`:
+            Stores the response of the first execution.
+        - `release(db: Session, key: str, scope: str, claim_id: str) -> None`:
+            Deletes a claimed key so the request can be retried.
+        - `run(db: Session, key: str, scope: str, principal: str, payload, handler) -> dict or JSONResponse`:
+            Executes a route handler at most once per key and caller.
+        - `purge_expired(db: Session) -> int`:
+            Deletes expired keys.
+
+"""
+
+
+IDEMPOTENCY_KEY_TTL = config("IDEMPOTENCY_KEY_TTL", default=86400, cast=int)
+IDEMPOTENCY_CLAIM_TIMEOUT = config("IDEMPOTENCY_CLAIM_TIMEOUT", default=60, cast=int)
+IDEMPOTENCY_PURGE_INTERVAL = config("IDEMPOTENCY_PURGE_INTERVAL", default=3600, cast=float)
+
+
+def hash_request(payload) -> str:
+    """
+    Returns a stable SHA-256 digest of a request body.
+
+    Args:
+        payload: The JSON-compatible request body.
+
+    Returns:
+        str: The hex digest.
+    """
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def start_idempotency_purger(session_factory=SessionLocal, interval: float = IDEMPOTENCY_PURGE_INTERVAL):
+    """
+    Starts a daemon thread that periodically deletes expired idempotency keys.
+
+    Args:
+        session_factory (sessionmaker): Creates the sessions used by the purger.
+        interval (float): The number of seconds between purges.
+
+    Returns:
+        threading.Event: Set it to stop the purger.
+    """
+    stop = threading.Event()
+    service = IdempotencyService()
+
+    def purge():
+        while not stop.wait(interval):
+            db = session_factory()
+            try:
+                service.purge_expired(db)
+            except Exception as e:
+                logging.error(f"Idempotency key purge failed: {e}")
+            finally:
+                db.close()
+
+    threading.Thread(target=purge, name="idempotency-purger", daemon=True).start()
+    return stop
+
+
+class ClaimLostError(Exception):
+    """
+    Raised when a request commits after its idempotency claim was taken over by a retry.
+    """
+
+
+class IdempotencyService:
+    """
+    A service class for executing mutating requests at most once per idempotency key.
+
+    Methods:
+        claim(): Claims a key, or returns the existing record of a key already in use.
+        complete(): Stores the response of the first execution.
+        release(): Deletes a claimed key so the request can be retried.
+        run(): Executes a route handler at most once per key.
+        purge_expired(): Deletes expired keys.
+    """
+    def __init__(self, ttl: int = IDEMPOTENCY_KEY_TTL, claim_timeout: int = IDEMPOTENCY_CLAIM_TIMEOUT):
+        self.ttl = ttl
+        self.claim_timeout = claim_timeout
+
+    def claim(self, db: Session, key: str, scope: str, request_hash: str):
+        """
+        Claims an idempotency key for a new execution.
+
+        The claim expires after the claim timeout unless the request writes
+        or its response is stored first. An expired key that has not been
+        purged yet is claimed again in place, unless its request executed
+        without storing a response.
+
+        Args:
+            db (Session): The database session.
+            key (str): The client-supplied idempotency key.
+            scope (str): The caller, method and path of the request.
+            request_hash (str): The digest of the request body.
+
+        Returns:
+            tuple[str, IdempotencyKey]: The ID of the new claim and None if
+            the key was claimed, else None and the existing record of the key.
+        """
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.claim_timeout)
+        claim_id = uuid.uuid4().hex
+        db.add(IdempotencyKey(
+            key=key, scope=scope, request_hash=request_hash, claim_id=claim_id, created_at=now, expires_at=expires_at,
+        ))
+        try:
+            db.commit()
+            return claim_id, None
+        except IntegrityError:
+            db.rollback()
+
+        reclaimed = db.execute(
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.key == key,
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.expires_at <= now,
+                or_(IdempotencyKey.status_code.isnot(None), IdempotencyKey.executed_at.is_(None)),
+            )
+            .values(
+                request_hash=request_hash, claim_id=claim_id, status_code=None, response_body=None,
+                executed_at=None, created_at=now, expires_at=expires_at,
+            )
+        ).rowcount
+        db.commit()
+        if reclaimed:
+            return claim_id, None
+        record = db.get(IdempotencyKey, (key, scope))
+        if record is None:
+            return self.claim(db, key, scope, request_hash)
+        return None, record
+
+    def _claimed(self, key: str, scope: str, claim_id: str):
+        """
+        Returns the condition matching a key only while it is held by a claim.
+        """
+        return and_(IdempotencyKey.key == key, IdempotencyKey.scope == scope, IdempotencyKey.claim_id == claim_id)
+
+    def mark_executed(self, db: Session, key: str, scope: str, claim_id: str):
+        """
+        Marks a claimed key as executed within the current transaction.
+
+        Called before the first commit of the request, so the marker commits
+        together with the request's writes.
+
+        Args:
+            db (Session): The database session.
+            key (str): The idempotency key.
+            scope (str): The caller, method and path of the request.
+            claim_id (str): The claim returned by `claim`.
+
+        Raises:
+            ClaimLostError: If the claim expired and was taken over by a retry.
+        """
+        now = datetime.utcnow()
+        marked = db.execute(
+            update(IdempotencyKey)
+            .where(self._claimed(key, scope, claim_id), IdempotencyKey.status_code.is_(None))
+            .values(executed_at=now, expires_at=now + timedelta(seconds=self.ttl))
+        ).rowcount
+        if not marked:
+            raise ClaimLostError(f"Idempotency-Key {key} was claimed by another request")
+
+    def complete(self, db: Session, key: str, scope: str, claim_id: str, status_code: int, body):
+        """
+        Stores the response of the first execution of a request and keeps it for the key TTL.
+
+        Args:
+            db (Session): The database session.
+            key (str): The idempotency key.
+            scope (str): The caller, method and path of the request.
+            claim_id (str): The claim returned by `claim`.
+            status_code (int): The HTTP status of the response.
+            body: The JSON-compatible response body.
+        """
+        db.execute(
+            update(IdempotencyKey)
+            .where(self._claimed(key, scope, claim_id))
+            .values(
+                status_code=status_code,
+                response_body=json.dumps(body),
+                expires_at=datetime.utcnow() + timedelta(seconds=self.ttl),
+            )
+        )
+        db.commit()
+
+    def release(self, db: Session, key: str, scope: str, claim_id: str):
+        """
+        Deletes a claimed key whose execution failed before writing, so the request can be retried.
+
+        Keys marked as executed are kept, since their write may have committed.
+
+        Args:
+            db (Session): The database session.
+            key (str): The idempotency key.
+            scope (str): The caller, method and path of the request.
+            claim_id (str): The claim returned by `claim`.
+        """
+        db.query(IdempotencyKey).filter(
+            self._claimed(key, scope, claim_id),
+            IdempotencyKey.status_code.is_(None),
+            IdempotencyKey.executed_at.is_(None),
+        ).delete(synchronize_session=False)
+        db.commit()
+
+    def run(self, db: Session, key: str, scope: str, principal: str, payload, handler):
+        """
+        Executes a route handler at most once per idempotency key and caller.
+
+        Args:
+            db (Session): The database session.
+            key (str): The client-supplied idempotency key.
+            scope (str): The method and path of the request.
+            principal (str): The authenticated caller, e.g. the token subject.
+            payload: The request body, used to detect a key reused for a different request.
+            handler (callable): Executes the request and returns the response body.
+
+        Returns:
+            dict or JSONResponse: The response of the first execution; replays
+            carry an `Idempotent-Replayed: true` header.
+
+        Raises:
+            HTTPException: If the key is in use by a running request or was
+            executed without a stored response (409), was used for a different
+            request (422), or the handler failed.
+        """
+        scope = f"{principal} {scope}"
+        request_hash = hash_request(payload)
+        claim_id, record = self.claim(db, key, scope, request_hash)
+        if record is not None:
+            if record.request_hash != request_hash:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+            if record.status_code is None and record.executed_at is not None:
+                raise HTTPException(
+                    status_code=409, detail="A request with this Idempotency-Key was executed but its response was not recorded",
+                )
+            if record.status_code is None:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+            logging.info(f"Replaying response for Idempotency-Key {key} ({scope})")
+            return JSONResponse(
+                status_code=record.status_code,
+                content=json.loads(record.response_body),
+                headers={"Idempotent-Replayed": "true"},
+            )
+
+        executed = []
+
+        def before_commit(session):
+            if not executed:
+                self.mark_executed(session, key, scope, claim_id)
+                executed.append(True)
+
+        event.listen(db, "before_commit", before_commit)
+        try:
+            try:
+                body = jsonable_encoder(handler())
+            finally:
+                event.remove(db, "before_commit", before_commit)
+        except HTTPException as e:
+            db.rollback()
+            if e.status_code < 500:
+                self.complete(db, key, scope, claim_id, e.status_code, {"detail": e.detail})
+            else:
+                self.release(db, key, scope, claim_id)
+            raise
+        except ClaimLostError as e:
+            db.rollback()
+            raise HTTPException(status_code=409, detail=str(e))
+        except Exception:
+            db.rollback()
+            self.release(db, key, scope, claim_id)
+            raise
+        self.complete(db, key, scope, claim_id, 200, body)
+        return body
+
+    def purge_expired(self, db: Session, now: datetime = None):
+        """
+        Deletes every expired idempotency key.
+
+        Args:
+            db (Session): The database session.
+            now (datetime, optional): The current time (UTC); defaults to now.
+
+        Returns:
+            int: The number of keys deleted.
+        """
+        now = now or datetime.utcnow()
+        deleted = db.query(IdempotencyKey).filter(IdempotencyKey.expires_at <= now).delete(synchronize_session=False)
+        db.commit()
+        return deleted
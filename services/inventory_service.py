@@ -1,28 +1,237 @@
+from datetime import datetime, timedelta
+from sqlalchemy import and_, case, or_, text, func, select, insert, update, literal, DateTime
 from sqlalchemy.orm import Session
-from models.inventory import Item
+from models.inventory import Item, StockReservation, CatalogVersion, ItemChange
 from memory_profiler import profile
 from database import SessionLocal
+from services.cache import TTLCache
+from decouple import config
+import base64
+import json
+import logging
+import re
+import threading
+import time
 import pybreaker
 import requests
 
 circuit_breaker = pybreaker.CircuitBreaker(fail_max=5, reset_timeout=30)
 
+# Weighted text searched by the Postgres full-text index.
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(category, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+ITEM_CACHE_SIZE = config("ITEM_CACHE_SIZE", default=1024, cast=int)
+ITEM_CACHE_TTL = config("ITEM_CACHE_TTL", default=300, cast=float)
+ITEM_STOCK_STALENESS = config("ITEM_STOCK_STALENESS", default=5, cast=float)
+# Seconds between reads of the change log for items written by other processes.
+ITEM_CACHE_SYNC_INTERVAL = config("ITEM_CACHE_SYNC_INTERVAL", default=1, cast=float)
+RESERVATION_TTL = config("RESERVATION_TTL", default=900, cast=int)
+RESERVATION_MAX_TTL = config("RESERVATION_MAX_TTL", default=3600, cast=int)
+RESERVATION_SWEEP_INTERVAL = config("RESERVATION_SWEEP_INTERVAL", default=30, cast=float)
+ITEM_CHANGE_RETENTION = config("ITEM_CHANGE_RETENTION", default=86400, cast=int)
+BULK_UPDATE_CHUNK_SIZE = config("BULK_UPDATE_CHUNK_SIZE", default=1000, cast=int)
+BULK_UPDATE_OPERATIONS = {
+    "name": ("set",),
+    "category": ("set",),
+    "description": ("set",),
+    "price": ("set", "add", "multiply"),
+    "stock_count": ("set", "add"),
+}
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+ITEM_FIELDS = ("id", "name", "category", "price", "description", "stock_count", "version")
+SORTABLE_FIELDS = ("id", "name", "category", "price", "stock_count")
+
+
+def create_search_index(bind):
+    """
+    Creates the full-text index over item names, categories and descriptions.
+
+    On SQLite this is an external-content FTS5 table, `items_fts`, kept in sync
+    with `items` by triggers and populated from the existing rows when first
+    created. On Postgres it is a GIN index over a weighted tsvector expression,
+    which the database maintains itself.
+
+    Args:
+        bind (Engine): The engine of the inventory database.
+    """
+    with bind.begin() as connection:
+        if bind.dialect.name == "postgresql":
+            connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_items_search ON items USING GIN (({SEARCH_VECTOR}))"))
+            return
+        exists = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'items_fts'")).first()
+        if exists:
+            return
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE items_fts USING fts5("
+            "name, category, description, content='items', content_rowid='id')"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER items_fts_insert AFTER INSERT ON items BEGIN "
+            "INSERT INTO items_fts(rowid, name, category, description) "
+            "VALUES (new.id, new.name, new.category, new.description); END"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER items_fts_delete AFTER DELETE ON items BEGIN "
+            "INSERT INTO items_fts(items_fts, rowid, name, category, description) "
+            "VALUES ('delete', old.id, old.name, old.category, old.description); END"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER items_fts_update AFTER UPDATE OF name, category, description ON items BEGIN "
+            "INSERT INTO items_fts(items_fts, rowid, name, category, description) "
+            "VALUES ('delete', old.id, old.name, old.category, old.description); "
+            "INSERT INTO items_fts(rowid, name, category, description) "
+            "VALUES (new.id, new.name, new.category, new.description); END"
+        ))
+        connection.execute(text("INSERT INTO items_fts(items_fts) VALUES ('rebuild')"))
+
+
+def start_reservation_sweeper(session_factory=SessionLocal, interval: float = RESERVATION_SWEEP_INTERVAL):
+    """
+    Starts a daemon thread that periodically expires lapsed stock reservations
+    and prunes change log entries older than ITEM_CHANGE_RETENTION seconds.
+
+    Args:
+        session_factory (sessionmaker): Creates the sessions used by the sweeper.
+        interval (float): The number of seconds between sweeps.
+
+    Returns:
+        threading.Event: Set it to stop the sweeper.
+    """
+    stop = threading.Event()
+    service = InventoryService()
+
+    def sweep():
+        while not stop.wait(interval):
+            db = session_factory()
+            try:
+                service.expire_reservations(db)
+                service.prune_changes(db)
+            except Exception as e:
+                logging.error(f"Reservation sweep failed: {e}")
+            finally:
+                db.close()
+
+    threading.Thread(target=sweep, name="reservation-sweeper", daemon=True).start()
+    return stop
+
+
+def item_filters(category: str = None, min_price: float = None, max_price: float = None, in_stock: bool = None, ids: list = None):
+    """
+    Builds the filter conditions shared by item listings and bulk updates.
+
+    Args:
+        category (str, optional): Only match items in this category.
+        min_price (float, optional): Lower bound on the item price.
+        max_price (float, optional): Upper bound on the item price.
+        in_stock (bool, optional): Only match items with (or without) stock.
+        ids (list[int], optional): Only match items with these IDs.
+
+    Returns:
+        list: SQLAlchemy conditions, all of which must hold.
+    """
+    conditions = []
+    if category is not None:
+        conditions.append(Item.category == category)
+    if min_price is not None:
+        conditions.append(Item.price >= min_price)
+    if max_price is not None:
+        conditions.append(Item.price <= max_price)
+    if in_stock is not None:
+        conditions.append(Item.stock_count > 0 if in_stock else Item.stock_count <= 0)
+    if ids is not None:
+        conditions.append(Item.id.in_(ids))
+    return conditions
+
+
+def encode_cursor(sort_value, item_id: int) -> str:
+    """
+    Encodes the position of the last item of a page into an opaque cursor.
+
+    Args:
+        sort_value: The value of the sort column for the last item.
+        item_id (int): The ID of the last item, used as a tie-breaker.
+
+    Returns:
+        str: A URL-safe cursor string.
+    """
+    raw = json.dumps([sort_value, item_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str):
+    """
+    Decodes a cursor produced by `encode_cursor`.
+
+    Args:
+        cursor (str): The cursor string.
+
+    Returns:
+        tuple: The sort value and the item ID of the last item seen.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        sort_value, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort_value, int(item_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
 
 class InventoryService:
     """
     A service class for managing inventory operations.
 
+    Item lookups by ID are served from an in-process LRU cache. Cached rows
+    expire after ITEM_CACHE_TTL seconds, while their stock count is re-read
+    once it is older than ITEM_STOCK_STALENESS seconds. Every write made
+    through this service invalidates the affected entries, increments the
+    version of the changed items and the version of the catalog as a whole.
+    Writes made by other processes, such as purchases taken by the sales
+    service, are picked up from the change log at most ITEM_CACHE_SYNC_INTERVAL
+    seconds later.
+
     Methods:
         call_inventory_api(): Calls an external inventory API.
         create_item(): Creates a new inventory item.
         get_item(): Retrieves an item by its ID.
         update_item(): Updates an inventory item.
         deduct_item(): Deducts one unit from an item's stock count.
+        take_stock(): Deducts units from an item's stock without committing.
         get_all_items(): Retrieves all inventory items.
+        list_items(): Retrieves a filtered, sorted page of inventory items.
+        search_items(): Retrieves a ranked page of items matching a text query.
+        bulk_update_items(): Updates every item matching a filter with set-based statements.
         get_item_details(): Retrieves detailed information about an item.
         delete_item(): Deletes a specific inventory item.
         delete_all_items(): Deletes all inventory items.
+        cache_stats(): Returns the item cache counters.
+        sync_item_cache(): Invalidates the cached items changed by other processes.
+        get_catalog_version(): Returns the version counter of the whole catalog.
+        get_available_stock(): Returns the stock of an item not held by reservations.
+        reserve_item(): Places a temporary hold on units of an item.
+        confirm_reservation(): Converts a hold into a stock deduction.
+        release_reservation(): Returns held units to the available stock.
+        expire_reservations(): Marks every lapsed hold as expired.
+        get_changes(): Retrieves change log entries after a sequence number.
+        get_latest_change_id(): Returns the sequence number of the newest change.
+        changes_truncated(): Checks whether changes after a sequence number were pruned.
+        prune_changes(): Deletes old change log entries.
     """
+    def __init__(self):
+        self.item_cache = TTLCache(maxsize=ITEM_CACHE_SIZE, ttl=ITEM_CACHE_TTL)
+        self.stock_staleness = ITEM_STOCK_STALENESS
+        self.cache_sync_interval = ITEM_CACHE_SYNC_INTERVAL
+        self._synced_change_id = None
+        self._synced_at = 0.0
+        self._sync_lock = threading.Lock()
+
     @circuit_breaker
     def call_inventory_api(self, endpoint: str, data: dict):
         """
@@ -70,6 +279,9 @@ class InventoryService:
             stock_count=data["stock_count"]
         )
         db.add(new_item)
+        db.flush()
+        self._record_change(db, new_item.id, "created", new_item.stock_count, new_item.price)
+        self._bump_catalog_version(db)
         db.commit()
         db.refresh(new_item)
         return new_item
@@ -86,7 +298,147 @@ class InventoryService:
         Returns:
             Item or None: The inventory item if found, else None.
         """
-        return db.query(Item).filter(Item.id == item_id).first()
+        return self._load_item(db, item_id)
+
+    def _load_item(self, db: Session, item_id: int):
+        """
+        Reads an item through the item cache.
+
+        Cache hits return a detached copy of the cached row. The stock count
+        and version of a hit are re-read from the database when they are older
+        than the allowed staleness: if the version is unchanged the new stock
+        count is stored as a new entry, otherwise the whole row is reloaded,
+        since another process may have changed more than the stock. Cached
+        entries are never modified in place, and a row read while an entry was
+        invalidated is returned but not cached, since it may predate the write.
+
+        Args:
+            db (Session): The database session.
+            item_id (int): The ID of the item.
+
+        Returns:
+            Item or None: The inventory item if found, else None.
+        """
+        self.sync_item_cache(db)
+        now = time.monotonic()
+        generation = self.item_cache.generation
+        entry = self.item_cache.get(item_id)
+        if entry is not None:
+            if now - entry["stock_checked_at"] > self.stock_staleness:
+                row = db.query(Item.stock_count, Item.version).filter(Item.id == item_id).first()
+                if row is None:
+                    self.item_cache.invalidate(item_id)
+                    return None
+                if row.version != entry["item"]["version"]:
+                    entry = None
+                else:
+                    entry = {"item": dict(entry["item"], stock_count=row.stock_count), "stock_checked_at": now}
+                    self.item_cache.set(item_id, entry, generation)
+            if entry is not None:
+                return Item(**entry["item"])
+
+        item = db.query(Item).filter(Item.id == item_id).first()
+        if item:
+            snapshot = {field: getattr(item, field) for field in ITEM_FIELDS}
+            self.item_cache.set(item_id, {"item": snapshot, "stock_checked_at": now}, generation)
+        return item
+
+    def sync_item_cache(self, db: Session):
+        """
+        Invalidates the cached items changed by other processes since the last sync.
+
+        Writes made through another InventoryService only invalidate that
+        instance's cache, but every one of them is recorded in the change log,
+        so the items changed after the last change seen are evicted. Runs at
+        most once per `cache_sync_interval` seconds, and never concurrently.
+        The whole cache is cleared if the entries after the last change seen
+        were already pruned, or include a change logged without an item ID,
+        which `delete_all_items` records for the whole catalog.
+
+        Args:
+            db (Session): The database session.
+        """
+        now = time.monotonic()
+        if now - self._synced_at < self.cache_sync_interval or not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._synced_at = now
+            since = self._synced_change_id
+            if since is None or self.changes_truncated(db, since):
+                if since is not None:
+                    self.item_cache.clear()
+                self._synced_change_id = self.get_latest_change_id(db)
+                return
+            rows = (
+                db.query(ItemChange.item_id, func.max(ItemChange.id).label("last_id"))
+                .filter(ItemChange.id > since)
+                .group_by(ItemChange.item_id)
+                .all()
+            )
+            if any(row.item_id is None for row in rows):
+                self.item_cache.clear()
+            else:
+                for row in rows:
+                    self.item_cache.invalidate(row.item_id)
+            if rows:
+                self._synced_change_id = max(row.last_id for row in rows)
+        finally:
+            self._sync_lock.release()
+
+    def _bump_catalog_version(self, db: Session):
+        """
+        Increments the catalog version within the current transaction.
+
+        Args:
+            db (Session): The database session.
+        """
+        bumped = (
+            db.query(CatalogVersion)
+            .filter(CatalogVersion.name == "items")
+            .update({CatalogVersion.version: CatalogVersion.version + 1}, synchronize_session=False)
+        )
+        if not bumped:
+            db.add(CatalogVersion(name="items", version=1))
+
+    def _record_change(self, db: Session, item_id, change_type: str, stock_count=None, price=None):
+        """
+        Appends an entry to the change log within the current transaction.
+
+        Args:
+            db (Session): The database session.
+            item_id (int or None): The ID of the changed item.
+            change_type (str): created, updated, deleted or cleared.
+            stock_count (int, optional): The stock count after the change.
+            price (float, optional): The price after the change.
+        """
+        db.add(ItemChange(
+            item_id=item_id,
+            change_type=change_type,
+            stock_count=stock_count,
+            price=price,
+            created_at=datetime.utcnow(),
+        ))
+
+    def get_catalog_version(self, db: Session):
+        """
+        Returns the version counter of the whole catalog.
+
+        Args:
+            db (Session): The database session.
+
+        Returns:
+            int: The catalog version, 0 if the catalog was never written.
+        """
+        return db.query(CatalogVersion.version).filter(CatalogVersion.name == "items").scalar() or 0
+
+    def cache_stats(self):
+        """
+        Returns the item cache counters.
+
+        Returns:
+            dict: The cache size, hits, misses, hit ratio, evictions and expirations.
+        """
+        return self.item_cache.stats()
 
     @profile
     def update_item(self, db: Session, item_id: int, data: dict):
@@ -110,8 +462,12 @@ class InventoryService:
 
         for key, value in data.items():
             setattr(item, key, value)
+        item.version = (item.version or 0) + 1
+        self._record_change(db, item_id, "updated", item.stock_count, item.price)
+        self._bump_catalog_version(db)
 
         db.commit()
+        self.item_cache.invalidate(item_id)
         db.refresh(item)
         return item
 
@@ -120,6 +476,10 @@ class InventoryService:
         """
         Deducts one unit from an item's stock count.
 
+        Units held by active reservations cannot be deducted. The check and
+        the decrement are one conditional UPDATE (see `take_stock`), so
+        concurrent deductions cannot take the last unit twice.
+
         Args:
             db (Session): The database session.
             item_id (int): The ID of the item to deduct.
@@ -130,16 +490,55 @@ class InventoryService:
         Raises:
             ValueError: If the item is not found or has no stock available.
         """
-        item = db.query(Item).filter(Item.id == item_id).first()
-        if not item:
-            raise ValueError("Item not found")
-        if item.stock_count <= 0:
+        if self.take_stock(db, item_id, 1) is None:
+            db.rollback()
+            if db.query(Item.id).filter(Item.id == item_id).first() is None:
+                raise ValueError("Item not found")
             raise ValueError("No stock available to deduct")
-
-        item.stock_count -= 1
         db.commit()
-        db.refresh(item)
-        return item
+        return db.query(Item).filter(Item.id == item_id).first()
+
+    def take_stock(self, db: Session, item_id: int, quantity: int):
+        """
+        Deducts units from an item's stock within the current transaction.
+
+        The availability check and the decrement are a single conditional
+        UPDATE, so concurrent callers cannot oversell the item, and units held
+        by active reservations are never taken. Nothing is committed, so
+        callers can combine the deduction with writes to other tables.
+
+        Args:
+            db (Session): The database session.
+            item_id (int): The ID of the item.
+            quantity (int): The number of units to deduct.
+
+        Returns:
+            Row or None: The item's price and remaining stock count, or None
+            if the item is not found or has too little stock available.
+        """
+        held = (
+            select(func.coalesce(func.sum(StockReservation.quantity), 0))
+            .where(
+                StockReservation.item_id == item_id,
+                StockReservation.status == "Active",
+                StockReservation.expires_at > datetime.utcnow(),
+            )
+            .scalar_subquery()
+        )
+        statement = (
+            update(Item)
+            .where(Item.id == item_id, Item.stock_count - held >= quantity)
+            .values(stock_count=Item.stock_count - quantity, version=Item.version + 1)
+            .returning(Item.price, Item.stock_count)
+            .execution_options(synchronize_session=False)
+        )
+        row = db.execute(statement).first()
+        if row is None:
+            return None
+        self._record_change(db, item_id, "updated", row.stock_count, row.price)
+        self._bump_catalog_version(db)
+        self.item_cache.invalidate(item_id)
+        return row
 
     @profile
     def get_all_items(self, db: Session):
@@ -154,6 +553,281 @@ class InventoryService:
         """
         return db.query(Item).all()
 
+    @profile
+    def list_items(
+        self,
+        db: Session,
+        category: str = None,
+        min_price: float = None,
+        max_price: float = None,
+        in_stock: bool = None,
+        sort: str = "id",
+        order: str = "asc",
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: str = None,
+        fields: list = None,
+        ids: list = None,
+    ):
+        """
+        Retrieves a filtered, sorted page of inventory items.
+
+        Pagination is keyset based: the cursor holds the sort value and ID of
+        the last item returned, so each page is an index range scan no matter
+        how deep the client pages. Only the requested columns are loaded.
+
+        Args:
+            db (Session): The database session.
+            category (str, optional): Only return items in this category.
+            min_price (float, optional): Lower bound on the item price.
+            max_price (float, optional): Upper bound on the item price.
+            in_stock (bool, optional): Only return items with (or without) stock.
+            sort (str): The column to sort by.
+            order (str): The sort direction, "asc" or "desc".
+            limit (int): The page size, capped at MAX_PAGE_SIZE.
+            cursor (str, optional): The cursor returned with the previous page.
+            fields (list[str], optional): The columns to return. "id" is always included.
+            ids (list[int], optional): Only return items with these IDs.
+
+        Returns:
+            tuple[list[dict], str or None]: The page of items and the cursor of the next page.
+
+        Raises:
+            ValueError: If the sort column, order, fields or cursor are invalid.
+        """
+        if sort not in SORTABLE_FIELDS:
+            raise ValueError(f"Cannot sort by '{sort}'")
+        if order not in ("asc", "desc"):
+            raise ValueError("Order must be 'asc' or 'desc'")
+        fields = list(fields) if fields else list(ITEM_FIELDS)
+        unknown = [field for field in fields if field not in ITEM_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        if "id" not in fields:
+            fields.insert(0, "id")
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        sort_column = getattr(Item, sort)
+        # The sort column is always loaded so the next cursor can be built.
+        columns = [getattr(Item, field) for field in fields]
+        if sort not in fields:
+            columns.append(sort_column)
+        query = db.query(*columns).filter(
+            *item_filters(category=category, min_price=min_price, max_price=max_price, in_stock=in_stock, ids=ids)
+        )
+
+        descending = order == "desc"
+        if cursor:
+            last_value, last_id = decode_cursor(cursor)
+            if sort == "id":
+                query = query.filter(Item.id < last_id if descending else Item.id > last_id)
+            elif descending:
+                query = query.filter(or_(sort_column < last_value, and_(sort_column == last_value, Item.id < last_id)))
+            else:
+                query = query.filter(or_(sort_column > last_value, and_(sort_column == last_value, Item.id > last_id)))
+
+        if sort == "id":
+            ordering = [Item.id.desc() if descending else Item.id.asc()]
+        else:
+            ordering = [sort_column.desc(), Item.id.desc()] if descending else [sort_column.asc(), Item.id.asc()]
+        rows = query.order_by(*ordering).limit(limit + 1).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]._mapping
+            next_cursor = encode_cursor(last[sort], last["id"])
+        items = [{field: row._mapping[field] for field in fields} for row in rows]
+        return items, next_cursor
+
+    def _bulk_update_values(self, changes: dict):
+        """
+        Translates bulk update operations into UPDATE column expressions.
+
+        Adding a negative amount to a price or stock count stops at 0.
+
+        Args:
+            changes (dict): Maps a field to {"op": "set" | "add" | "multiply", "value": ...}.
+
+        Returns:
+            dict: The values clause of the UPDATE statement.
+
+        Raises:
+            ValueError: If a field, operation or value is not allowed.
+        """
+        if not changes or not isinstance(changes, dict):
+            raise ValueError("At least one field to update is required")
+        values = {}
+        for field, change in changes.items():
+            if field not in BULK_UPDATE_OPERATIONS:
+                raise ValueError(f"Field '{field}' cannot be bulk updated")
+            if not isinstance(change, dict) or change.get("op") not in BULK_UPDATE_OPERATIONS[field]:
+                allowed = ", ".join(BULK_UPDATE_OPERATIONS[field])
+                raise ValueError(f"Operation on '{field}' must be one of: {allowed}")
+            op, value = change["op"], change.get("value")
+            column = getattr(Item, field)
+            if field in ("price", "stock_count"):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    raise ValueError(f"Value for '{field}' must be a number")
+                if field == "stock_count" and not isinstance(value, int):
+                    raise ValueError("Value for 'stock_count' must be an integer")
+                if op in ("set", "multiply") and value < 0:
+                    raise ValueError(f"Value for '{field}' cannot be negative")
+            elif not isinstance(value, str) or (field != "description" and not value):
+                raise ValueError(f"Value for '{field}' must be a non-empty string")
+
+            if op == "set":
+                values[column] = value
+            elif op == "add" and field == "stock_count":
+                values[column] = case((column + value < 0, 0), else_=column + value)
+            elif op == "add":
+                values[column] = func.round(case((column + value < 0, 0), else_=column + value), 2)
+            else:
+                values[column] = func.round(column * value, 2)
+        values[Item.version] = Item.version + 1
+        return values
+
+    @profile
+    def bulk_update_items(self, db: Session, filters: dict, changes: dict, chunk_size: int = BULK_UPDATE_CHUNK_SIZE):
+        """
+        Updates every item matching a filter with set-based statements.
+
+        Matching IDs are walked in keyset order, and each chunk is updated
+        with one UPDATE ... WHERE id IN (...) statement and committed on its
+        own, so locks are held briefly and no row is visited twice. The
+        UPDATE repeats the filter, so an item changed to no longer match
+        between the two statements is left alone. Price and stock changes are
+        written to the change log and the item cache is invalidated for every chunk.
+
+        Args:
+            db (Session): The database session.
+            filters (dict): Any of "category", "ids", "min_price", "max_price". At least one is required.
+            changes (dict): Maps a field to {"op": "set" | "add" | "multiply", "value": ...}.
+            chunk_size (int): The number of items updated per statement.
+
+        Returns:
+            int: The number of items updated.
+
+        Raises:
+            ValueError: If the filter is empty, unknown or invalid, or a change is not allowed.
+        """
+        if filters is not None and not isinstance(filters, dict):
+            raise ValueError("The filter must be an object")
+        filters = dict(filters or {})
+        unknown = set(filters) - {"category", "ids", "min_price", "max_price"}
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+        if not any(value is not None for value in filters.values()):
+            raise ValueError("At least one filter is required")
+        ids = filters.get("ids")
+        if ids is not None and (
+            not isinstance(ids, list) or any(isinstance(item_id, bool) or not isinstance(item_id, int) for item_id in ids)
+        ):
+            raise ValueError("Filter 'ids' must be a list of integers")
+        for bound in ("min_price", "max_price"):
+            value = filters.get(bound)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                raise ValueError(f"Filter '{bound}' must be a number")
+        if filters.get("category") is not None and not isinstance(filters["category"], str):
+            raise ValueError("Filter 'category' must be a string")
+        conditions = item_filters(**filters)
+        values = self._bulk_update_values(changes)
+        logs_change = "price" in changes or "stock_count" in changes
+
+        updated = 0
+        last_id = 0
+        while True:
+            ids = [
+                row.id
+                for row in db.query(Item.id)
+                .filter(*conditions, Item.id > last_id)
+                .order_by(Item.id)
+                .limit(chunk_size)
+            ]
+            if not ids:
+                break
+            last_id = ids[-1]
+            rows = db.execute(
+                update(Item)
+                .where(Item.id.in_(ids), *conditions)
+                .values(values)
+                .returning(Item.id, Item.stock_count, Item.price)
+            ).all()
+            updated += len(rows)
+            if logs_change and rows:
+                now = datetime.utcnow()
+                db.execute(insert(ItemChange), [
+                    {
+                        "item_id": row.id,
+                        "change_type": "updated",
+                        "stock_count": row.stock_count,
+                        "price": row.price,
+                        "created_at": now,
+                    }
+                    for row in rows
+                ])
+            self._bump_catalog_version(db)
+            db.commit()
+            for item_id in ids:
+                self.item_cache.invalidate(item_id)
+        return updated
+
+    @profile
+    def search_items(self, db: Session, query: str, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
+        """
+        Retrieves a ranked page of items matching a text query.
+
+        Every word of the query must appear in the item name, category or
+        description. Results are ranked by BM25 on SQLite (name matches weigh
+        the most) and by ts_rank on Postgres, best match first, and paginated
+        with a keyset cursor on (score, id).
+
+        Args:
+            db (Session): The database session.
+            query (str): The text to search for.
+            limit (int): The page size, capped at MAX_PAGE_SIZE.
+            cursor (str, optional): The cursor returned with the previous page.
+
+        Returns:
+            tuple[list[dict], str or None]: The page of items and the cursor of the next page.
+
+        Raises:
+            ValueError: If the query has no words or the cursor is invalid.
+        """
+        terms = re.findall(r"\w+", query or "")
+        if not terms:
+            raise ValueError("Search query must contain at least one word")
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        if db.get_bind().dialect.name == "postgresql":
+            params = {"match": " ".join(terms)}
+            ranked = (
+                f"SELECT id, -ts_rank({SEARCH_VECTOR}, plainto_tsquery('english', :match)) AS score "
+                f"FROM items WHERE {SEARCH_VECTOR} @@ plainto_tsquery('english', :match)"
+            )
+        else:
+            # Quoting every term keeps FTS5 operators in user input from being interpreted.
+            params = {"match": " ".join(f'"{term}"' for term in terms)}
+            ranked = (
+                "SELECT rowid AS id, bm25(items_fts, 10.0, 5.0, 1.0) AS score "
+                "FROM items_fts WHERE items_fts MATCH :match"
+            )
+
+        columns = ", ".join(f"items.{field}" for field in ITEM_FIELDS)
+        sql = f"SELECT {columns}, ranked.score FROM ({ranked}) AS ranked JOIN items ON items.id = ranked.id"
+        if cursor:
+            params["last_score"], params["last_id"] = decode_cursor(cursor)
+            sql += " WHERE ranked.score > :last_score OR (ranked.score = :last_score AND items.id > :last_id)"
+        sql += " ORDER BY ranked.score, items.id LIMIT :limit"
+        params["limit"] = limit + 1
+        rows = db.execute(text(sql), params).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].score, rows[-1].id)
+        items = [{field: row._mapping[field] for field in ITEM_FIELDS} for row in rows]
+        return items, next_cursor
+
     @profile
     def get_item_details(self, db: Session, item_id: int):
         """
@@ -169,7 +843,7 @@ class InventoryService:
         Raises:
             ValueError: If the item is not found.
         """
-        item = db.query(Item).filter(Item.id == item_id).first()
+        item = self._load_item(db, item_id)
         if not item:
             raise ValueError("Item not found")
         return item
@@ -192,8 +866,12 @@ class InventoryService:
         item = db.query(Item).filter(Item.id == item_id).first()
         if not item:
             raise ValueError("Item not found")
+        db.query(StockReservation).filter(StockReservation.item_id == item_id).delete(synchronize_session=False)
         db.delete(item)
+        self._record_change(db, item_id, "deleted")
+        self._bump_catalog_version(db)
         db.commit()
+        self.item_cache.invalidate(item_id)
         return {"message": f"Item with ID {item_id} deleted successfully"}
 
     @profile
@@ -207,8 +885,287 @@ class InventoryService:
         Returns:
             None
         """
+        db.query(StockReservation).delete(synchronize_session=False)
         db.query(Item).delete()
+        self._record_change(db, None, "cleared")
+        self._bump_catalog_version(db)
+        db.commit()
+        self.item_cache.clear()
+
+    def _available_stock_query(self, item_id: int, now: datetime):
+        """
+        Builds a query for the stock of an item minus its active holds.
+
+        The held quantity is summed through the (item_id, status, expires_at)
+        index, so only the item's live reservations are read.
+
+        Args:
+            item_id (int): The ID of the item.
+            now (datetime): Holds expiring at or before this time are ignored.
+
+        Returns:
+            Select: A single-value query, NULL if the item does not exist.
+        """
+        held = (
+            select(func.coalesce(func.sum(StockReservation.quantity), 0))
+            .where(
+                StockReservation.item_id == item_id,
+                StockReservation.status == "Active",
+                StockReservation.expires_at > now,
+            )
+            .scalar_subquery()
+        )
+        return select(Item.stock_count - held).where(Item.id == item_id)
+
+    @profile
+    def get_available_stock(self, db: Session, item_id: int):
+        """
+        Returns the stock of an item that is not held by active reservations.
+
+        Args:
+            db (Session): The database session.
+            item_id (int): The ID of the item.
+
+        Returns:
+            int: The number of units that can still be reserved or deducted.
+
+        Raises:
+            ValueError: If the item is not found.
+        """
+        available = db.execute(self._available_stock_query(item_id, datetime.utcnow())).scalar()
+        if available is None:
+            raise ValueError("Item not found")
+        return available
+
+    @profile
+    def reserve_item(self, db: Session, item_id: int, quantity: int, ttl_seconds: int = RESERVATION_TTL):
+        """
+        Places a temporary hold on units of an item.
+
+        The item row is locked (SELECT ... FOR UPDATE) first, so concurrent
+        reservations and confirmations of the same item run one at a time on
+        databases with row locks, and each one's availability check sees the
+        holds committed before it. The check and the insert then run as a
+        single INSERT ... SELECT statement.
+
+        Args:
+            db (Session): The database session.
+            item_id (int): The ID of the item to reserve.
+            quantity (int): The number of units to hold.
+            ttl_seconds (int): How long the hold lasts, capped at RESERVATION_MAX_TTL.
+
+        Returns:
+            StockReservation: The created reservation.
+
+        Raises:
+            ValueError: If the quantity or TTL is invalid, the item is not found
+                or there is not enough available stock.
+        """
+        if not isinstance(quantity, int) or quantity <= 0:
+            raise ValueError("Quantity must be a positive integer")
+        if not isinstance(ttl_seconds, int) or not 0 < ttl_seconds <= RESERVATION_MAX_TTL:
+            raise ValueError(f"TTL must be an integer between 1 and {RESERVATION_MAX_TTL} seconds")
+        if not db.query(Item.id).filter(Item.id == item_id).with_for_update().first():
+            db.rollback()
+            raise ValueError("Item not found")
+
+        now = datetime.utcnow()
+        available = self._available_stock_query(item_id, now).scalar_subquery()
+        statement = (
+            insert(StockReservation)
+            .from_select(
+                ["item_id", "quantity", "status", "created_at", "expires_at"],
+                select(
+                    literal(item_id),
+                    literal(quantity),
+                    literal("Active"),
+                    literal(now, DateTime),
+                    literal(now + timedelta(seconds=ttl_seconds), DateTime),
+                ).where(available >= quantity),
+            )
+            .returning(StockReservation.id)
+        )
+        reservation_id = db.execute(statement).scalar()
+        if reservation_id is None:
+            db.rollback()
+            raise ValueError("Insufficient stock available to reserve")
+        db.commit()
+        return db.get(StockReservation, reservation_id)
+
+    @profile
+    def confirm_reservation(self, db: Session, reservation_id: int):
+        """
+        Converts an active hold into a deduction of the item's stock.
+
+        Args:
+            db (Session): The database session.
+            reservation_id (int): The ID of the reservation.
+
+        Returns:
+            StockReservation: The confirmed reservation.
+
+        Raises:
+            ValueError: If the reservation is not found or is no longer active.
+        """
+        reservation = db.get(StockReservation, reservation_id)
+        if not reservation:
+            raise ValueError("Reservation not found")
+        confirmed = (
+            db.query(StockReservation)
+            .filter(
+                StockReservation.id == reservation_id,
+                StockReservation.status == "Active",
+                StockReservation.expires_at > datetime.utcnow(),
+            )
+            .update({StockReservation.status: "Confirmed"}, synchronize_session=False)
+        )
+        if not confirmed:
+            db.rollback()
+            raise ValueError("Reservation is no longer active")
+        db.query(Item).filter(Item.id == reservation.item_id).update(
+            {Item.stock_count: Item.stock_count - reservation.quantity, Item.version: Item.version + 1},
+            synchronize_session=False,
+        )
+        stock_count, price = db.query(Item.stock_count, Item.price).filter(Item.id == reservation.item_id).one()
+        self._record_change(db, reservation.item_id, "updated", stock_count, price)
+        self._bump_catalog_version(db)
+        db.commit()
+        self.item_cache.invalidate(reservation.item_id)
+        db.refresh(reservation)
+        return reservation
+
+    @profile
+    def release_reservation(self, db: Session, reservation_id: int):
+        """
+        Releases an active hold, returning its units to the available stock.
+
+        Args:
+            db (Session): The database session.
+            reservation_id (int): The ID of the reservation.
+
+        Returns:
+            StockReservation: The released reservation.
+
+        Raises:
+            ValueError: If the reservation is not found or is no longer active.
+        """
+        reservation = db.get(StockReservation, reservation_id)
+        if not reservation:
+            raise ValueError("Reservation not found")
+        released = (
+            db.query(StockReservation)
+            .filter(StockReservation.id == reservation_id, StockReservation.status == "Active")
+            .update({StockReservation.status: "Released"}, synchronize_session=False)
+        )
+        if not released:
+            db.rollback()
+            raise ValueError("Reservation is no longer active")
+        db.commit()
+        db.refresh(reservation)
+        return reservation
+
+    def get_changes(self, db: Session, since: int, limit: int = 500):
+        """
+        Retrieves change log entries after a sequence number, oldest first.
+
+        Args:
+            db (Session): The database session.
+            since (int): The sequence number of the last change already seen.
+            limit (int): The maximum number of entries to return.
+
+        Returns:
+            list[dict]: The changes.
+        """
+        changes = (
+            db.query(ItemChange)
+            .filter(ItemChange.id > since)
+            .order_by(ItemChange.id)
+            .limit(limit)
+            .all()
+        )
+        return [
+            {
+                "id": change.id,
+                "item_id": change.item_id,
+                "change_type": change.change_type,
+                "stock_count": change.stock_count,
+                "price": change.price,
+                "created_at": change.created_at.isoformat(),
+            }
+            for change in changes
+        ]
+
+    def get_latest_change_id(self, db: Session):
+        """
+        Returns the sequence number of the newest change.
+
+        Args:
+            db (Session): The database session.
+
+        Returns:
+            int: The sequence number, 0 if the log is empty.
+        """
+        return db.query(func.max(ItemChange.id)).scalar() or 0
+
+    def changes_truncated(self, db: Session, since: int):
+        """
+        Checks whether changes after a sequence number were already pruned.
+
+        Args:
+            db (Session): The database session.
+            since (int): The sequence number of the last change already seen.
+
+        Returns:
+            bool: True if the client missed changes and has to reload the catalog.
+        """
+        oldest = db.query(func.min(ItemChange.id)).scalar()
+        return oldest is not None and oldest > since + 1
+
+    def prune_changes(self, db: Session, older_than: datetime = None):
+        """
+        Deletes change log entries older than the retention period.
+
+        The newest entry is always kept so sequence numbers keep increasing.
+
+        Args:
+            db (Session): The database session.
+            older_than (datetime, optional): The cut-off time. Defaults to
+                ITEM_CHANGE_RETENTION seconds ago.
+
+        Returns:
+            int: The number of entries deleted.
+        """
+        cutoff = older_than or datetime.utcnow() - timedelta(seconds=ITEM_CHANGE_RETENTION)
+        latest = self.get_latest_change_id(db)
+        pruned = (
+            db.query(ItemChange)
+            .filter(ItemChange.created_at < cutoff, ItemChange.id < latest)
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        return pruned
+
+    def expire_reservations(self, db: Session, now: datetime = None):
+        """
+        Marks every lapsed active hold as expired in one statement.
+
+        Expired holds already stop counting against the available stock once
+        they reach `expires_at`; this keeps the set of active rows small.
+
+        Args:
+            db (Session): The database session.
+            now (datetime, optional): The cut-off time. Defaults to the current UTC time.
+
+        Returns:
+            int: The number of reservations expired.
+        """
+        expired = (
+            db.query(StockReservation)
+            .filter(StockReservation.status == "Active", StockReservation.expires_at <= (now or datetime.utcnow()))
+            .update({StockReservation.status: "Expired"}, synchronize_session=False)
+        )
         db.commit()
+        return expired
 
 
 if __name__ == "__main__":
@@ -0,0 +1,206 @@
+from datetime import datetime, timedelta
+import heapq
+import threading
+
+"""
+Leaderboard Module
+==================
+
+This module provides an in-memory ranking of items by the sales of the last
+hours or days, kept up to date as sales are recorded so that reading it does
+not scan the sales table.
+
+Classes
+-------
+
+- **SalesLeaderboard**:
+  A thread-safe set of per-item counters bucketed by hour, with running
+  totals per time window and a heap-based top-K query whose results are
+  cached until the counters change.
+"""
+
+
+EPOCH = datetime(1970, 1, 1)
+HOUR = timedelta(hours=1)
+DEFAULT_WINDOWS = {"24h": 24, "7d": 7 * 24, "30d": 30 * 24}
+RANKINGS = ("units", "revenue")
+
+
+def hour_of(moment: datetime) -> int:
+    """
+    Returns the number of whole hours between the epoch and a naive UTC datetime.
+    """
+    return (moment - EPOCH) // HOUR
+
+
+class SalesLeaderboard:
+    """
+    Per-item sales counters over sliding time windows.
+
+    Sales are added to hourly buckets, and to the running totals of every
+    window that covers their hour. When the clock moves into a new hour, the
+    buckets that fall out of a window are subtracted from its totals, and
+    buckets older than the longest window are dropped. A window therefore
+    covers the current hour and the hours before it, up to its length.
+
+    Attributes:
+        windows (dict[str, int]): The window names and their lengths in hours.
+        loaded (bool): Whether the counters hold every recent sale.
+
+    Methods:
+        record(sales, sign, now): Adds or removes sales.
+        load(rows, now): Replaces the counters with pre-aggregated rows.
+        top(window, limit, by, now): Returns the best-selling items of a window.
+        clear(): Removes every counter.
+        stats(): Returns the leaderboard counters.
+    """
+    def __init__(self, windows: dict = None):
+        self.windows = dict(windows or DEFAULT_WINDOWS)
+        self.horizon = max(self.windows.values())
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, now: datetime):
+        self._buckets = {}
+        self._totals = {name: {} for name in self.windows}
+        self._current = hour_of(now or datetime.utcnow())
+        self._top = {}
+
+    def _add(self, counters: dict, item_id: int, units: int, revenue: float, sales: int):
+        counter = counters.get(item_id)
+        if counter is None:
+            if sales <= 0:
+                return
+            counter = counters[item_id] = [0, 0.0, 0]
+        counter[0] += units
+        counter[1] += revenue
+        counter[2] += sales
+        if counter[2] <= 0:
+            del counters[item_id]
+
+    def _advance(self, now: datetime):
+        """
+        Moves the windows forward to the hour of `now`.
+        """
+        current = hour_of(now or datetime.utcnow())
+        if current <= self._current:
+            return
+        for name, hours in self.windows.items():
+            dropped = range(self._current - hours + 1, current - hours + 1)
+            for hour in [hour for hour in self._buckets if hour in dropped]:
+                for item_id, (units, revenue, sales) in self._buckets[hour].items():
+                    self._add(self._totals[name], item_id, -units, -revenue, -sales)
+        for hour in [hour for hour in self._buckets if hour <= current - self.horizon]:
+            del self._buckets[hour]
+        self._current = current
+        self._top.clear()
+
+    def record(self, sales: list, sign: int = 1, now: datetime = None):
+        """
+        Adds sales to, or removes them from, the counters.
+
+        Sales older than the longest window are ignored.
+
+        Args:
+            sales (list[tuple]): (item_id, created_at, quantity, amount) per
+                sale, with created_at as a naive UTC datetime or None.
+            sign (int): 1 to add the sales, -1 to remove them.
+            now (datetime, optional): The current time (UTC); defaults to now.
+        """
+        with self._lock:
+            self._advance(now)
+            for item_id, created_at, quantity, amount in sales:
+                if created_at is None:
+                    continue
+                hour = hour_of(created_at)
+                if hour <= self._current - self.horizon:
+                    continue
+                units, revenue = sign * (quantity or 0), sign * (amount or 0)
+                self._add(self._buckets.setdefault(hour, {}), item_id, units, revenue, sign)
+                for name, hours in self.windows.items():
+                    if hour > self._current - hours:
+                        self._add(self._totals[name], item_id, units, revenue, sign)
+            self._top.clear()
+
+    def load(self, rows, now: datetime = None):
+        """
+        Replaces the counters with sales aggregated per item and hour.
+
+        Args:
+            rows (iterable[tuple]): (item_id, hour, units, revenue, sales)
+                per item and hour, with hour as a naive UTC datetime.
+            now (datetime, optional): The current time (UTC); defaults to now.
+        """
+        with self._lock:
+            self._reset(now)
+            for item_id, moment, units, revenue, sales in rows:
+                hour = hour_of(moment)
+                if hour <= self._current - self.horizon:
+                    continue
+                self._add(self._buckets.setdefault(hour, {}), item_id, units or 0, revenue or 0.0, sales)
+                for name, hours in self.windows.items():
+                    if hour > self._current - hours:
+                        self._add(self._totals[name], item_id, units or 0, revenue or 0.0, sales)
+            self.loaded = True
+
+    def top(self, window: str, limit: int = 10, by: str = "units", now: datetime = None):
+        """
+        Returns the best-selling items of a window.
+
+        The ranking is computed with a bounded heap over the window totals
+        and cached until the next sale or the next hour.
+
+        Args:
+            window (str): One of the window names, e.g. 24h.
+            limit (int): The number of items to return.
+            by (str): units or revenue.
+            now (datetime, optional): The current time (UTC); defaults to now.
+
+        Returns:
+            list[dict]: The items with their units, revenue and number of sales, best first.
+
+        Raises:
+            ValueError: If the window or the ranking is unknown.
+        """
+        if window not in self.windows:
+            raise ValueError(f"window must be one of: {', '.join(self.windows)}")
+        if by not in RANKINGS:
+            raise ValueError(f"by must be one of: {', '.join(RANKINGS)}")
+        field = RANKINGS.index(by)
+        with self._lock:
+            self._advance(now)
+            cached = self._top.get((window, by, limit))
+            if cached is None:
+                best = heapq.nlargest(
+                    limit,
+                    self._totals[window].items(),
+                    key=lambda entry: (entry[1][field], -entry[0]),
+                )
+                cached = self._top[(window, by, limit)] = [
+                    {"item_id": item_id, "units": units, "revenue": round(revenue, 2), "sales": sales}
+                    for item_id, (units, revenue, sales) in best
+                ]
+            return cached
+
+    def clear(self):
+        """
+        Removes every counter.
+        """
+        with self._lock:
+            self._reset(None)
+            self.loaded = False
+
+    def stats(self) -> dict:
+        """
+        Returns the leaderboard counters.
+
+        Returns:
+            dict: The number of hourly buckets and of items per window.
+        """
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "buckets": len(self._buckets),
+                "items": {name: len(totals) for name, totals in self._totals.items()},
+            }
@@ -1,12 +1,82 @@
+from datetime import datetime, timedelta
+from sqlalchemy import and_, case, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
-from models.review import Review
+from models.review import ProductRatingStats, Review
 from memory_profiler import profile
-from bleach import clean
+from services.sanitizer import sanitize, sanitize_many
+from decouple import config
+import json
+import logging
 import pybreaker
 import requests
+import uuid
 
 circuit_breaker = pybreaker.CircuitBreaker(fail_max=5, reset_timeout=30)
 
+STARS = range(1, 6)
+MODERATION_STATUSES = ("Approved", "Rejected")
+DEFAULT_CLAIM_SIZE = 20
+MAX_CLAIM_SIZE = 100
+MODERATION_LEASE_SECONDS = config("MODERATION_LEASE_SECONDS", default=300, cast=int)
+MAX_MODERATION_LEASE_SECONDS = 3600
+REVIEW_WRITE_ATTEMPTS = 3
+RATING_STATS_COLUMNS = ["rating_count", "rating_sum"] + [f"stars_{star}" for star in STARS]
+
+
+def star_of(rating: float) -> int:
+    """
+    Returns the whole star (1-5) a rating counts towards in the histogram.
+    """
+    return min(5, max(1, int(rating)))
+
+
+def star_filter(star: int):
+    """
+    Returns the SQL condition matching the ratings `star_of` maps to a star.
+    """
+    if star == 5:
+        return Review.rating >= 5
+    if star == 1:
+        return Review.rating < 2
+    return and_(Review.rating >= star, Review.rating < star + 1)
+
+
+def backfill_rating_stats(bind):
+    """
+    Builds the rating aggregates of a database whose approved reviews predate them.
+
+    Once the aggregates table exists, every write made through
+    `ReviewService` keeps it up to date, so an empty table next to approved
+    reviews means they were approved before it was created. Run at startup,
+    after `upgrade_schema`; it does nothing once the table holds a row. A
+    database upgraded while reviews were already being approved needs
+    `scripts/rebuild_rating_stats.py` instead.
+
+    Args:
+        bind (Engine): The engine of the reviews database.
+
+    Returns:
+        int: The number of products backfilled.
+    """
+    db = Session(bind=bind)
+    try:
+        if db.query(ProductRatingStats.product_id).first() is not None:
+            return 0
+        approved = db.query(Review.id).filter(Review.moderation_status == "Approved", Review.rating.isnot(None))
+        if approved.first() is None:
+            return 0
+        backfilled = ReviewService().rebuild_rating_stats(db)
+    except ValueError as e:
+        logging.error(f"Rating stats backfill failed: {e}")
+        return 0
+    finally:
+        db.close()
+    logging.info(f"Backfilled the rating stats of {backfilled} products")
+    return backfilled
+
+
 class ReviewService:
     """
     A service class for managing customer reviews, including operations to
@@ -16,12 +86,17 @@ class ReviewService:
         call_review_api(endpoint: str, data: dict): Calls an external review API.
         validate_review_data(data: dict): Validates and sanitizes review data.
         submit_review(db: Session, data: dict): Submits a new review to the database.
+        import_review_batch(db: Session, lines: list, workers: int): Validates and inserts a chunk of NDJSON reviews.
         update_review(db: Session, review_id: int, updates: dict): Updates an existing review in the database.
         delete_review(db: Session, review_id: int): Deletes a specific review from the database.
         get_product_reviews(db: Session, product_id: int): Retrieves all reviews for a specific product.
         get_customer_reviews(db: Session, customer_id: int): Retrieves all reviews made by a specific customer.
         moderate_review(db: Session, review_id: int, status: str): Moderates a review (approve or reject).
         get_pending_reviews(db: Session): Retrieves all reviews pending moderation.
+        claim_reviews(db: Session, limit: int, lease_seconds: int): Leases the next pending reviews to a moderator.
+        complete_reviews(db: Session, lease_id: str, decisions: list): Approves or rejects leased reviews in bulk.
+        get_rating_summary(db: Session, product_id: int): Retrieves the rating aggregates of a product.
+        rebuild_rating_stats(db: Session, product_id: int): Recomputes the rating aggregates from the reviews.
     """
     @circuit_breaker
     def call_review_api(self, endpoint: str, data: dict):
@@ -58,15 +133,30 @@ class ReviewService:
         Raises:
             ValueError: If the data contains invalid fields.
         """
-        if not 1 <= data.get("rating", 0) <= 5:
+        data["comment"] = sanitize(self._check_review_data(data))
+        return data
+
+    def _check_review_data(self, data: dict):
+        """
+        Validates the rating and comment of review data.
+
+        Returns:
+            str: The comment, stripped of surrounding whitespace but not yet sanitized.
+
+        Raises:
+            ValueError: If the data contains invalid fields.
+        """
+        rating = data.get("rating", 0)
+        if isinstance(rating, bool) or not isinstance(rating, (int, float)) or not 1 <= rating <= 5:
             raise ValueError("Rating must be between 1 and 5.")
-        
-        comment = data.get("comment", "").strip()
+
+        comment = data.get("comment", "")
+        if not isinstance(comment, str):
+            raise ValueError("Comment must be a string.")
+        comment = comment.strip()
         if len(comment) > 500:
             raise ValueError("Comment cannot exceed 500 characters.")
-        
-        data["comment"] = clean(comment, strip=True)
-        return data
+        return comment
 
     @profile
     def submit_review(self, db: Session, data: dict):
@@ -92,10 +182,68 @@ class ReviewService:
             comment=validated_data.get("comment", ""),
         )
         db.add(new_review)
+        db.flush()
+        self._update_rating_stats(db, [], self._approved_ratings([new_review]))
         db.commit()
         db.refresh(new_review)
         return new_review
 
+    def import_review_batch(self, db: Session, lines: list, workers: int = None):
+        """
+        Validates and inserts a chunk of NDJSON review records.
+
+        Every record is validated first; the comments of the valid ones are
+        then sanitized together, in worker processes for large chunks, and
+        the reviews are inserted with one executemany and committed as a
+        whole. Imported reviews are pending moderation.
+
+        Args:
+            db (Session): The database session.
+            lines (list[tuple[int, str]]): Line numbers and raw JSON records.
+            workers (int, optional): The number of sanitizer processes; see
+                `services.sanitizer.sanitize_many`.
+
+        Returns:
+            tuple[int, list[dict]]: The number of reviews imported and one
+            failure ({"line", "error"}) per rejected record.
+
+        Raises:
+            ValueError: If the chunk cannot be written.
+        """
+        failures = []
+        records = []
+        for line_number, raw in lines:
+            try:
+                data = json.loads(raw)
+                if not isinstance(data, dict):
+                    raise ValueError("Review must be a JSON object.")
+                for key in ("product_id", "customer_id"):
+                    if not isinstance(data.get(key), int):
+                        raise ValueError(f"{key} must be an integer.")
+                comment = self._check_review_data(data)
+            except (ValueError, TypeError) as e:
+                failures.append({"line": line_number, "error": str(e)})
+                continue
+            records.append({
+                "product_id": data["product_id"],
+                "customer_id": data["customer_id"],
+                "rating": data["rating"],
+                "comment": comment,
+                "moderation_status": "Pending",
+            })
+
+        if records:
+            comments = sanitize_many([record["comment"] for record in records], workers)
+            for record, comment in zip(records, comments):
+                record["comment"] = comment
+            try:
+                db.execute(insert(Review), records)
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                raise ValueError(f"Failed to import reviews: {e}")
+        return len(records), failures
+
     @profile
     def update_review(self, db: Session, review_id: int, updates: dict):
         """
@@ -112,17 +260,12 @@ class ReviewService:
         Raises:
             ValueError: If the review is not found or updates are invalid.
         """
-        review = db.query(Review).filter(Review.id == review_id).first()
-        if not review:
-            raise ValueError("Review not found")
-
         # Validate and sanitize updates
         if "rating" in updates or "comment" in updates:
             updates = self.validate_review_data(updates)
+        values = {key: value for key, value in updates.items() if key in Review.__table__.columns and key != "id"}
 
-        for key, value in updates.items():
-            setattr(review, key, value)
-        db.commit()
+        review = self._change_review(db, review_id, values)
         db.refresh(review)
         return review
 
@@ -138,12 +281,7 @@ class ReviewService:
         Raises:
             ValueError: If the review is not found.
         """
-        review = db.query(Review).filter(Review.id == review_id).first()
-        if not review:
-            raise ValueError("Review not found")
-
-        db.delete(review)
-        db.commit()
+        self._change_review(db, review_id, None)
 
     @profile
     def get_product_reviews(self, db: Session, product_id: int):
@@ -176,13 +314,9 @@ class ReviewService:
     @profile
     def moderate_review(self, db: Session, review_id: int, status: str):
         """Moderate a review: Approve or Reject."""
-        review = db.query(Review).filter(Review.id == review_id).first()
-        if not review:
-            raise ValueError("Review not found")
-        if status not in ["Approved", "Rejected"]:
+        if status not in MODERATION_STATUSES:
             raise ValueError("Invalid moderation status")
-        review.moderation_status = status
-        db.commit()
+        review = self._change_review(db, review_id, {"moderation_status": status})
         db.refresh(review)
         return review
 
@@ -190,6 +324,309 @@ class ReviewService:
     def get_pending_reviews(self, db: Session):
         """Fetch reviews that are pending moderation."""
         return db.query(Review).filter(Review.moderation_status == "Pending").all()
+
+    @profile
+    def claim_reviews(
+        self,
+        db: Session,
+        limit: int = DEFAULT_CLAIM_SIZE,
+        lease_seconds: int = MODERATION_LEASE_SECONDS,
+        now: datetime = None,
+    ):
+        """
+        Leases the next pending reviews to a moderator.
+
+        The oldest available pending reviews are picked and leased by one
+        conditional UPDATE, which walks the moderation queue index from its
+        start and stops after `limit` rows, however long the queue is. A
+        review is available when it has never been claimed or its lease has
+        expired, so abandoned leases return to the queue without a sweeper.
+        Concurrent claims never receive the same review: SQLite serializes
+        the updates, and on PostgreSQL the candidates are locked with SKIP
+        LOCKED.
+
+        Args:
+            db (Session): The database session.
+            limit (int): The number of reviews, at most MAX_CLAIM_SIZE.
+            lease_seconds (int): How long the reviews stay leased, at most MAX_MODERATION_LEASE_SECONDS.
+            now (datetime, optional): The current time (UTC); defaults to now.
+
+        Returns:
+            dict: The lease ID, its expiry time and the leased reviews, oldest first.
+
+        Raises:
+            ValueError: If the limit or the lease duration is out of range.
+        """
+        if not 1 <= limit <= MAX_CLAIM_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_CLAIM_SIZE}")
+        if not 1 <= lease_seconds <= MAX_MODERATION_LEASE_SECONDS:
+            raise ValueError(f"lease_seconds must be between 1 and {MAX_MODERATION_LEASE_SECONDS}")
+        now = now or datetime.utcnow()
+        lease_id = uuid.uuid4().hex
+        expires_at = now + timedelta(seconds=lease_seconds)
+        candidates = (
+            select(Review.id)
+            .where(Review.moderation_status == "Pending", Review.available_at <= now)
+            .order_by(Review.available_at, Review.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        try:
+            # The candidates are not filtered again by the UPDATE: the statement
+            # is atomic, and repeating the queue condition would let SQLite
+            # apply it through the queue index, checking every available review.
+            rows = db.execute(
+                update(Review)
+                .where(Review.id.in_(candidates))
+                .values(lease_id=lease_id, available_at=expires_at)
+                .returning(Review.id, Review.product_id, Review.customer_id, Review.rating, Review.comment)
+                .execution_options(synchronize_session=False)
+            ).all()
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            raise ValueError(f"Failed to claim reviews: {e}")
+        return {
+            "lease_id": lease_id,
+            "expires_at": expires_at,
+            "reviews": sorted((dict(row._mapping) for row in rows), key=lambda review: review["id"]),
+        }
+
+    @profile
+    def complete_reviews(self, db: Session, lease_id: str, decisions: list, now: datetime = None):
+        """
+        Approves or rejects leased reviews in bulk.
+
+        Each status is applied by one conditional UPDATE that only matches
+        reviews still pending and leased under `lease_id`, so a decision on a
+        review whose lease expired and was claimed again, or that was
+        moderated directly in the meantime, is refused rather than applied
+        twice. Approved reviews are added to the rating aggregates in the
+        same transaction.
+
+        Args:
+            db (Session): The database session.
+            lease_id (str): The lease returned by `claim_reviews`.
+            decisions (list[dict]): {"review_id", "status"} per review, with
+                status Approved or Rejected.
+            now (datetime, optional): The current time (UTC); defaults to now.
+
+        Returns:
+            dict: The IDs of the moderated reviews, and {"review_id", "error"}
+            per refused decision.
+
+        Raises:
+            ValueError: If a status is invalid, or the decisions cannot be saved.
+        """
+        now = now or datetime.utcnow()
+        by_status = {}
+        for decision in decisions:
+            if decision["status"] not in MODERATION_STATUSES:
+                raise ValueError("Invalid moderation status")
+            by_status.setdefault(decision["status"], set()).add(decision["review_id"])
+        completed = []
+        try:
+            for status, review_ids in by_status.items():
+                rows = db.execute(
+                    update(Review)
+                    .where(
+                        Review.id.in_(review_ids - set(completed)),
+                        Review.moderation_status == "Pending",
+                        Review.lease_id == lease_id,
+                        Review.available_at > now,
+                    )
+                    .values(moderation_status=status, lease_id=None)
+                    .returning(Review.id, Review.product_id, Review.rating)
+                    .execution_options(synchronize_session=False)
+                ).all()
+                if status == "Approved":
+                    self._update_rating_stats(db, [], [(row.product_id, row.rating) for row in rows])
+                completed.extend(row.id for row in rows)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            raise ValueError(f"Failed to complete reviews: {e}")
+        refused = {decision["review_id"] for decision in decisions} - set(completed)
+        return {
+            "completed": sorted(completed),
+            "failed": [{"review_id": review_id, "error": "Lease expired or not held"} for review_id in sorted(refused)],
+        }
+
+    def _change_review(self, db: Session, review_id: int, values: dict):
+        """
+        Updates a review, or deletes it when `values` is None, and moves its
+        rating between the product aggregates.
+
+        The old status and rating are read without a lock, so the write is a
+        conditional UPDATE (or DELETE) that only matches the review while they
+        are still the ones read, and the aggregates are adjusted by the
+        difference between the row read and the row returned. A write that
+        matches nothing lost a race with another one: the review is read again
+        and the write retried, so two concurrent approvals count the rating once.
+
+        Args:
+            db (Session): The database session.
+            review_id (int): The ID of the review.
+            values (dict | None): The columns to set, or None to delete the review.
+
+        Returns:
+            Review: The review as read before the write; refresh it to see the write.
+
+        Raises:
+            ValueError: If the review is not found, or keeps changing concurrently.
+        """
+        for _ in range(REVIEW_WRITE_ATTEMPTS):
+            review = db.query(Review).filter(Review.id == review_id).populate_existing().first()
+            if not review:
+                raise ValueError("Review not found")
+            unchanged = (
+                Review.id == review_id,
+                Review.product_id == review.product_id,
+                Review.rating == review.rating,
+                Review.moderation_status.is_not_distinct_from(review.moderation_status),
+            )
+            if values is None:
+                statement = delete(Review).where(*unchanged).returning(Review.id)
+            elif values:
+                statement = (
+                    update(Review)
+                    .where(*unchanged)
+                    .values(**values)
+                    .returning(Review.product_id, Review.rating, Review.moderation_status)
+                )
+            else:
+                return review
+            try:
+                row = db.execute(statement.execution_options(synchronize_session=False)).first()
+                if row is None:
+                    db.rollback()
+                    continue
+                self._update_rating_stats(
+                    db,
+                    self._approved_ratings([review]),
+                    self._approved_ratings([row]) if values is not None else [],
+                )
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                raise ValueError(f"Failed to save review: {e}")
+            return review
+        raise ValueError("Review is being changed concurrently; try again")
+
+    def _approved_ratings(self, reviews: list):
+        """
+        Returns the (product_id, rating) pairs of the approved reviews among `reviews`.
+        """
+        return [
+            (review.product_id, review.rating)
+            for review in reviews
+            if review.moderation_status == "Approved" and review.rating is not None
+        ]
+
+    def _update_rating_stats(self, db: Session, removed: list, added: list):
+        """
+        Applies rating changes to the product aggregates within the current transaction.
+
+        The changes are netted per product in memory, then each aggregate is
+        upserted with one INSERT ... ON CONFLICT DO UPDATE that adds the
+        deltas to the stored counters; products left without approved
+        reviews are deleted.
+
+        Args:
+            db (Session): The database session.
+            removed (list[tuple]): (product_id, rating) pairs no longer counted.
+            added (list[tuple]): (product_id, rating) pairs now counted.
+        """
+        deltas = {}
+        for sign, ratings in ((-1, removed), (1, added)):
+            for product_id, rating in ratings:
+                delta = deltas.setdefault(product_id, dict.fromkeys(RATING_STATS_COLUMNS, 0))
+                delta["rating_count"] += sign
+                delta["rating_sum"] += sign * rating
+                delta[f"stars_{star_of(rating)}"] += sign
+        deltas = {product_id: delta for product_id, delta in deltas.items() if any(delta.values())}
+        if not deltas:
+            return
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        statement = dialect.insert(ProductRatingStats)
+        statement = statement.on_conflict_do_update(
+            index_elements=["product_id"],
+            set_={
+                name: getattr(ProductRatingStats, name) + getattr(statement.excluded, name)
+                for name in RATING_STATS_COLUMNS
+            },
+        )
+        db.execute(statement, [dict(delta, product_id=product_id) for product_id, delta in deltas.items()])
+        if any(delta["rating_count"] < 0 for delta in deltas.values()):
+            db.query(ProductRatingStats).filter(
+                ProductRatingStats.product_id.in_(deltas),
+                ProductRatingStats.rating_count <= 0,
+            ).delete(synchronize_session=False)
+
+    @profile
+    def get_rating_summary(self, db: Session, product_id: int):
+        """
+        Retrieves the rating aggregates of a product.
+
+        Reads the single `product_rating_stats` row of the product instead of
+        its reviews. Only approved reviews are counted.
+
+        Args:
+            db (Session): The database session.
+            product_id (int): The ID of the product.
+
+        Returns:
+            dict: The number of approved reviews, their average rating (None
+                without reviews) and the number of reviews per star.
+        """
+        stats = db.get(ProductRatingStats, product_id)
+        count = stats.rating_count if stats else 0
+        return {
+            "product_id": product_id,
+            "count": count,
+            "average": round(stats.rating_sum / count, 2) if count else None,
+            "histogram": {star: getattr(stats, f"stars_{star}") if stats else 0 for star in STARS},
+        }
+
+    def rebuild_rating_stats(self, db: Session, product_id: int = None):
+        """
+        Recomputes the rating aggregates from the reviews table.
+
+        The aggregates are deleted and re-inserted by one INSERT ... SELECT
+        ... GROUP BY, in a single transaction.
+
+        Args:
+            db (Session): The database session.
+            product_id (int, optional): Only rebuild this product.
+
+        Returns:
+            int: The number of products with approved reviews.
+
+        Raises:
+            ValueError: If the rebuild fails.
+        """
+        source = select(
+            Review.product_id,
+            func.count(Review.id),
+            func.sum(Review.rating),
+            *(func.sum(case((star_filter(star), 1), else_=0)) for star in STARS),
+        ).where(Review.moderation_status == "Approved", Review.rating.isnot(None))
+        stale = db.query(ProductRatingStats)
+        if product_id is not None:
+            source = source.where(Review.product_id == product_id)
+            stale = stale.filter(ProductRatingStats.product_id == product_id)
+        try:
+            stale.delete(synchronize_session=False)
+            written = db.execute(
+                ProductRatingStats.__table__.insert().from_select(
+                    ["product_id"] + RATING_STATS_COLUMNS, source.group_by(Review.product_id)
+                )
+            ).rowcount
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            raise ValueError(f"Failed to rebuild rating stats: {e}")
+        return written
     
 if __name__ == "__main__":
     from database import SessionLocal
@@ -0,0 +1,328 @@
+from datetime import date, datetime, timezone
+from sqlalchemy.orm import Session
+from models.sales import SalesPartition
+import os
+import pathlib
+import sqlite3
+import stat
+
+"""
+Sales Archive Module
+====================
+
+This module reads and writes the files that closed months of sales are
+archived to, so the `sales` table only holds recent sales.
+
+Every archived month is one SQLite file holding a `sales` table with the
+columns of the `Sale` model, indexed by item and by customer. The file is
+written to a temporary name, compacted with VACUUM, made read-only and then
+renamed into place, so a file under its final name is always complete.
+Archives are opened read-only and immutable, which lets SQLite skip locking.
+
+Archive files are read by every process that serves sales, so the archive
+directory (SALES_ARCHIVE_DIR) must be an absolute path on storage they all
+mount at the same place, such as the `sales_archive` volume of
+docker-compose.yml; the catalogue stores the path each file was written to.
+
+Functions
+---------
+
+- `to_utc(moment: datetime) -> datetime`:
+    Converts a datetime to the naive UTC form sales timestamps are stored in.
+- `month_bounds(month: date) -> tuple[datetime, datetime]`:
+    The first instant of a month and of the next one.
+- `archive_path(directory: str, month: date) -> str`:
+    The path of the archive file of a month.
+- `overlapping_partitions(db: Session, start: datetime, end: datetime) -> list[SalesPartition]`:
+    The archived months that overlap a time range.
+- `write_archive(path: str, chunks) -> int`:
+    Writes sales to a compacted, read-only archive file.
+- `read_archive(path: str, column: str, value: int, start: datetime, end: datetime, before: tuple, limit: int) -> list[dict]`:
+    Reads the sales of an item or customer from an archive file.
+- `iter_archive_chunks(path: str, start: datetime, end: datetime, chunk_size: int)`:
+    Yields the sales of an archive file as column lists, one chunk at a time.
+- `aggregate_archive(path: str, group_by: str, start: datetime, end: datetime) -> list[tuple]`:
+    Sums the sales of an archive file per group and customer.
+"""
+
+
+COLUMNS = ("id", "customer_id", "item_id", "amount", "quantity", "created_at")
+SCHEMA = (
+    "CREATE TABLE sales ("
+    "id INTEGER PRIMARY KEY, customer_id INTEGER NOT NULL, item_id INTEGER NOT NULL, "
+    "amount REAL NOT NULL, quantity INTEGER NOT NULL, created_at TEXT)"
+)
+INDEXES = (
+    "CREATE INDEX ix_sales_item_id_created_at ON sales (item_id, created_at)",
+    "CREATE INDEX ix_sales_customer_id_created_at ON sales (customer_id, created_at)",
+)
+LOOKUP_COLUMNS = ("item_id", "customer_id")
+# The group keys of `aggregate_archive`, labelled like `period_expression` in sales_service.
+GROUP_KEYS = {
+    "item": "item_id",
+    "customer": "customer_id",
+    "day": "strftime('%Y-%m-%d', created_at)",
+    "week": "date(created_at, 'weekday 0', '-6 days')",
+    "month": "strftime('%Y-%m', created_at)",
+}
+
+
+def to_utc(moment: datetime):
+    """
+    Converts a datetime to the naive UTC form sales timestamps are stored in.
+
+    Args:
+        moment (datetime or None): A naive (assumed UTC) or aware datetime.
+
+    Returns:
+        datetime or None: The naive UTC datetime.
+    """
+    if moment is not None and moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def month_bounds(month: date):
+    """
+    Returns the first instant of a month and of the next one.
+
+    Args:
+        month (date): Any day of the month.
+
+    Returns:
+        tuple[datetime, datetime]: The start (inclusive) and end (exclusive) of the month.
+    """
+    start = datetime(month.year, month.month, 1)
+    end = datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+    return start, end
+
+
+def archive_path(directory: str, month: date) -> str:
+    """
+    Returns the path of the archive file of a month.
+
+    Args:
+        directory (str): The archive directory.
+        month (date): Any day of the month.
+
+    Returns:
+        str: The path, e.g. /var/lib/sales-archive/sales_2024_01.db.
+
+    Raises:
+        ValueError: If the directory is not an absolute path.
+    """
+    if not directory or not os.path.isabs(directory):
+        raise ValueError("The sales archive directory must be an absolute path shared by every sales process")
+    return os.path.join(directory, f"sales_{month.year:04d}_{month.month:02d}.db")
+
+
+def overlapping_partitions(db: Session, start: datetime = None, end: datetime = None):
+    """
+    Returns the archived months that overlap a time range, oldest first.
+
+    Args:
+        db (Session): The database session.
+        start (datetime, optional): The start of the range (UTC, inclusive).
+        end (datetime, optional): The end of the range (UTC, exclusive).
+
+    Returns:
+        list[SalesPartition]: The catalogue entries of the months.
+    """
+    query = db.query(SalesPartition)
+    if start is not None:
+        query = query.filter(SalesPartition.ends_at > start)
+    if end is not None:
+        query = query.filter(SalesPartition.starts_at < end)
+    return query.order_by(SalesPartition.starts_at).all()
+
+
+def _timestamp(moment: datetime):
+    """
+    Formats a datetime the way SQLAlchemy stores it in SQLite, so archives sort and compare alike.
+    """
+    return moment.strftime("%Y-%m-%d %H:%M:%S.%f") if moment is not None else None
+
+
+def write_archive(path: str, chunks) -> int:
+    """
+    Writes sales to a compacted, read-only archive file.
+
+    Args:
+        path (str): The path of the archive file; an existing file is replaced.
+        chunks (iterable[dict[str, list]]): Sales as column lists, e.g. from
+            `services.sales_export.iter_sales_chunks`.
+
+    Returns:
+        int: The number of sales written.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary = f"{path}.tmp"
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    rows = 0
+    connection = sqlite3.connect(temporary)
+    try:
+        connection.execute("PRAGMA journal_mode=OFF")
+        connection.execute("PRAGMA synchronous=OFF")
+        connection.execute(SCHEMA)
+        for chunk in chunks:
+            chunk = dict(chunk, created_at=[_timestamp(moment) for moment in chunk["created_at"]])
+            connection.executemany(
+                f"INSERT INTO sales ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                zip(*(chunk[name] for name in COLUMNS)),
+            )
+            rows += len(chunk["id"])
+        for index in INDEXES:
+            connection.execute(index)
+        connection.commit()
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+    os.chmod(temporary, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+    os.replace(temporary, path)
+    return rows
+
+
+def _connect(path: str):
+    """
+    Opens an archive file read-only and immutable.
+    """
+    return sqlite3.connect(f"{pathlib.Path(path).absolute().as_uri()}?mode=ro&immutable=1", uri=True)
+
+
+def _sale(row: tuple):
+    """
+    Converts an archived row to a dict with a datetime timestamp.
+    """
+    return dict(zip(COLUMNS, row[:-1] + (datetime.fromisoformat(row[-1]) if row[-1] else None,)))
+
+
+def _time_range(start: datetime = None, end: datetime = None):
+    """
+    Returns the SQL conditions and parameters of a time range.
+    """
+    conditions, parameters = [], []
+    if start is not None:
+        conditions.append("created_at >= ?")
+        parameters.append(_timestamp(start))
+    if end is not None:
+        conditions.append("created_at < ?")
+        parameters.append(_timestamp(end))
+    return conditions, parameters
+
+
+def read_archive(
+    path: str,
+    column: str,
+    value: int,
+    start: datetime = None,
+    end: datetime = None,
+    before: tuple = None,
+    limit: int = None,
+):
+    """
+    Reads the sales of an item or customer from an archive file.
+
+    Args:
+        path (str): The path of the archive file.
+        column (str): item_id or customer_id.
+        value (int): The ID of the item or customer.
+        start (datetime, optional): Only sales at or after this time (UTC).
+        end (datetime, optional): Only sales before this time (UTC).
+        before (tuple[datetime, int], optional): Only sales before this
+            (created_at, id) key, newest first, as for a history page.
+        limit (int, optional): The maximum number of sales.
+
+    Returns:
+        list[dict]: The sales in (created_at, id) order, descending when
+        `before` is given, with datetime timestamps.
+
+    Raises:
+        ValueError: If the column is not indexed in archives.
+    """
+    if column not in LOOKUP_COLUMNS:
+        raise ValueError(f"column must be one of: {', '.join(LOOKUP_COLUMNS)}")
+    conditions, parameters = _time_range(start, end)
+    conditions.insert(0, f"{column} = ?")
+    parameters.insert(0, value)
+    order = "created_at, id"
+    if before is not None:
+        conditions.append("(created_at, id) < (?, ?)")
+        parameters += [_timestamp(before[0]), before[1]]
+        order = "created_at DESC, id DESC"
+    query = f"SELECT {', '.join(COLUMNS)} FROM sales WHERE {' AND '.join(conditions)} ORDER BY {order}"
+    if limit is not None:
+        query += " LIMIT ?"
+        parameters.append(limit)
+    connection = _connect(path)
+    try:
+        rows = connection.execute(query, parameters).fetchall()
+    finally:
+        connection.close()
+    return [_sale(row) for row in rows]
+
+
+def iter_archive_chunks(path: str, start: datetime = None, end: datetime = None, chunk_size: int = 100_000):
+    """
+    Yields the sales of an archive file in primary key order, one chunk of columns at a time.
+
+    Args:
+        path (str): The path of the archive file.
+        start (datetime, optional): Only sales at or after this time (UTC).
+        end (datetime, optional): Only sales before this time (UTC).
+        chunk_size (int): The maximum number of rows per chunk.
+
+    Yields:
+        dict[str, list]: One list per column of COLUMNS, with datetime timestamps.
+    """
+    conditions, parameters = _time_range(start, end)
+    query = f"SELECT {', '.join(COLUMNS)} FROM sales WHERE {' AND '.join(conditions + ['id > ?'])} ORDER BY id LIMIT ?"
+    connection = _connect(path)
+    try:
+        last_id = 0
+        while True:
+            rows = connection.execute(query, parameters + [last_id, chunk_size]).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            sales = [_sale(row) for row in rows]
+            yield {name: [sale[name] for sale in sales] for name in COLUMNS}
+            if len(rows) < chunk_size:
+                return
+    finally:
+        connection.close()
+
+
+def aggregate_archive(path: str, group_by: str, start: datetime = None, end: datetime = None):
+    """
+    Sums the sales of an archive file per group and customer.
+
+    The sums are kept per customer so that the distinct buyers of a group
+    can be counted across archives and the `sales` table.
+
+    Args:
+        path (str): The path of the archive file.
+        group_by (str): item, customer, day, week or month.
+        start (datetime, optional): Only sales at or after this time (UTC).
+        end (datetime, optional): Only sales before this time (UTC).
+
+    Returns:
+        list[tuple]: (key, customer_id, revenue, units, sales) per group and customer.
+
+    Raises:
+        ValueError: If the grouping is invalid.
+    """
+    if group_by not in GROUP_KEYS:
+        raise ValueError(f"group_by must be one of: {', '.join(GROUP_KEYS)}")
+    conditions, parameters = _time_range(start, end)
+    if group_by not in ("item", "customer"):
+        conditions.append("created_at IS NOT NULL")
+    query = (
+        f"SELECT {GROUP_KEYS[group_by]} AS key, customer_id, SUM(amount), SUM(quantity), COUNT(*) FROM sales"
+        f"{' WHERE ' + ' AND '.join(conditions) if conditions else ''} GROUP BY key, customer_id"
+    )
+    connection = _connect(path)
+    try:
+        return connection.execute(query, parameters).fetchall()
+    finally:
+        connection.close()
@@ -0,0 +1,254 @@
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from models.sales import Sale
+from services.sales_archive import iter_archive_chunks, overlapping_partitions, to_utc
+from decouple import config
+import os
+import tempfile
+import zipfile
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+"""
+Sales Export Module
+===================
+
+This module exports the sales, archived months included, to a columnar file
+for offline analytics, instead of paging through the per-customer sales API.
+
+Features
+--------
+
+- **Chunked Reads**:
+  - Sales are read in primary key order, one keyset page of EXPORT_CHUNK_SIZE
+    rows at a time, optionally restricted to a time range, so memory stays
+    bounded whatever the size of the table.
+  - Archived months that overlap the time range are read first, oldest first,
+    from their archive files, also in keyset chunks, then the `sales` table.
+
+- **Formats**:
+  - `arrow`: an Arrow IPC file with one record batch per chunk. Requires pyarrow.
+  - `npz`: a NumPy archive with one array per column. Each column is spilled
+    to a temporary file while the chunks are read, then copied into the
+    archive, so the arrays are never held in memory. Requires numpy.
+  - `auto`: Arrow if pyarrow is installed, otherwise NumPy.
+
+- **Columns**:
+  - id, customer_id, item_id (int64), amount (float64), quantity (int64) and
+    created_at (timestamp in microseconds, UTC; null when unknown).
+
+Functions
+---------
+
+- `available_formats() -> list[str]`: The formats the installed libraries support.
+- `resolve_format(export_format: str) -> str`: Picks the concrete format of a request.
+- `iter_sales_chunks(db: Session, start: datetime, end: datetime, chunk_size: int)`:
+    Yields the sales of the `sales` table as column lists, one chunk at a time.
+- `iter_export_chunks(db: Session, start: datetime, end: datetime, chunk_size: int)`:
+    Yields the archived sales, then those of the `sales` table, one chunk at a time.
+- `export_sales(db: Session, fileobj, export_format: str, start: datetime, end: datetime, chunk_size: int) -> int`:
+    Writes the sales to a file object and returns the number of rows.
+"""
+
+
+EXPORT_CHUNK_SIZE = config("EXPORT_CHUNK_SIZE", default=100_000, cast=int)
+EXPORT_FORMATS = ("arrow", "npz")
+EXPORT_MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.file",
+    "npz": "application/octet-stream",
+}
+COLUMNS = ("id", "customer_id", "item_id", "amount", "quantity", "created_at")
+NUMPY_DTYPES = {
+    "id": "<i8",
+    "customer_id": "<i8",
+    "item_id": "<i8",
+    "amount": "<f8",
+    "quantity": "<i8",
+    "created_at": "<M8[us]",
+}
+
+
+def available_formats():
+    """
+    Returns the export formats supported by the installed libraries.
+
+    Returns:
+        list[str]: A subset of EXPORT_FORMATS.
+    """
+    return [name for name, module in zip(EXPORT_FORMATS, (pa, np)) if module is not None]
+
+
+def resolve_format(export_format: str = "auto"):
+    """
+    Picks the concrete format of an export request.
+
+    Args:
+        export_format (str): auto, arrow or npz.
+
+    Returns:
+        str: arrow or npz.
+
+    Raises:
+        ValueError: If the format is unknown.
+        RuntimeError: If the library the format needs is not installed.
+    """
+    if export_format not in ("auto",) + EXPORT_FORMATS:
+        raise ValueError(f"format must be one of: auto, {', '.join(EXPORT_FORMATS)}")
+    available = available_formats()
+    if export_format == "auto":
+        if not available:
+            raise RuntimeError("Sales export requires pyarrow or numpy")
+        return available[0]
+    if export_format not in available:
+        raise RuntimeError(f"The {export_format} export format requires {'pyarrow' if export_format == 'arrow' else 'numpy'}")
+    return export_format
+
+
+def iter_sales_chunks(db: Session, start: datetime = None, end: datetime = None, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Yields the sales in primary key order, one chunk of columns at a time.
+
+    Each chunk is read with its own keyset query (`id > last id`), so the
+    database never materializes more than one chunk.
+
+    Args:
+        db (Session): The database session.
+        start (datetime, optional): Only sales at or after this time (UTC).
+        end (datetime, optional): Only sales before this time (UTC).
+        chunk_size (int): The maximum number of rows per chunk.
+
+    Yields:
+        dict[str, list]: One list per column of COLUMNS.
+    """
+    query = select(Sale.id, Sale.customer_id, Sale.item_id, Sale.amount, Sale.quantity, Sale.created_at)
+    if start is not None:
+        query = query.where(Sale.created_at >= start)
+    if end is not None:
+        query = query.where(Sale.created_at < end)
+    last_id = 0
+    while True:
+        rows = db.execute(query.where(Sale.id > last_id).order_by(Sale.id).limit(chunk_size)).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield dict(zip(COLUMNS, (list(column) for column in zip(*rows))))
+        if len(rows) < chunk_size:
+            return
+
+
+def iter_export_chunks(db: Session, start: datetime = None, end: datetime = None, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Yields the sales of a time range, archived months included, one chunk of columns at a time.
+
+    Args:
+        db (Session): The database session.
+        start (datetime, optional): Only sales at or after this time (UTC).
+        end (datetime, optional): Only sales before this time (UTC).
+        chunk_size (int): The maximum number of rows per chunk.
+
+    Yields:
+        dict[str, list]: One list per column of COLUMNS.
+
+    Raises:
+        sqlite3.Error: If an archive file cannot be read.
+    """
+    for partition in overlapping_partitions(db, start, end):
+        yield from iter_archive_chunks(partition.path, start, end, chunk_size)
+    yield from iter_sales_chunks(db, start, end, chunk_size)
+
+
+def _write_arrow(chunks, fileobj):
+    """
+    Writes the chunks to an Arrow IPC file, one record batch per chunk.
+    """
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("customer_id", pa.int64()),
+        ("item_id", pa.int64()),
+        ("amount", pa.float64()),
+        ("quantity", pa.int64()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+    ])
+    rows = 0
+    with pa.ipc.new_file(fileobj, schema) as writer:
+        for chunk in chunks:
+            writer.write_batch(pa.record_batch([chunk[name] for name in COLUMNS], schema=schema))
+            rows += len(chunk["id"])
+    return rows
+
+
+def _write_npz(chunks, fileobj):
+    """
+    Writes the chunks to a NumPy archive with one array per column.
+
+    The `.npy` header holds the array length, which is only known once every
+    chunk has been read, so the columns are spilled to temporary files first.
+    """
+    rows = 0
+    with tempfile.TemporaryDirectory() as directory:
+        spills = {name: open(os.path.join(directory, name), "wb") for name in COLUMNS}
+        try:
+            for chunk in chunks:
+                for name in COLUMNS:
+                    np.asarray(chunk[name], dtype=NUMPY_DTYPES[name]).tofile(spills[name])
+                rows += len(chunk["id"])
+        finally:
+            for spill in spills.values():
+                spill.close()
+
+        with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for name in COLUMNS:
+                with archive.open(f"{name}.npy", "w", force_zip64=True) as member:
+                    header = {"descr": NUMPY_DTYPES[name], "fortran_order": False, "shape": (rows,)}
+                    np.lib.format.write_array_header_1_0(member, header)
+                    with open(os.path.join(directory, name), "rb") as spill:
+                        while block := spill.read(1 << 20):
+                            member.write(block)
+    return rows
+
+
+def export_sales(
+    db: Session,
+    fileobj,
+    export_format: str = "auto",
+    start: datetime = None,
+    end: datetime = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+):
+    """
+    Exports the sales, archived months included, to a columnar file.
+
+    Args:
+        db (Session): The database session.
+        fileobj: A writable binary file object.
+        export_format (str): auto, arrow or npz.
+        start (datetime, optional): Only sales at or after this time (UTC).
+        end (datetime, optional): Only sales before this time (UTC).
+        chunk_size (int): The number of rows read per query.
+
+    Returns:
+        int: The number of sales exported.
+
+    Raises:
+        ValueError: If the format or the time range is invalid.
+        RuntimeError: If the library the format needs is not installed.
+        sqlite3.Error: If an archive file cannot be read.
+    """
+    export_format = resolve_format(export_format)
+    start, end = to_utc(start), to_utc(end)
+    if start and end and start >= end:
+        raise ValueError("start must be before end")
+    chunks = iter_export_chunks(db, start, end, max(1, chunk_size))
+    if export_format == "arrow":
+        return _write_arrow(chunks, fileobj)
+    return _write_npz(chunks, fileobj)
@@ -1,8 +1,34 @@
+from datetime import date, datetime, timedelta
+from pydantic import ValidationError
+from sqlalchemy import Date, and_, cast, distinct, func, insert, not_, or_, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from models.sales import Sale
+from models.sales import Sale, SalesItemDaily, SalesCustomerDaily, SalesPartition
+from schemas.sales_schema import SaleCreate
+from models.customer import Customer
+from models.inventory import Item
 from sqlalchemy.exc import SQLAlchemyError
 from memory_profiler import profile
+from requests.adapters import HTTPAdapter
+from decouple import config
+from services.customer_service import CustomerService, username_cache
+from services.inventory_service import InventoryService, decode_cursor, encode_cursor
+from services.leaderboard import SalesLeaderboard
+from services.sales_archive import (
+    aggregate_archive,
+    archive_path,
+    month_bounds,
+    overlapping_partitions,
+    read_archive,
+    to_utc,
+    write_archive,
+)
+from services.sales_export import iter_sales_chunks
+import logging
+import sqlite3
+import threading
 import time
+import uuid
 import pybreaker
 import requests
 
@@ -20,7 +46,43 @@ Features
 - **Sales Management**:
   - Create new sales records.
   - Retrieve sales by customer or item.
+  - Page through a customer's purchase history, newest first, with the name,
+    category and price of every item fetched in the same query (or in one
+    batched call to the inventory service when PURCHASE_MODE is remote).
   - Update and delete sales records.
+  - Record batches of sales, validated row by row and inserted with one
+    executemany and one commit per chunk.
+
+- **Purchases**:
+  - Price an item from its catalog entry, take the stock, debit the wallet and
+    record the sale in one call. With PURCHASE_MODE=local (all services share
+    one database) this is a single local transaction; with remote the
+    inventory and customer services are called over pooled HTTP connections
+    and completed steps are compensated if a later one fails.
+
+- **Analytics**:
+  - Revenue, units, sales and distinct buyers per item, customer, day, week
+    or month over a time range, aggregated by the database with GROUP BY.
+  - Best-selling items over the last 24 hours, 7 days or 30 days, served
+    from in-memory counters that every sale written through this service
+    updates after it commits, and that are rebuilt from the sales table at
+    startup. Each process keeps its own counters.
+  - Per-item and per-customer daily rollups, updated in the same transaction
+    as every sale written through this service, so dashboards read one row
+    per day instead of one row per sale. They can be rebuilt from the sales
+    table for backfills.
+
+- **Archival**:
+  - Closed months of sales are moved out of the `sales` table into one
+    compacted, read-only SQLite file per month, catalogued in
+    `sales_partitions`. Sales lookups by item or customer still return
+    archived sales, reading only the archives whose month overlaps the
+    requested time range, and purchase histories and exports read them
+    alongside the `sales` table. Daily rollups of archived months are kept as
+    they are. Statistics over a range overlapping an archived month merge
+    per-customer sums of the `sales` table and the archives.
+  - Archive files must live in an absolute SALES_ARCHIVE_DIR mounted at the
+    same path by every process serving sales (see docker-compose.yml).
 
 - **Integration**:
   - External API calls with fault tolerance using `pybreaker`.
@@ -48,10 +110,30 @@ Classes
             Makes an external API call for sales operations.
         - `create_sale(db: Session, data: dict) -> Sale`:
             Creates a new sale record in the database.
-        - `get_sales_by_customer(db: Session, customer_id: int) -> list[Sale]`:
-            Retrieves all sales for a specific customer.
-        - `get_sales_by_item(db: Session, item_id: int) -> list[Sale]`:
-            Retrieves all sales for a specific item.
+        - `create_sales_batch(db: Session, rows: list) -> list[dict]`:
+            Validates and records a chunk of sales.
+        - `purchase(db: Session, username: str, item_id: int, quantity: int) -> Sale`:
+            Sells units of an item to a customer at the catalog price.
+        - `get_sales_stats(db: Session, group_by: str, start: datetime, end: datetime, limit: int) -> list[dict]`:
+            Aggregates sales per item, customer or period.
+        - `get_top_items(window: str, limit: int, by: str) -> list[dict]`:
+            Returns the best-selling items of a time window.
+        - `get_rollup_totals(db: Session, by: str, start: date, end: date, key: int, limit: int) -> list[dict]`:
+            Reads item or customer totals from the daily rollups.
+        - `rebuild_rollups(db: Session, start: date, end: date) -> int`:
+            Recomputes the daily rollups from the sales table.
+        - `get_sales_by_customer(db: Session, customer_id: int, start: datetime, end: datetime) -> list[Sale]`:
+            Retrieves the sales of a specific customer, archived ones included.
+        - `get_customer_history(db: Session, customer_id: int, limit: int, cursor: str) -> tuple[list[dict], str]`:
+            Retrieves a page of a customer's sales with their item details.
+        - `get_sales_by_item(db: Session, item_id: int, start: datetime, end: datetime) -> list[Sale]`:
+            Retrieves the sales of a specific item, archived ones included.
+        - `archive_month(db: Session, month: date, archive_dir: str) -> SalesPartition`:
+            Moves a closed month of sales to an archive file.
+        - `archive_sales(db: Session, keep_months: int, archive_dir: str) -> list[SalesPartition]`:
+            Archives every closed month older than the retention period.
+        - `get_partitions(db: Session) -> list[SalesPartition]`:
+            Lists the archived months.
         - `delete_sale(db: Session, sale_id: int) -> dict`:
             Deletes a specific sale record by its ID.
         - `update_sale(db: Session, sale_id: int, updates: dict) -> Sale`:
@@ -61,6 +143,141 @@ Classes
 
 
 circuit_breaker = pybreaker.CircuitBreaker(fail_max=5, reset_timeout=30)
+
+# "local" when the sales database is the one the inventory and customer
+# services write to, as in docker-compose.yml: purchases run in one
+# transaction and purchase histories join the items table. "remote" when each
+# service has its own database: purchases and histories call the other
+# services. The sales app creates empty items and customers tables
+# either way, so their presence says nothing about where the data lives.
+PURCHASE_MODE = config("PURCHASE_MODE", default="local")
+if PURCHASE_MODE not in ("local", "remote"):
+    raise ValueError("PURCHASE_MODE must be local or remote")
+CUSTOMER_API_URL = config("CUSTOMER_API_URL", default="http://127.0.0.1:8000/api")
+INVENTORY_API_URL = config("INVENTORY_API_URL", default="http://127.0.0.1:8001/api")
+SERVICE_TOKEN = config("SERVICE_TOKEN", default="") or config("ADMIN_TOKEN")
+SERVICE_POOL_SIZE = config("SERVICE_POOL_SIZE", default=20, cast=int)
+SERVICE_TIMEOUT = config("SERVICE_TIMEOUT", default=5, cast=float)
+
+SALES_BATCH_CHUNK_SIZE = config("SALES_BATCH_CHUNK_SIZE", default=1000, cast=int)
+STATS_GROUPS = ("item", "customer", "day", "week", "month")
+DEFAULT_TOP_ITEMS = 10
+# Absolute path of the archive files, shared by every sales process; archival
+# is refused while it is unset.
+SALES_ARCHIVE_DIR = config("SALES_ARCHIVE_DIR", default="")
+SALES_ARCHIVE_KEEP_MONTHS = config("SALES_ARCHIVE_KEEP_MONTHS", default=12, cast=int)
+# Months that ended less than this many days ago stay in the sales table, so
+# late sales and the leaderboard window can still be read from it.
+SALES_ARCHIVE_GRACE_DAYS = config("SALES_ARCHIVE_GRACE_DAYS", default=31, cast=int)
+DEFAULT_HISTORY_PAGE_SIZE = 20
+MAX_HISTORY_PAGE_SIZE = 100
+HISTORY_ITEM_FIELDS = ("name", "category", "price")
+MAX_TOP_ITEMS = 100
+# Best-selling items per time window; see load_sales_leaderboard().
+sales_leaderboard = SalesLeaderboard()
+# Daily rollup model and key column of each rollup dimension.
+ROLLUPS = {
+    "item": (SalesItemDaily, "item_id"),
+    "customer": (SalesCustomerDaily, "customer_id"),
+}
+DEFAULT_STATS_LIMIT = 100
+MAX_STATS_LIMIT = 1000
+
+
+def day_expression(dialect_name: str):
+    """
+    Builds the SQL expression of the UTC day a sale was recorded on.
+
+    Args:
+        dialect_name (str): The name of the database dialect.
+
+    Returns:
+        ColumnElement: The day, compatible with a Date column.
+    """
+    if dialect_name == "postgresql":
+        return cast(Sale.created_at, Date)
+    return func.date(Sale.created_at)
+
+
+def period_expression(dialect_name: str, period: str):
+    """
+    Builds the SQL expression of the day, week or month a sale belongs to.
+
+    Days are labelled YYYY-MM-DD, weeks by the date of their Monday and
+    months YYYY-MM, on both SQLite and Postgres.
+
+    Args:
+        dialect_name (str): The name of the database dialect.
+        period (str): day, week or month.
+
+    Returns:
+        ColumnElement: The label expression.
+    """
+    if dialect_name == "postgresql":
+        return func.to_char(func.date_trunc(period, Sale.created_at), "YYYY-MM" if period == "month" else "YYYY-MM-DD")
+    if period == "week":
+        return func.date(Sale.created_at, "weekday 0", "-6 days")
+    return func.strftime("%Y-%m" if period == "month" else "%Y-%m-%d", Sale.created_at)
+
+
+def hour_expression(dialect_name: str):
+    """
+    Builds the SQL expression of the UTC hour a sale was recorded in.
+
+    Args:
+        dialect_name (str): The name of the database dialect.
+
+    Returns:
+        ColumnElement: The start of the hour, as a datetime or an ISO string.
+    """
+    if dialect_name == "postgresql":
+        return func.date_trunc("hour", Sale.created_at)
+    return func.strftime("%Y-%m-%d %H:00:00", Sale.created_at)
+
+
+def leaderboard_entries(sales: list):
+    """
+    Returns the leaderboard entries of sales, read before the session expires them on commit.
+
+    Args:
+        sales (list[Sale]): The sales.
+
+    Returns:
+        list[tuple]: (item_id, created_at, quantity, amount) per sale.
+    """
+    return [(sale.item_id, sale.created_at, sale.quantity, sale.amount) for sale in sales]
+
+
+def load_sales_leaderboard(bind, now: datetime = None):
+    """
+    Rebuilds the best-sellers leaderboard from the sales table.
+
+    The sales of the longest leaderboard window are aggregated per item and
+    hour by the database, so only one row per item and hour is loaded.
+
+    Args:
+        bind (Engine): The engine of the sales database.
+        now (datetime, optional): The current time (UTC); defaults to now.
+
+    Returns:
+        int: The number of item and hour rows loaded.
+    """
+    now = now or datetime.utcnow()
+    hour = hour_expression(bind.dialect.name)
+    query = (
+        select(Sale.item_id, hour, func.sum(Sale.quantity), func.sum(Sale.amount), func.count(Sale.id))
+        .where(Sale.created_at >= now - timedelta(hours=sales_leaderboard.horizon))
+        .group_by(Sale.item_id, hour)
+    )
+    with bind.connect() as connection:
+        rows = [
+            (item_id, moment if isinstance(moment, datetime) else datetime.fromisoformat(moment), units, revenue, count)
+            for item_id, moment, units, revenue, count in connection.execute(query)
+        ]
+    sales_leaderboard.load(rows, now)
+    return len(rows)
+
+
 try:
     from line_profiler import profile
 except ImportError:
@@ -69,6 +286,15 @@ except ImportError:
 
 
 
+class ServiceError(ValueError):
+    """
+    A 4xx response from another service, with its status code.
+    """
+    def __init__(self, detail: str, status_code: int):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
 class SalesService:
     """
     A service class for managing sales, including operations to create, retrieve, update, and delete sales.
@@ -76,10 +302,20 @@ class SalesService:
     Methods:
         call_sales_api(endpoint: str, data: dict): Calls an external sales API.
         create_sale(db: Session, data: dict): Creates a new sale record in the database.
-        get_sales_by_customer(db: Session, customer_id: int): Retrieves all sales associated with a specific customer.
-        get_sales_by_item(db: Session, item_id: int): Retrieves all sales associated with a specific item.
+        create_sales_batch(db: Session, rows: list): Validates and records a chunk of sales.
+        get_sales_by_customer(db: Session, customer_id: int, start: datetime, end: datetime): Retrieves the sales of a customer.
+        get_customer_history(db: Session, customer_id: int, limit: int, cursor: str): Retrieves a page of a customer's purchase history.
+        get_sales_by_item(db: Session, item_id: int, start: datetime, end: datetime): Retrieves the sales of an item.
+        archive_month(db: Session, month: date, archive_dir: str): Moves a closed month of sales to an archive file.
+        archive_sales(db: Session, keep_months: int, archive_dir: str): Archives every month older than the retention period.
+        get_partitions(db: Session): Lists the archived months.
         delete_sale(db: Session, sale_id: int): Deletes a sale record by its ID.
         update_sale(db: Session, sale_id: int, updates: dict): Updates an existing sale record with new data.
+        purchase(db: Session, username: str, item_id: int, quantity: int): Sells units of an item to a customer.
+        get_sales_stats(db: Session, group_by: str, start: datetime, end: datetime, limit: int): Aggregates sales.
+        get_top_items(window: str, limit: int, by: str): Returns the best-selling items of a time window.
+        get_rollup_totals(db: Session, by: str, start: date, end: date, key: int, limit: int): Reads the daily rollups.
+        rebuild_rollups(db: Session, start: date, end: date): Recomputes the daily rollups from the sales table.
     """
     @circuit_breaker
     def call_sales_api(self, endpoint: str, data: dict):
@@ -103,7 +339,11 @@ class SalesService:
         except requests.RequestException as e:
             raise Exception(f"Failed to call sales API: {e}")
     def __init__(self):
-        pass
+        self.inventory_service = InventoryService()
+        self.customer_service = CustomerService()
+        self.archive_dir = SALES_ARCHIVE_DIR
+        self._http = None
+        self._http_lock = threading.Lock()
 
     @profile
     def create_sale(self, db: Session, data: dict):
@@ -123,21 +363,83 @@ class SalesService:
         try:
             sale = Sale(**data)
             db.add(sale)
+            db.flush()
+            self._update_rollups(db, [sale], 1)
+            entries = leaderboard_entries([sale])
             db.commit()
+            sales_leaderboard.record(entries)
             db.refresh(sale)
             return sale
         except SQLAlchemyError as e:
             db.rollback()
             raise ValueError(f"Failed to create sale: {e}")
 
+    def create_sales_batch(self, db: Session, rows: list):
+        """
+        Validates and records a chunk of sales in one transaction.
+
+        Every row is validated against `SaleCreate` first; the valid ones are
+        inserted with a single executemany, added to the daily rollups, and
+        committed together. Invalid rows are reported and do not prevent the
+        others from being recorded.
+
+        Args:
+            db (Session): The database session.
+            rows (list[tuple[int, dict or str]]): Row numbers and sales, either
+                parsed JSON objects or raw JSON lines.
+
+        Returns:
+            list[dict]: One result per row, in row order: {"row", "id"} for a
+            recorded sale, {"row", "error"} for a rejected one.
+
+        Raises:
+            ValueError: If the chunk cannot be written.
+        """
+        results = []
+        valid = []
+        now = datetime.utcnow()
+        for row, raw in rows:
+            try:
+                if isinstance(raw, (str, bytes)):
+                    record = SaleCreate.model_validate_json(raw)
+                else:
+                    record = SaleCreate.model_validate(raw)
+            except ValidationError as e:
+                error = e.errors()[0]
+                location = ".".join(str(part) for part in error["loc"])
+                results.append({"row": row, "error": f"{location}: {error['msg']}" if location else error["msg"]})
+                continue
+            values = record.model_dump()
+            values["created_at"] = to_utc(values["created_at"]) or now
+            valid.append((row, values))
+
+        if valid:
+            try:
+                records = [values for _, values in valid]
+                ids = db.execute(
+                    insert(Sale).returning(Sale.id, sort_by_parameter_order=True), records,
+                ).scalars().all()
+                sales = [Sale(**values) for values in records]
+                self._update_rollups(db, sales, 1)
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                raise ValueError(f"Failed to create sales: {e}")
+            sales_leaderboard.record(leaderboard_entries(sales))
+            results.extend({"row": row, "id": sale_id} for (row, _), sale_id in zip(valid, ids))
+        results.sort(key=lambda result: result["row"])
+        return results
+
     @profile
-    def get_sales_by_customer(self, db: Session, customer_id: int):
+    def get_sales_by_customer(self, db: Session, customer_id: int, start: datetime = None, end: datetime = None):
         """
-        Retrieves all sales associated with a specific customer.
+        Retrieves the sales associated with a specific customer, archived ones first.
 
         Args:
             db (Session): The database session.
             customer_id (int): The ID of the customer.
+            start (datetime, optional): Only sales at or after this time (UTC).
+            end (datetime, optional): Only sales before this time (UTC).
 
         Returns:
             list[Sale]: A list of sales associated with the customer.
@@ -146,18 +448,173 @@ class SalesService:
             ValueError: If the query fails.
         """
         try:
-            return db.query(Sale).filter(Sale.customer_id == customer_id).all()
+            return (
+                self._archived_sales(db, "customer_id", customer_id, start, end)
+                + self._recent_sales(db, Sale.customer_id == customer_id, start, end)
+            )
         except SQLAlchemyError as e:
             raise ValueError(f"Failed to retrieve sales for customer {customer_id}: {e}")
 
     @profile
-    def get_sales_by_item(self, db: Session, item_id: int):
+    def get_customer_history(
+        self,
+        db: Session,
+        customer_id: int,
+        limit: int = DEFAULT_HISTORY_PAGE_SIZE,
+        cursor: str = None,
+    ):
+        """
+        Retrieves a page of a customer's purchase history, newest first.
+
+        Sales are ordered by (created_at, id) descending, sales without a
+        timestamp last, and paginated by keyset: the cursor holds the
+        timestamp and ID of the last sale returned, so every page is a range
+        scan of the (customer_id, created_at, id) index, however deep. Sales
+        with and without a timestamp are read by separate range scans.
+        Archived months are merged in newest first, and only read until the
+        page is full of newer sales. Item details come from a join with the
+        items table when PURCHASE_MODE is local, otherwise from one
+        batched call to the inventory service.
+
+        Args:
+            db (Session): The database session.
+            customer_id (int): The ID of the customer.
+            limit (int): The page size, capped at MAX_HISTORY_PAGE_SIZE.
+            cursor (str, optional): The cursor returned with the previous page.
+
+        Returns:
+            tuple[list[dict], str or None]: The page of sales with their item
+            name, category and price, and the cursor of the next page.
+
+        Raises:
+            ValueError: If the cursor is invalid, the query fails or an archive cannot be read.
+        """
+        limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+        local_items = self._items_are_local(db)
+        columns = [Sale.id, Sale.item_id, Sale.amount, Sale.quantity, Sale.created_at]
+        if local_items:
+            columns += [getattr(Item, field).label(f"item_{field}") for field in HISTORY_ITEM_FIELDS]
+        query = db.query(*columns).filter(Sale.customer_id == customer_id)
+        if local_items:
+            query = query.outerjoin(Item, Item.id == Sale.item_id)
+
+        last_created_at = last_id = None
+        if cursor:
+            last_created_at, last_id = decode_cursor(cursor)
+            if last_created_at is not None:
+                try:
+                    last_created_at = datetime.fromisoformat(last_created_at)
+                except (TypeError, ValueError):
+                    raise ValueError("Invalid cursor")
+
+        try:
+            rows = []
+            if not cursor or last_created_at is not None:
+                timed = query.filter(Sale.created_at.isnot(None))
+                if cursor:
+                    timed = timed.filter(tuple_(Sale.created_at, Sale.id) < tuple_(last_created_at, last_id))
+                rows = timed.order_by(Sale.created_at.desc(), Sale.id.desc()).limit(limit + 1).all()
+                rows = self._merge_archived_history(
+                    db, customer_id, [dict(row._mapping) for row in rows], limit + 1,
+                    (last_created_at, last_id) if cursor else None,
+                )
+            if len(rows) <= limit:
+                untimed = query.filter(Sale.created_at.is_(None))
+                if cursor and last_created_at is None:
+                    untimed = untimed.filter(Sale.id < last_id)
+                rows += [dict(row._mapping) for row in untimed.order_by(Sale.id.desc()).limit(limit + 1 - len(rows)).all()]
+        except SQLAlchemyError as e:
+            raise ValueError(f"Failed to retrieve the history of customer {customer_id}: {e}")
+
+        next_cursor = None
+        history = rows[:limit]
+        if len(rows) > limit:
+            last = history[-1]
+            next_cursor = encode_cursor(last["created_at"].isoformat() if last["created_at"] else None, last["id"])
+        missing = [sale for sale in history if "item_name" not in sale]
+        if missing:
+            items = self._history_items(db, {sale["item_id"] for sale in missing})
+            for sale in missing:
+                item = items.get(sale["item_id"], {})
+                sale.update({f"item_{field}": item.get(field) for field in HISTORY_ITEM_FIELDS})
+        return history, next_cursor
+
+    def _merge_archived_history(self, db: Session, customer_id: int, rows: list, limit: int, before: tuple = None):
+        """
+        Merges a customer's newest archived sales into a history page read from the sales table.
+
+        Archived months are read newest first, and no further once the page
+        holds `limit` sales newer than the next month.
+
+        Args:
+            db (Session): The database session.
+            customer_id (int): The ID of the customer.
+            rows (list[dict]): The page from the sales table, newest first.
+            limit (int): The number of sales wanted.
+            before (tuple[datetime, int], optional): The (created_at, id) key of the previous page's last sale.
+
+        Returns:
+            list[dict]: At most `limit` sales, newest first.
+
+        Raises:
+            ValueError: If an archive file cannot be read.
+        """
+        end = before[0] + timedelta(microseconds=1) if before else None
+        for partition in reversed(overlapping_partitions(db, end=end)):
+            if len(rows) >= limit and rows[limit - 1]["created_at"] >= partition.ends_at:
+                break
+            archived = self._read_partition(partition, "customer_id", customer_id, before=before, limit=limit)
+            for sale in archived:
+                del sale["customer_id"]
+            rows = sorted(rows + archived, key=lambda sale: (sale["created_at"], sale["id"]), reverse=True)[:limit]
+        return rows
+
+    def _history_items(self, db: Session, item_ids: set):
+        """
+        Looks up the history fields of items, locally or from the inventory service.
+        """
+        if not self._items_are_local(db):
+            return self._fetch_items(item_ids)
+        rows = db.query(Item.id, *(getattr(Item, field) for field in HISTORY_ITEM_FIELDS)).filter(Item.id.in_(item_ids)).all()
+        return {row.id: dict(row._mapping) for row in rows}
+
+    def _items_are_local(self, db: Session):
+        """
+        Checks whether items are read from the sales database; see PURCHASE_MODE.
+        """
+        return PURCHASE_MODE == "local"
+
+    def _fetch_items(self, item_ids: set):
+        """
+        Fetches the history fields of items from the inventory service in one call.
+
+        Args:
+            item_ids (set[int]): The IDs of the items.
+
+        Returns:
+            dict[int, dict]: The items by ID; empty if the service cannot be reached.
+        """
+        try:
+            items = self._call_service("GET", f"{INVENTORY_API_URL}/items", params={
+                "ids": ",".join(str(item_id) for item_id in sorted(item_ids)),
+                "fields": ",".join(("id",) + HISTORY_ITEM_FIELDS),
+                "limit": len(item_ids),
+            })
+        except Exception as e:
+            logging.error(f"Failed to fetch items {sorted(item_ids)}: {e}")
+            return {}
+        return {item["id"]: item for item in items}
+
+    @profile
+    def get_sales_by_item(self, db: Session, item_id: int, start: datetime = None, end: datetime = None):
         """
-        Retrieves all sales associated with a specific item.
+        Retrieves the sales associated with a specific item, archived ones first.
 
         Args:
             db (Session): The database session.
             item_id (int): The ID of the item.
+            start (datetime, optional): Only sales at or after this time (UTC).
+            end (datetime, optional): Only sales before this time (UTC).
 
         Returns:
             list[Sale]: A list of sales associated with the item.
@@ -166,10 +623,151 @@ class SalesService:
             ValueError: If the query fails.
         """
         try:
-            return db.query(Sale).filter(Sale.item_id == item_id).all()
+            return (
+                self._archived_sales(db, "item_id", item_id, start, end)
+                + self._recent_sales(db, Sale.item_id == item_id, start, end)
+            )
         except SQLAlchemyError as e:
             raise ValueError(f"Failed to retrieve sales for item {item_id}: {e}")
 
+    def _recent_sales(self, db: Session, condition, start: datetime = None, end: datetime = None):
+        """
+        Reads the sales matching a condition from the sales table.
+        """
+        query = db.query(Sale).filter(condition)
+        if start is not None:
+            query = query.filter(Sale.created_at >= to_utc(start))
+        if end is not None:
+            query = query.filter(Sale.created_at < to_utc(end))
+        return query.all()
+
+    def _archived_sales(self, db: Session, column: str, value: int, start: datetime = None, end: datetime = None):
+        """
+        Reads the sales of an item or customer from the archives overlapping a time range.
+
+        Archives whose month lies outside the range are not opened.
+
+        Args:
+            db (Session): The database session.
+            column (str): item_id or customer_id.
+            value (int): The ID of the item or customer.
+            start (datetime, optional): Only sales at or after this time (UTC).
+            end (datetime, optional): Only sales before this time (UTC).
+
+        Returns:
+            list[Sale]: Detached sales, oldest first.
+
+        Raises:
+            ValueError: If an archive file cannot be read.
+        """
+        start, end = to_utc(start), to_utc(end)
+        sales = []
+        for partition in overlapping_partitions(db, start, end):
+            sales.extend(Sale(**row) for row in self._read_partition(partition, column, value, start, end))
+        return sales
+
+    def _read_partition(self, partition: SalesPartition, column: str, value: int, *args, **kwargs):
+        """
+        Reads the sales of an item or customer from the archive of a month; see read_archive().
+        """
+        try:
+            return read_archive(partition.path, column, value, *args, **kwargs)
+        except sqlite3.Error as e:
+            raise ValueError(f"Failed to read the {partition.month} sales archive: {e}")
+
+    def get_partitions(self, db: Session):
+        """
+        Lists the archived months, oldest first.
+
+        Args:
+            db (Session): The database session.
+
+        Returns:
+            list[SalesPartition]: The archived months.
+        """
+        return db.query(SalesPartition).order_by(SalesPartition.starts_at).all()
+
+    def archive_month(self, db: Session, month: date, archive_dir: str = None):
+        """
+        Moves a closed month of sales from the sales table to an archive file.
+
+        The sales are copied in keyset chunks to a new archive file, then
+        the month is catalogued and its sales deleted in one transaction.
+        Only sales that were copied are deleted, so a sale recorded in the
+        month while it is being archived stays in the sales table.
+
+        Args:
+            db (Session): The database session.
+            month (date): Any day of the month to archive.
+            archive_dir (str, optional): The absolute directory of the archive
+                files; defaults to SALES_ARCHIVE_DIR.
+
+        Returns:
+            SalesPartition: The catalogue entry of the archived month.
+
+        Raises:
+            ValueError: If the archive directory is not an absolute path, or
+            the month is not closed yet, is already archived, or cannot be archived.
+        """
+        path = archive_path(archive_dir or self.archive_dir, month)
+        start, end = month_bounds(month)
+        key = start.strftime("%Y-%m")
+        if end > datetime.utcnow() - timedelta(days=SALES_ARCHIVE_GRACE_DAYS):
+            raise ValueError(f"Month {key} is not closed yet")
+        if db.get(SalesPartition, key) is not None:
+            raise ValueError(f"Month {key} is already archived")
+
+        copied = {"last_id": 0}
+
+        def chunks():
+            for chunk in iter_sales_chunks(db, start, end):
+                copied["last_id"] = chunk["id"][-1]
+                yield chunk
+
+        rows = write_archive(path, chunks())
+        try:
+            partition = SalesPartition(month=key, starts_at=start, ends_at=end, path=path, row_count=rows)
+            db.add(partition)
+            db.query(Sale).filter(
+                Sale.created_at >= start, Sale.created_at < end, Sale.id <= copied["last_id"],
+            ).delete(synchronize_session=False)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            raise ValueError(f"Failed to archive sales of {key}: {e}")
+        logging.info(f"Archived {rows} sales of {key} to {path}")
+        return partition
+
+    def archive_sales(self, db: Session, keep_months: int = SALES_ARCHIVE_KEEP_MONTHS, archive_dir: str = None):
+        """
+        Archives every closed month with sales that ended more than `keep_months` months ago.
+
+        Args:
+            db (Session): The database session.
+            keep_months (int): The number of past months kept in the sales table.
+            archive_dir (str, optional): The absolute directory of the archive
+                files; defaults to SALES_ARCHIVE_DIR.
+
+        Returns:
+            list[SalesPartition]: The months archived, oldest first.
+        """
+        now = datetime.utcnow()
+        current, _ = month_bounds(now)
+        cutoff = datetime(current.year + (current.month - 1 - keep_months) // 12, (current.month - 1 - keep_months) % 12 + 1, 1)
+        cutoff = min(cutoff, month_bounds(now - timedelta(days=SALES_ARCHIVE_GRACE_DAYS))[0])
+        month = period_expression(db.get_bind().dialect.name, "month")
+        months = [
+            row[0] for row in
+            db.query(month).filter(Sale.created_at < cutoff).group_by(month).order_by(month).all()
+        ]
+        archived = db.query(SalesPartition.month).filter(SalesPartition.month.in_(months)).all() if months else []
+        archived = {row.month for row in archived}
+        return [
+            self.archive_month(db, datetime.strptime(key, "%Y-%m").date(), archive_dir)
+            for key in months
+            if key not in archived
+        ]
+
     @profile
     def delete_sale(self, db: Session, sale_id: int):
         """
@@ -189,8 +787,11 @@ class SalesService:
             sale = db.query(Sale).filter(Sale.id == sale_id).first()
             if not sale:
                 raise ValueError("Sale not found")
+            self._update_rollups(db, [sale], -1)
+            entries = leaderboard_entries([sale])
             db.delete(sale)
             db.commit()
+            sales_leaderboard.record(entries, -1)
             return {"message": f"Sale {sale_id} successfully deleted"}
         except SQLAlchemyError as e:
             db.rollback()
@@ -216,14 +817,506 @@ class SalesService:
             sale = db.query(Sale).filter(Sale.id == sale_id).first()
             if not sale:
                 raise ValueError("Sale not found")
+            self._update_rollups(db, [sale], -1)
+            previous = leaderboard_entries([sale])
             for key, value in updates.items():
                 setattr(sale, key, value)
+            db.flush()
+            self._update_rollups(db, [sale], 1)
+            entries = leaderboard_entries([sale])
             db.commit()
+            sales_leaderboard.record(previous, -1)
+            sales_leaderboard.record(entries)
             db.refresh(sale)
             return sale
         except SQLAlchemyError as e:
             db.rollback()
             raise ValueError(f"Failed to update sale {sale_id}: {e}")
+    @profile
+    def get_sales_stats(
+        self,
+        db: Session,
+        group_by: str,
+        start: datetime = None,
+        end: datetime = None,
+        limit: int = DEFAULT_STATS_LIMIT,
+    ):
+        """
+        Aggregates sales per item, customer, day, week or month.
+
+        The aggregation runs in the database as a single GROUP BY query; the
+        time range is served by the index on `created_at`. Item and customer
+        groups are ordered by revenue, highest first, and periods
+        chronologically. Sales without a timestamp are left out of ranged and
+        per-period statistics. When the range overlaps archived months, the
+        `sales` table and each archive are summed per group and customer
+        instead, and the sums merged in memory, since distinct buyers cannot
+        be added up across sources.
+
+        Args:
+            db (Session): The database session.
+            group_by (str): item, customer, day, week or month.
+            start (datetime, optional): Only sales at or after this time (UTC).
+            end (datetime, optional): Only sales before this time (UTC).
+            limit (int): The maximum number of groups, capped at MAX_STATS_LIMIT.
+
+        Returns:
+            list[dict]: One entry per group with its key, revenue, units, sales and distinct buyers.
+
+        Raises:
+            ValueError: If the grouping or the time range is invalid, or an
+            archive file cannot be read.
+        """
+        if group_by not in STATS_GROUPS:
+            raise ValueError(f"group_by must be one of: {', '.join(STATS_GROUPS)}")
+        start, end = to_utc(start), to_utc(end)
+        if start and end and start >= end:
+            raise ValueError("start must be before end")
+        limit = max(1, min(limit, MAX_STATS_LIMIT))
+        archived = overlapping_partitions(db, start, end)
+
+        if group_by in ("item", "customer"):
+            key = Sale.item_id if group_by == "item" else Sale.customer_id
+        else:
+            key = period_expression(db.get_bind().dialect.name, group_by)
+        revenue = func.sum(Sale.amount)
+        if archived:
+            query = db.query(
+                key.label("key"), Sale.customer_id, revenue, func.sum(Sale.quantity), func.count(Sale.id)
+            )
+        else:
+            query = db.query(
+                key.label("key"),
+                revenue.label("revenue"),
+                func.sum(Sale.quantity).label("units"),
+                func.count(Sale.id).label("sales"),
+                func.count(distinct(Sale.customer_id)).label("buyers"),
+            )
+        if start is not None:
+            query = query.filter(Sale.created_at >= start)
+        if end is not None:
+            query = query.filter(Sale.created_at < end)
+        if group_by not in ("item", "customer"):
+            query = query.filter(Sale.created_at.isnot(None))
+        if archived:
+            query = query.group_by(key, Sale.customer_id)
+        elif group_by in ("item", "customer"):
+            query = query.group_by(key).order_by(revenue.desc(), key).limit(limit)
+        else:
+            query = query.group_by(key).order_by(key).limit(limit)
+        try:
+            rows = query.all()
+        except SQLAlchemyError as e:
+            raise ValueError(f"Failed to compute sales statistics: {e}")
+
+        if archived:
+            sources = [rows]
+            for partition in archived:
+                try:
+                    sources.append(aggregate_archive(partition.path, group_by, start, end))
+                except sqlite3.Error as e:
+                    raise ValueError(f"Failed to read the {partition.month} sales archive: {e}")
+            groups = {}
+            for source in sources:
+                for group_key, customer_id, group_revenue, units, sales in source:
+                    group = groups.setdefault(group_key, {"key": group_key, "revenue": 0, "units": 0, "sales": 0, "buyers": set()})
+                    group["revenue"] += group_revenue or 0
+                    group["units"] += units or 0
+                    group["sales"] += sales
+                    group["buyers"].add(customer_id)
+            if group_by in ("item", "customer"):
+                ordered = sorted(groups.values(), key=lambda group: (-group["revenue"], group["key"]))
+            else:
+                ordered = sorted(groups.values(), key=lambda group: group["key"])
+            rows = [dict(group, buyers=len(group["buyers"])) for group in ordered[:limit]]
+        else:
+            rows = [row._asdict() for row in rows]
+        return [
+            {
+                "key": row["key"],
+                "revenue": round(row["revenue"] or 0, 2),
+                "units": row["units"],
+                "sales": row["sales"],
+                "buyers": row["buyers"],
+            }
+            for row in rows
+        ]
+
+    def _update_rollups(self, db: Session, sales: list, sign: int):
+        """
+        Adds sales to, or removes them from, the daily rollups within the current transaction.
+
+        The sales are summed per key and day in memory, then each rollup is
+        upserted with one executemany INSERT ... ON CONFLICT DO UPDATE; rows
+        left without sales are deleted. Sales without a timestamp are not
+        rolled up.
+
+        Args:
+            db (Session): The database session.
+            sales (list[Sale]): The flushed sales.
+            sign (int): 1 to add the sales, -1 to remove them.
+        """
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        for model, key in ROLLUPS.values():
+            deltas = {}
+            for sale in sales:
+                if sale.created_at is None:
+                    continue
+                delta = deltas.setdefault((getattr(sale, key), sale.created_at.date()), [0.0, 0, 0])
+                delta[0] += sign * (sale.amount or 0)
+                delta[1] += sign * (sale.quantity or 0)
+                delta[2] += sign
+            if not deltas:
+                continue
+            statement = dialect.insert(model)
+            statement = statement.on_conflict_do_update(
+                index_elements=[key, "day"],
+                set_={
+                    "revenue": model.revenue + statement.excluded.revenue,
+                    "units": model.units + statement.excluded.units,
+                    "sales": model.sales + statement.excluded.sales,
+                },
+            )
+            db.execute(statement, [
+                {key: key_value, "day": day, "revenue": revenue, "units": units, "sales": count}
+                for (key_value, day), (revenue, units, count) in deltas.items()
+            ])
+            if sign < 0:
+                db.query(model).filter(
+                    getattr(model, key).in_({key_value for key_value, _ in deltas}),
+                    model.day.in_({day for _, day in deltas}),
+                    model.sales <= 0,
+                ).delete(synchronize_session=False)
+
+    def get_top_items(self, window: str = "24h", limit: int = DEFAULT_TOP_ITEMS, by: str = "units"):
+        """
+        Returns the best-selling items of a time window from the in-memory leaderboard.
+
+        Args:
+            window (str): 24h, 7d or 30d.
+            limit (int): The number of items, capped at MAX_TOP_ITEMS.
+            by (str): units or revenue.
+
+        Returns:
+            list[dict]: The items with their units, revenue and number of sales, best first.
+
+        Raises:
+            ValueError: If the window or the ranking is unknown.
+        """
+        return sales_leaderboard.top(window, max(1, min(limit, MAX_TOP_ITEMS)), by)
+
+    @profile
+    def get_rollup_totals(
+        self,
+        db: Session,
+        by: str,
+        start: date = None,
+        end: date = None,
+        key: int = None,
+        limit: int = DEFAULT_STATS_LIMIT,
+    ):
+        """
+        Reads sales totals per item or customer from the daily rollups.
+
+        Without `key`, returns the items or customers with the highest revenue
+        over the range. With `key`, returns the daily series of that item or
+        customer. Either way the query reads one row per key and day.
+
+        Args:
+            db (Session): The database session.
+            by (str): item or customer.
+            start (date, optional): The first day included (UTC).
+            end (date, optional): The first day excluded (UTC).
+            key (int, optional): The ID of the item or customer to return the daily series of.
+            limit (int): The maximum number of rows, capped at MAX_STATS_LIMIT.
+
+        Returns:
+            list[dict]: Rows with their key (an ID or a day), revenue, units and sales.
+
+        Raises:
+            ValueError: If the dimension or the range is invalid.
+        """
+        if by not in ROLLUPS:
+            raise ValueError(f"by must be one of: {', '.join(ROLLUPS)}")
+        if start and end and start >= end:
+            raise ValueError("start must be before end")
+        limit = max(1, min(limit, MAX_STATS_LIMIT))
+        model, key_name = ROLLUPS[by]
+        key_column = getattr(model, key_name)
+        revenue = func.sum(model.revenue)
+        group = model.day if key is not None else key_column
+        query = db.query(
+            group.label("key"),
+            revenue.label("revenue"),
+            func.sum(model.units).label("units"),
+            func.sum(model.sales).label("sales"),
+        )
+        if key is not None:
+            query = query.filter(key_column == key)
+        if start is not None:
+            query = query.filter(model.day >= start)
+        if end is not None:
+            query = query.filter(model.day < end)
+        query = query.group_by(group).order_by(group if key is not None else revenue.desc(), group)
+        return [
+            {
+                "key": row.key.isoformat() if key is not None else row.key,
+                "revenue": round(row.revenue or 0, 2),
+                "units": row.units,
+                "sales": row.sales,
+            }
+            for row in query.limit(limit).all()
+        ]
+
+    def rebuild_rollups(self, db: Session, start: date = None, end: date = None):
+        """
+        Recomputes the daily rollups from the sales table.
+
+        The rollup rows of the range are deleted and re-inserted by one
+        INSERT ... SELECT ... GROUP BY per rollup, in a single transaction.
+        Archived months are left as they are, since their sales are no longer
+        in the sales table.
+
+        Args:
+            db (Session): The database session.
+            start (date, optional): The first day rebuilt (UTC).
+            end (date, optional): The first day not rebuilt (UTC).
+
+        Returns:
+            int: The number of rollup rows written.
+        """
+        day = day_expression(db.get_bind().dialect.name)
+        archived = self.get_partitions(db)
+        written = 0
+        try:
+            for model, key in ROLLUPS.values():
+                stale = db.query(model)
+                if archived:
+                    stale = stale.filter(not_(or_(*(
+                        and_(model.day >= partition.starts_at.date(), model.day < partition.ends_at.date())
+                        for partition in archived
+                    ))))
+                if start is not None:
+                    stale = stale.filter(model.day >= start)
+                if end is not None:
+                    stale = stale.filter(model.day < end)
+                stale.delete(synchronize_session=False)
+
+                source = select(
+                    getattr(Sale, key), day, func.sum(Sale.amount), func.sum(Sale.quantity), func.count(Sale.id),
+                ).where(Sale.created_at.isnot(None))
+                if archived:
+                    source = source.where(not_(or_(*(
+                        and_(Sale.created_at >= partition.starts_at, Sale.created_at < partition.ends_at)
+                        for partition in archived
+                    ))))
+                if start is not None:
+                    source = source.where(Sale.created_at >= datetime.combine(start, datetime.min.time()))
+                if end is not None:
+                    source = source.where(Sale.created_at < datetime.combine(end, datetime.min.time()))
+                source = source.group_by(getattr(Sale, key), day)
+                written += db.execute(
+                    model.__table__.insert().from_select([key, "day", "revenue", "units", "sales"], source)
+                ).rowcount
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            raise ValueError(f"Failed to rebuild sales rollups: {e}")
+        return written
+
+    def _uses_local_purchases(self, db: Session):
+        """
+        Decides whether purchases can run as a single local transaction.
+
+        Args:
+            db (Session): The database session.
+
+        Returns:
+            bool: True if PURCHASE_MODE is local.
+        """
+        return PURCHASE_MODE == "local"
+
+    @profile
+    def purchase(self, db: Session, username: str, item_id: int, quantity: int = 1):
+        """
+        Sells units of an item to a customer at the item's catalog price.
+
+        Args:
+            db (Session): The database session.
+            username (str): The username of the buying customer.
+            item_id (int): The ID of the item.
+            quantity (int): The number of units to buy.
+
+        Returns:
+            Sale: The recorded sale.
+
+        Raises:
+            ValueError: If the quantity is invalid, the customer or item is not
+                found, the stock is insufficient or the wallet balance is insufficient.
+            Exception: If another service could not be reached.
+        """
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity <= 0:
+            raise ValueError("Quantity must be a positive integer")
+        if self._uses_local_purchases(db):
+            return self._purchase_locally(db, username, item_id, quantity)
+        return self._purchase_remotely(db, username, item_id, quantity)
+
+    def _purchase_locally(self, db: Session, username: str, item_id: int, quantity: int):
+        """
+        Takes the stock, debits the wallet and inserts the sale in one transaction.
+
+        The stock and the wallet are each updated by a conditional UPDATE, so
+        concurrent purchases can neither oversell the item nor overdraw the
+        wallet, and a failed step leaves nothing behind.
+        """
+        try:
+            item = self.inventory_service.take_stock(db, item_id, quantity)
+            if item is None:
+                found = db.query(Item.id).filter(Item.id == item_id).first()
+                raise ValueError("Insufficient stock available" if found else "Item not found")
+            amount_cents = round(item.price * 100) * quantity
+            customer = self.customer_service.update_wallet(db, username, -amount_cents, "purchase")
+            if customer is None:
+                found = db.query(Customer.id).filter(Customer.username == username).first()
+                raise ValueError("Insufficient funds" if found else "Customer not found")
+            sale = Sale(customer_id=customer["id"], item_id=item_id, amount=amount_cents / 100, quantity=quantity)
+            db.add(sale)
+            db.flush()
+            self._update_rollups(db, [sale], 1)
+            entries = leaderboard_entries([sale])
+            db.commit()
+        except ValueError:
+            db.rollback()
+            raise
+        except SQLAlchemyError as e:
+            db.rollback()
+            raise ValueError(f"Failed to complete purchase: {e}")
+        username_cache.invalidate(username)
+        sales_leaderboard.record(entries)
+        db.refresh(sale)
+        return sale
+
+    def _http_session(self):
+        """
+        Returns the pooled HTTP session used to call the other services.
+        """
+        with self._http_lock:
+            if self._http is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=SERVICE_POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers["Authorization"] = f"Bearer {SERVICE_TOKEN}"
+                self._http = session
+            return self._http
+
+    def _call_service(self, method: str, url: str, **kwargs):
+        """
+        Calls another service and returns its JSON response.
+
+        Raises:
+            ServiceError: With the service's error detail on a 4xx response.
+            Exception: If the service cannot be reached or fails.
+        """
+        try:
+            response = self._http_session().request(method, url, timeout=SERVICE_TIMEOUT, **kwargs)
+        except requests.RequestException as e:
+            raise Exception(f"Failed to call {url}: {e}")
+        if 400 <= response.status_code < 500:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text
+            raise ServiceError(str(detail), response.status_code)
+        if response.status_code >= 500:
+            raise Exception(f"Failed to call {url}: HTTP {response.status_code}")
+        return response.json()
+
+    def _purchase_remotely(self, db: Session, username: str, item_id: int, quantity: int):
+        """
+        Runs a purchase against the inventory and customer services.
+
+        The stock is held by a reservation, the wallet is debited (with an
+        idempotency key, so a retried call cannot debit twice) and the sale is
+        committed; only then is the reservation confirmed, so the stock is
+        never deducted for a sale that was not recorded. If a step fails, the
+        wallet is refunded and the reservation released, and if the
+        confirmation fails the committed sale is deleted first.
+
+        The refund is registered before the debit is sent, since a debit can
+        commit and still fail to answer. Only a rejection (4xx) proves that
+        nothing was debited; after any other failure the debit is replayed
+        under the same key, which returns its outcome if it ran and runs it
+        now if it did not.
+        """
+        customer = self._call_service("GET", f"{CUSTOMER_API_URL}/customers/{username}")
+        item = self._call_service("GET", f"{INVENTORY_API_URL}/items/{item_id}")
+        amount_cents = round(item["price"] * 100) * quantity
+        reservation = self._call_service(
+            "POST", f"{INVENTORY_API_URL}/items/{item_id}/reserve", json={"quantity": quantity}
+        )["reservation"]
+        compensations = [("POST", f"{INVENTORY_API_URL}/reservations/{reservation['id']}/release", {})]
+        try:
+            key = str(uuid.uuid4())
+            if amount_cents:
+                deduct_url = f"{CUSTOMER_API_URL}/customers/{username}/deduct"
+                deduct = {"json": {"amount": amount_cents / 100}, "headers": {"Idempotency-Key": key}}
+                refund = (
+                    "POST", f"{CUSTOMER_API_URL}/customers/{username}/charge",
+                    {"json": {"amount": amount_cents / 100}, "headers": {"Idempotency-Key": f"{key}-refund"}},
+                )
+                compensations.append(refund)
+                try:
+                    self._call_service("POST", deduct_url, **deduct)
+                except ServiceError:
+                    compensations.remove(refund)
+                    raise
+                except Exception:
+                    try:
+                        self._call_service("POST", deduct_url, **deduct)
+                    except ServiceError as e:
+                        # 409: the first call is still running or its outcome
+                        # was lost, so it may have debited.
+                        if e.status_code != 409:
+                            compensations.remove(refund)
+                        raise
+            sale = Sale(customer_id=customer["id"], item_id=item_id, amount=amount_cents / 100, quantity=quantity)
+            db.add(sale)
+            db.flush()
+            self._update_rollups(db, [sale], 1)
+            entries = leaderboard_entries([sale])
+            db.commit()
+        except Exception:
+            db.rollback()
+            self._compensate(compensations)
+            raise
+        try:
+            self._call_service("POST", f"{INVENTORY_API_URL}/reservations/{reservation['id']}/confirm")
+        except Exception:
+            try:
+                self._update_rollups(db, [sale], -1)
+                db.delete(sale)
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                logging.error(f"Failed to delete sale {sale.id} of an unconfirmed reservation: {e}")
+            self._compensate(compensations)
+            raise
+        sales_leaderboard.record(entries)
+        db.refresh(sale)
+        return sale
+
+    def _compensate(self, compensations: list):
+        """
+        Undoes the completed steps of a remote purchase, newest first, logging the ones that fail.
+        """
+        for method, url, kwargs in reversed(compensations):
+            try:
+                self._call_service(method, url, **kwargs)
+            except Exception as e:
+                logging.error(f"Purchase compensation {method} {url} failed: {e}")
+
+
 if __name__ == "__main__":
     from database import SessionLocal
 
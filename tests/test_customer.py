@@ -1,5 +1,6 @@
 import pytest
 import sys, os
+import json
 from fastapi.testclient import TestClient
 from decouple import config
 from line_profiler import LineProfiler
@@ -55,6 +56,9 @@ Functions
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app_customer.app_customer import app
 from services.customer_service import CustomerService
+from database import SessionLocal, get_db
+from models.customer import Customer, WalletSnapshot
+from sqlalchemy.exc import IntegrityError
 
 client = TestClient(app)
 
@@ -143,6 +147,233 @@ def test_deduct_customer(setup_customer):
     execute()
     lp.print_stats()
 
+def test_wallet_insufficient_funds(setup_customer):
+    """
+    Test that a deduction larger than the balance is refused.
+
+    - Attempts to deduct more than the wallet holds.
+    - Verifies the error and that the balance is unchanged.
+    """
+    response = client.post("/api/customers/johndoe/deduct", json={"amount": 1000.0}, headers=HEADERS)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Insufficient funds"
+    response = client.get("/api/customers/johndoe", headers=HEADERS)
+    assert response.json()["wallet_balance"] == 50.0
+
+    response = client.post("/api/customers/nobody/charge", json={"amount": 10.0}, headers=HEADERS)
+    assert response.status_code == 404
+
+def test_update_customer_version_conflict(setup_customer):
+    """
+    Test optimistic concurrency on customer updates.
+
+    - Updates the customer with its current version.
+    - Verifies that reusing the now stale version is rejected.
+    """
+    version = client.get("/api/customers/johndoe", headers=HEADERS).json()["version"]
+    response = client.put(
+        "/api/customers/johndoe", json={"address": "1 New St", "version": version}, headers=HEADERS
+    )
+    assert response.status_code == 200
+    response = client.put(
+        "/api/customers/johndoe", json={"address": "2 Old St", "version": version}, headers=HEADERS
+    )
+    assert response.status_code == 409
+
+    for balance in ("abc", None, -1, 1.005):
+        response = client.put("/api/customers/johndoe", json={"wallet_balance": balance}, headers=HEADERS)
+        assert response.status_code == 400
+
+def test_wallet_ledger(setup_customer):
+    """
+    Test the wallet ledger of a customer.
+
+    - Charges and deducts the wallet.
+    - Pages through the ledger newest first and checks the amounts in cents.
+    - Verifies that the ledger, with and without snapshots, adds up to the balance.
+    """
+    client.post("/api/customers/johndoe/charge", json={"amount": 10.25}, headers=HEADERS)
+    client.post("/api/customers/johndoe/deduct", json={"amount": 0.25}, headers=HEADERS)
+
+    response = client.get("/api/customers/johndoe/ledger", params={"limit": 2}, headers=HEADERS)
+    assert response.status_code == 200
+    assert [(entry["entry_type"], entry["amount_cents"]) for entry in response.json()] == [
+        ("deduct", -25),
+        ("charge", 1025),
+    ]
+    response = client.get(
+        "/api/customers/johndoe/ledger",
+        params={"cursor": response.headers["X-Next-Cursor"]},
+        headers=HEADERS,
+    )
+    assert all(entry["amount_cents"] for entry in response.json())
+
+    customer = client.get("/api/customers/johndoe", headers=HEADERS).json()
+    service = CustomerService()
+    db = next(get_db())
+    try:
+        assert service.get_ledger_balance(db, customer["id"]) == round(customer["wallet_balance"] * 100)
+        service.snapshot_wallets(db)
+        snapshot = db.query(WalletSnapshot).filter(WalletSnapshot.customer_id == customer["id"]).one()
+        db.add(WalletSnapshot(
+            customer_id=customer["id"], ledger_entry_id=snapshot.ledger_entry_id,
+            balance_cents=snapshot.balance_cents, created_at=snapshot.created_at,
+        ))
+        with pytest.raises(IntegrityError):
+            db.commit()
+        db.rollback()
+        client.post("/api/customers/johndoe/charge", json={"amount": 1}, headers=HEADERS)
+        assert service.get_ledger_balance(db, customer["id"]) == round(customer["wallet_balance"] * 100) + 100
+    finally:
+        db.close()
+
+    response = client.get("/api/customers/nobody/ledger", headers=HEADERS)
+    assert response.status_code == 404
+
+def test_list_customers(setup_customer):
+    """
+    Test paging through customers and exporting them as NDJSON.
+
+    - Pages through all customers one at a time using the cursor header.
+    - Verifies that passwords are never returned.
+    """
+    usernames = []
+    params = {"limit": 1}
+    while True:
+        response = client.get("/api/customers", params=params, headers=HEADERS)
+        assert response.status_code == 200
+        page = response.json()
+        assert all("password" not in customer for customer in page)
+        usernames.extend(customer["username"] for customer in page)
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+    assert "johndoe" in usernames
+
+    response = client.get("/api/customers", params={"format": "ndjson"}, headers=HEADERS)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert [customer["username"] for customer in exported] == usernames
+    assert all("password" not in customer for customer in exported)
+
+def test_username_cache(setup_customer):
+    """
+    Test that username lookups are cached and kept fresh by writes.
+
+    - Reads the same customer twice and verifies the second read is a cache hit.
+    - Charges and updates the customer and verifies the next reads are fresh.
+    - Verifies that unknown usernames are cached as misses.
+    """
+    client.get("/api/customers/johndoe", headers=HEADERS)
+    hits = client.get("/api/customers/cache/stats", headers=HEADERS).json()["hits"]
+    balance = client.get("/api/customers/johndoe", headers=HEADERS).json()["wallet_balance"]
+    stats = client.get("/api/customers/cache/stats", headers=HEADERS).json()
+    assert stats["hits"] == hits + 1
+    assert 0.0 <= stats["hit_ratio"] <= 1.0
+
+    client.post("/api/customers/johndoe/charge", json={"amount": 5}, headers=HEADERS)
+    assert client.get("/api/customers/johndoe", headers=HEADERS).json()["wallet_balance"] == balance + 5
+    client.post("/api/customers/johndoe/deduct", json={"amount": 5}, headers=HEADERS)
+
+    client.put("/api/customers/johndoe", json={"address": "456 Side St"}, headers=HEADERS)
+    assert client.get("/api/customers/johndoe", headers=HEADERS).json()["address"] == "456 Side St"
+
+    client.delete("/api/customers/ghost", headers=HEADERS)
+    hits = client.get("/api/customers/cache/stats", headers=HEADERS).json()["hits"]
+    assert client.get("/api/customers/ghost", headers=HEADERS).status_code == 404
+    assert client.get("/api/customers/cache/stats", headers=HEADERS).json()["hits"] == hits + 1
+
+def test_username_available(setup_customer):
+    """
+    Test username availability checks backed by the username filter.
+
+    - Verifies that existing usernames are reported as taken and new ones as free.
+    - Registers and deletes a customer and verifies the answer follows.
+    """
+    client.delete("/api/customers/newcomer", headers=HEADERS)
+    assert client.get("/auth/username-available", params={"u": "johndoe"}).json()["available"] is False
+    assert client.get("/auth/username-available", params={"u": "newcomer"}).json()["available"] is True
+
+    registration = {
+        "full_name": "New Comer", "username": "newcomer", "password": "pw", "age": 25,
+        "address": "9 New St", "gender": "Male", "marital_status": "Single", "wallet_balance": 0,
+    }
+    assert client.post("/auth/register", json=registration).status_code == 200
+    assert client.get("/auth/username-available", params={"u": "newcomer"}).json()["available"] is False
+    assert client.post("/auth/register", json=registration).status_code == 400
+
+    client.delete("/api/customers/newcomer", headers=HEADERS)
+    assert client.get("/auth/username-available", params={"u": "newcomer"}).json()["available"] is True
+
+    # Registered by another process: in the database but not in this filter.
+    db = SessionLocal()
+    db.add(Customer(**dict(registration, password="secret-pw")))
+    db.commit()
+    db.close()
+    assert client.get("/auth/username-available", params={"u": "newcomer"}).json()["available"] is False
+    response = client.post("/auth/register", json=dict(registration, wallet_balance=10))
+    assert response.status_code == 400
+    assert "Username already exists" in response.json()["detail"]
+    assert "pw" not in response.json()["detail"]
+    client.delete("/api/customers/newcomer", headers=HEADERS)
+
+def test_import_customers(setup_customer):
+    """
+    Test importing customers from NDJSON.
+
+    - Verifies that valid lines are imported with their opening balance.
+    - Verifies that existing, duplicate and malformed lines are reported by line number.
+    - Verifies that every line whose username already exists is skipped, not just the first.
+    """
+    for username in ("importer1", "importer2"):
+        client.delete(f"/api/customers/{username}", headers=HEADERS)
+    record = {
+        "full_name": "Importer", "password": "pw", "age": 40, "address": "1 Import Rd",
+        "gender": "Female", "marital_status": "Single", "wallet_balance": 0,
+    }
+    body = "\n".join([
+        json.dumps({**record, "username": "importer1", "wallet_balance": 12.5}),
+        json.dumps({**record, "username": "johndoe"}),
+        "",
+        json.dumps({**record, "username": "importer1"}),
+        "{not json",
+        json.dumps({**record, "username": "importer2", "age": "old"}),
+        json.dumps({**record, "username": "importer2"}),
+    ])
+    response = client.post(
+        "/api/customers/import",
+        content=body,
+        headers={**HEADERS, "Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["imported"] == 2
+    assert result["failed"] == 4
+    assert [failure["line"] for failure in result["failures"]] == [2, 4, 5, 6]
+    assert result["failures"][0]["error"] == "Username already exists"
+    assert result["failures"][1]["error"] == "Duplicate username in import"
+
+    response = client.get("/api/customers/importer1", headers=HEADERS)
+    assert response.json()["wallet_balance"] == 12.5
+    response = client.get("/api/customers/importer1/ledger", headers=HEADERS)
+    assert [entry["amount_cents"] for entry in response.json()] == [1250]
+
+    db = next(get_db())
+    try:
+        imported, failures = CustomerService().import_customer_batch(db, [
+            (1, json.dumps({**record, "username": "importer2"})),
+            (2, json.dumps({**record, "username": "importer3"})),
+            (3, json.dumps({**record, "username": "importer1"})),
+        ])
+    finally:
+        db.close()
+    assert imported == 1
+    assert [(failure["line"], failure["error"]) for failure in failures] == [
+        (1, "Username already exists"), (3, "Username already exists"),
+    ]
+    for username in ("importer1", "importer2", "importer3"):
+        assert client.delete(f"/api/customers/{username}", headers=HEADERS).status_code == 200
+
 def test_delete_customer(setup_customer):
     """
     Test deleting a customer by username.
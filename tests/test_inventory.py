@@ -20,6 +20,9 @@ Tested Endpoints:
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app_inventory.app_inventory import app
+from database import get_db
+from routes.inventory_routes import inventory_service
+from services.inventory_service import InventoryService
 
 client = TestClient(app)
 
@@ -187,3 +190,346 @@ def test_deduct_item_out_of_stock():
     response = client.post(f"/api/items/{item_id}/deduct", headers=HEADERS)
     assert response.status_code == 400
     assert response.json()["detail"] == "No stock available to deduct"
+
+def test_list_items_filtered_and_paginated():
+    """
+    Test filtering, sorting, projecting and paging through items.
+
+    - Adds items across two categories.
+    - Pages through one category by descending price using the cursor header.
+    - Verifies that only the requested fields are returned.
+    """
+    for i in range(5):
+        client.post(
+            "/api/items",
+            json={
+                "name": f"Phone {i}",
+                "category": "Phones",
+                "price": 100.0 + i,
+                "description": "A phone",
+                "stock_count": i + 1,
+            },
+            headers=HEADERS,
+        )
+    client.post(
+        "/api/items",
+        json={"name": "Laptop", "category": "Laptops", "price": 900.0, "stock_count": 1},
+        headers=HEADERS,
+    )
+
+    params = {"category": "Phones", "sort": "price", "order": "desc", "limit": 2, "fields": "name,price"}
+    prices = []
+    cursor = None
+    while True:
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/items", params=params, headers=HEADERS)
+        assert response.status_code == 200
+        page = response.json()
+        assert all(set(item) == {"id", "name", "price"} for item in page)
+        prices.extend(item["price"] for item in page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert prices == [104.0, 103.0, 102.0, 101.0, 100.0]
+
+    response = client.get("/api/items", params={"min_price": 102, "max_price": 103}, headers=HEADERS)
+    assert [item["name"] for item in response.json()] == ["Phone 2", "Phone 3"]
+
+    response = client.get("/api/items", params={"fields": "password"}, headers=HEADERS)
+    assert response.status_code == 400
+
+def test_item_cache_invalidation(monkeypatch):
+    """
+    Test that item lookups are cached and invalidated on writes.
+
+    - Reads the same item twice and verifies the second read is a cache hit.
+    - Updates and deducts the item and verifies the next reads are fresh, and
+      that a load started before the update is not cached.
+    - Takes stock through another service instance, as the sales service
+      does, and verifies the change log sync evicts the cached item.
+    - Renames the item through another service instance and verifies a stale
+      cache hit reloads the whole row.
+    - Clears the catalog through another service instance and verifies the
+      sync clears the cache.
+    """
+    # No change log sync may evict the item between the two reads below.
+    monkeypatch.setattr(inventory_service, "cache_sync_interval", float("inf"))
+    response = client.post(
+        "/api/items",
+        json={
+            "name": "Cached Item",
+            "category": "Test Category",
+            "price": 25.0,
+            "description": "A sample test item",
+            "stock_count": 5,
+        },
+        headers=HEADERS,
+    )
+    item_id = response.json()["item"]["id"]
+    hits = client.get("/api/items/cache/stats", headers=HEADERS).json()["hits"]
+
+    client.get(f"/api/items/{item_id}", headers=HEADERS)
+    client.get(f"/api/items/{item_id}", headers=HEADERS)
+    stats = client.get("/api/items/cache/stats", headers=HEADERS).json()
+    assert stats["hits"] == hits + 1
+    assert 0.0 <= stats["hit_ratio"] <= 1.0
+
+    generation = inventory_service.item_cache.generation
+    client.put(f"/api/items/{item_id}", json={"price": 30.0}, headers=HEADERS)
+    # A load that started before the update must not cache what it read.
+    assert not inventory_service.item_cache.set(item_id, {"item": {}, "stock_checked_at": 0}, generation)
+    assert client.get(f"/api/items/{item_id}", headers=HEADERS).json()["price"] == 30.0
+
+    client.post(f"/api/items/{item_id}/deduct", headers=HEADERS)
+    assert client.get(f"/api/items/{item_id}", headers=HEADERS).json()["stock_count"] == 4
+
+    monkeypatch.setattr(inventory_service, "cache_sync_interval", 0)
+    client.get(f"/api/items/{item_id}", headers=HEADERS)
+    db = next(get_db())
+    try:
+        assert InventoryService().take_stock(db, item_id, 3).stock_count == 1
+        db.commit()
+    finally:
+        db.close()
+    assert client.get(f"/api/items/{item_id}", headers=HEADERS).json()["stock_count"] == 1
+
+    # Without the sync, a stale hit whose version changed reloads the whole row.
+    monkeypatch.setattr(inventory_service, "cache_sync_interval", float("inf"))
+    monkeypatch.setattr(inventory_service, "stock_staleness", 0)
+    db = next(get_db())
+    try:
+        InventoryService().update_item(db, item_id, {"name": "Renamed Item"})
+    finally:
+        db.close()
+    assert client.get(f"/api/items/{item_id}", headers=HEADERS).json()["name"] == "Renamed Item"
+
+    # Clearing the catalog elsewhere is logged without an item ID and clears the whole cache.
+    monkeypatch.setattr(inventory_service, "cache_sync_interval", 0)
+    monkeypatch.setattr(inventory_service, "stock_staleness", float("inf"))
+    client.get(f"/api/items/{item_id}", headers=HEADERS)
+    db = next(get_db())
+    try:
+        InventoryService().delete_all_items(db)
+    finally:
+        db.close()
+    assert client.get(f"/api/items/{item_id}", headers=HEADERS).status_code == 404
+
+def test_search_items():
+    """
+    Test full-text search over the inventory.
+
+    - Adds items with different names and descriptions.
+    - Verifies that name matches rank first and that results are paginated.
+    - Verifies that updated and deleted items are reflected in the results.
+    """
+    items = [
+        ("Wireless Mouse", "Accessories", "Ergonomic mouse with a USB receiver"),
+        ("Mouse Pad", "Accessories", "Large pad for any mouse"),
+        ("USB Cable", "Cables", "Braided cable"),
+    ]
+    ids = []
+    for name, category, description in items:
+        response = client.post(
+            "/api/items",
+            json={"name": name, "category": category, "price": 10.0, "description": description, "stock_count": 3},
+            headers=HEADERS,
+        )
+        ids.append(response.json()["item"]["id"])
+
+    response = client.get("/api/items/search", params={"q": "usb"}, headers=HEADERS)
+    assert response.status_code == 200
+    assert [item["name"] for item in response.json()] == ["USB Cable", "Wireless Mouse"]
+
+    response = client.get("/api/items/search", params={"q": "mouse", "limit": 1}, headers=HEADERS)
+    first_page = response.json()
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get("/api/items/search", params={"q": "mouse", "limit": 1, "cursor": cursor}, headers=HEADERS)
+    assert len(first_page) == 1 and len(response.json()) == 1
+    assert first_page[0]["id"] != response.json()[0]["id"]
+
+    client.put(f"/api/items/{ids[2]}", json={"name": "HDMI Cable"}, headers=HEADERS)
+    client.delete(f"/api/items/{ids[0]}", headers=HEADERS)
+    response = client.get("/api/items/search", params={"q": "usb"}, headers=HEADERS)
+    assert response.json() == []
+
+    response = client.get("/api/items/search", params={"q": "*"}, headers=HEADERS)
+    assert response.status_code == 400
+
+def test_stock_reservations():
+    """
+    Test reserving, confirming and releasing stock.
+
+    - Holds part of an item's stock and verifies the available count.
+    - Verifies that holds beyond the available stock are refused.
+    - Confirms one hold, releases another and checks the resulting stock.
+    """
+    response = client.post(
+        "/api/items",
+        json={
+            "name": "Reserved Item",
+            "category": "Test Category",
+            "price": 25.0,
+            "description": "A sample test item",
+            "stock_count": 5,
+        },
+        headers=HEADERS,
+    )
+    item_id = response.json()["item"]["id"]
+
+    response = client.post(f"/api/items/{item_id}/reserve", json={"quantity": 3}, headers=HEADERS)
+    assert response.status_code == 200
+    confirmed_id = response.json()["reservation"]["id"]
+    response = client.post(f"/api/items/{item_id}/reserve", json={"quantity": 2, "ttl_seconds": 60}, headers=HEADERS)
+    released_id = response.json()["reservation"]["id"]
+    assert client.get(f"/api/items/{item_id}/availability", headers=HEADERS).json()["available"] == 0
+
+    response = client.post(f"/api/items/{item_id}/reserve", json={"quantity": 1}, headers=HEADERS)
+    assert response.status_code == 400
+    response = client.post(f"/api/items/{item_id}/reserve", json={"quantity": 1, "ttl_seconds": "abc"}, headers=HEADERS)
+    assert response.status_code == 400
+    response = client.post(f"/api/items/{item_id}/deduct", headers=HEADERS)
+    assert response.status_code == 400
+
+    response = client.post(f"/api/reservations/{confirmed_id}/confirm", headers=HEADERS)
+    assert response.json()["reservation"]["status"] == "Confirmed"
+    response = client.post(f"/api/reservations/{released_id}/release", headers=HEADERS)
+    assert response.json()["reservation"]["status"] == "Released"
+    response = client.post(f"/api/reservations/{released_id}/confirm", headers=HEADERS)
+    assert response.status_code == 409
+
+    assert client.get(f"/api/items/{item_id}", headers=HEADERS).json()["stock_count"] == 2
+    assert client.get(f"/api/items/{item_id}/availability", headers=HEADERS).json()["available"] == 2
+
+def test_conditional_get():
+    """
+    Test ETag support on the item and catalog endpoints.
+
+    - Verifies that a matching If-None-Match header is answered with 304.
+    - Verifies that writes change both the item and the catalog ETags.
+    """
+    response = client.post(
+        "/api/items",
+        json={
+            "name": "Tagged Item",
+            "category": "Test Category",
+            "price": 25.0,
+            "description": "A sample test item",
+            "stock_count": 5,
+        },
+        headers=HEADERS,
+    )
+    item_id = response.json()["item"]["id"]
+
+    response = client.get(f"/api/items/{item_id}", headers=HEADERS)
+    item_etag = response.headers["ETag"]
+    response = client.get(f"/api/items/{item_id}", headers={**HEADERS, "If-None-Match": item_etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = client.get("/api/items", headers=HEADERS)
+    catalog_etag = response.headers["ETag"]
+    response = client.get("/api/items", headers={**HEADERS, "If-None-Match": catalog_etag})
+    assert response.status_code == 304
+    response = client.get("/api/items?limit=1", headers={**HEADERS, "If-None-Match": catalog_etag})
+    assert response.status_code == 200
+
+    client.post(f"/api/items/{item_id}/deduct", headers=HEADERS)
+    response = client.get(f"/api/items/{item_id}", headers={**HEADERS, "If-None-Match": item_etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != item_etag
+    response = client.get("/api/items", headers={**HEADERS, "If-None-Match": catalog_etag})
+    assert response.status_code == 200
+
+def test_item_change_stream():
+    """
+    Test the inventory change feed.
+
+    - Records the current position of the feed.
+    - Creates and deducts an item and verifies both changes are long-polled.
+    - Resumes the event stream from the first change with Last-Event-ID.
+    """
+    start = client.get("/api/items/changes", params={"mode": "poll", "timeout": 0.1}, headers=HEADERS).json()
+    since = start["last_event_id"]
+
+    response = client.post(
+        "/api/items",
+        json={
+            "name": "Streamed Item",
+            "category": "Test Category",
+            "price": 25.0,
+            "description": "A sample test item",
+            "stock_count": 5,
+        },
+        headers=HEADERS,
+    )
+    item_id = response.json()["item"]["id"]
+    client.post(f"/api/items/{item_id}/deduct", headers=HEADERS)
+
+    response = client.get("/api/items/changes", params={"mode": "poll", "since": since}, headers=HEADERS)
+    changes = response.json()["changes"]
+    assert [(change["item_id"], change["change_type"], change["stock_count"]) for change in changes] == [
+        (item_id, "created", 5),
+        (item_id, "updated", 4),
+    ]
+
+    response = client.get(
+        "/api/items/changes",
+        params={"timeout": 0.2},
+        headers={**HEADERS, "Last-Event-ID": str(changes[0]["id"])},
+    )
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert f"id: {changes[1]['id']}\nevent: updated\n" in response.text
+    assert f"id: {changes[0]['id']}\n" not in response.text
+
+def test_bulk_update_items():
+    """
+    Test bulk updating items by category.
+
+    - Adds items in two categories.
+    - Applies a 10% price cut to one category in small chunks.
+    - Verifies the affected count and that the other category is untouched.
+    - Verifies that removing more stock than an item has stops at 0, and that invalid filters are rejected.
+    """
+    for i, category in enumerate(["Shoes", "Shoes", "Shoes", "Hats"]):
+        client.post(
+            "/api/items",
+            json={"name": f"Item {i}", "category": category, "price": 100.0, "stock_count": 5},
+            headers=HEADERS,
+        )
+
+    db = next(get_db())
+    try:
+        updated = inventory_service.bulk_update_items(
+            db, {"category": "Shoes"}, {"price": {"op": "multiply", "value": 0.9}}, chunk_size=2
+        )
+    finally:
+        db.close()
+    assert updated == 3
+    prices = {item["category"]: item["price"] for item in client.get("/api/items", headers=HEADERS).json()}
+    assert prices == {"Shoes": 90.0, "Hats": 100.0}
+
+    response = client.post(
+        "/api/items/bulk-update",
+        json={"filter": {"category": "Hats"}, "update": {"stock_count": {"op": "add", "value": 2}}},
+        headers=HEADERS,
+    )
+    assert response.status_code == 200
+    assert response.json()["updated"] == 1
+
+    response = client.post(
+        "/api/items/bulk-update",
+        json={"filter": {"category": "Hats"}, "update": {"stock_count": {"op": "add", "value": -10}}},
+        headers=HEADERS,
+    )
+    assert response.json()["updated"] == 1
+    stock = {item["category"]: item["stock_count"] for item in client.get("/api/items", headers=HEADERS).json()}
+    assert stock == {"Shoes": 5, "Hats": 0}
+
+    for filters in ({}, {"ids": 5}, {"ids": ["1"]}):
+        response = client.post(
+            "/api/items/bulk-update",
+            json={"filter": filters, "update": {"price": {"op": "set", "value": 1}}},
+            headers=HEADERS,
+        )
+        assert response.status_code == 400
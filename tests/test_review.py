@@ -1,5 +1,6 @@
 import sys
 import os
+from datetime import datetime, timedelta
 from decouple import config
 from fastapi.testclient import TestClient
 from line_profiler import LineProfiler
@@ -13,10 +14,15 @@ It evaluates CRUD operations, moderation, and performance profiling for the `Rev
 Tested Endpoints:
     - POST /api/reviews
     - GET /api/reviews/product/{product_id}
+    - GET /api/reviews/product/{product_id}/summary
+    - backfill_rating_stats at startup
     - GET /api/reviews/customer/{customer_id}
     - PUT /api/reviews/{review_id}
     - PUT /api/reviews/{review_id}/moderate
     - DELETE /api/reviews/{review_id}
+    - POST /api/reviews/moderation/claim
+    - POST /api/reviews/moderation/complete
+    - ReviewService.import_review_batch and the comment sanitizer
 
 Dependencies:
     - FastAPI TestClient
@@ -27,7 +33,13 @@ Dependencies:
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app_review.app_review import app
-from services.review_service import ReviewService
+from services.review_service import ReviewService, backfill_rating_stats
+from services import sanitizer
+from bleach import clean
+from database import Base, SessionLocal
+from models.review import Review
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
 
 client = TestClient(app)
 service = ReviewService()
@@ -78,6 +90,112 @@ def test_get_product_reviews():
     assert response.status_code == 200
     assert len(response.json()) > 0
 
+def test_product_rating_summary():
+    """
+    Test the rating summary of a product.
+
+    - Verifies that only approved reviews are counted, through moderation, updates and deletion.
+    - Verifies that rebuilding the aggregates from the reviews gives the same summary.
+    """
+    def summary():
+        response = client.get("/api/reviews/product/9501/summary", headers=HEADERS)
+        assert response.status_code == 200
+        return response.json()
+
+    ids = [
+        client.post(
+            "/api/reviews",
+            json={"product_id": 9501, "customer_id": 1, "rating": rating, "comment": "Rated"},
+            headers=HEADERS,
+        ).json()["review"]["id"]
+        for rating in (5, 3, 4.5)
+    ]
+    assert summary() == {"product_id": 9501, "count": 0, "average": None, "histogram": dict.fromkeys("12345", 0)}
+
+    for review_id in ids:
+        client.put(f"/api/reviews/{review_id}/moderate", json={"status": "Approved"}, headers=HEADERS)
+    assert summary()["count"] == 3
+    assert summary()["average"] == 4.17
+    assert summary()["histogram"] == {"1": 0, "2": 0, "3": 1, "4": 1, "5": 1}
+
+    client.put(f"/api/reviews/{ids[1]}", json={"rating": 1, "comment": "Broke"}, headers=HEADERS)
+    client.put(f"/api/reviews/{ids[0]}/moderate", json={"status": "Rejected"}, headers=HEADERS)
+    assert summary()["histogram"] == {"1": 1, "2": 0, "3": 0, "4": 1, "5": 0}
+    assert summary()["average"] == 2.75
+
+    before = summary()
+    db = SessionLocal()
+    assert service.rebuild_rating_stats(db, 9501) == 1
+    db.close()
+    assert summary() == before
+
+    for review_id in ids:
+        client.delete(f"/api/reviews/{review_id}", headers=HEADERS)
+    assert summary()["count"] == 0
+
+def test_backfill_rating_stats(tmp_path):
+    """
+    Test backfilling the rating aggregates of reviews approved before they existed.
+
+    - Fills a fresh database with approved and pending reviews, bypassing the aggregates.
+    - Verifies the startup backfill counts the approved ones, and only runs once.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'reviews.db'}")
+    Base.metadata.create_all(bind=engine)
+    with Session(bind=engine) as db:
+        db.add_all([
+            Review(product_id=1, customer_id=1, rating=rating, comment="Old", moderation_status=status)
+            for rating, status in ((4, "Approved"), (2, "Approved"), (5, "Pending"))
+        ])
+        db.commit()
+
+    assert backfill_rating_stats(engine) == 1
+    assert backfill_rating_stats(engine) == 0
+    with Session(bind=engine) as db:
+        summary = service.get_rating_summary(db, 1)
+    assert (summary["count"], summary["average"]) == (2, 3.0)
+    engine.dispose()
+
+def test_sanitize_comments(monkeypatch):
+    """
+    Test the comment sanitizer and the batch review import.
+
+    - Verifies that the fast path, the reused cleaner and the process pool all
+      return what `bleach.clean` returns.
+    - Verifies that invalid import lines are reported without blocking the others.
+    """
+    comments = [
+        "Plain text, quotes \"and\" 'apostrophes'.\nSecond line",
+        "Salt & pepper", "5 > 4 < 6", "<b>bold</b> <script>alert(1)</script>",
+        "carriage\r\nreturn", "control\x01char", "tab\tstays", "",
+    ]
+    expected = [clean(comment, strip=True) for comment in comments]
+    assert [sanitizer.sanitize(comment) for comment in comments] == expected
+    assert not sanitizer.needs_cleaning(comments[0]) and not sanitizer.needs_cleaning(comments[6])
+    assert sanitizer.sanitize_many(comments, workers=1) == expected
+    monkeypatch.setattr(sanitizer, "SANITIZE_POOL_MIN", 1)
+    assert sanitizer.sanitize_many(comments, workers=2) == expected
+
+    lines = [
+        (1, '{"product_id": 9502, "customer_id": 1, "rating": 4, "comment": "<i>Nice</i> & light"}'),
+        (2, '{"product_id": 9502, "customer_id": 1, "rating": 9, "comment": "Too good"}'),
+        (3, "not json"),
+        (4, '{"product_id": 9502, "customer_id": 1, "rating": 2, "comment": "Flimsy"}'),
+        (5, '{"product_id": 9502, "customer_id": 1, "rating": 3, "comment": null}'),
+        (6, '{"product_id": 9502, "customer_id": 1, "rating": 3, "comment": 42}'),
+        (7, '{"product_id": 9502, "customer_id": 1, "rating": "3", "comment": "Okay"}'),
+    ]
+    db = SessionLocal()
+    imported, failures = service.import_review_batch(db, lines, workers=1)
+    db.close()
+    assert imported == 2
+    assert [failure["line"] for failure in failures] == [2, 3, 5, 6, 7]
+    reviews = client.get("/api/reviews/product/9502", headers=HEADERS).json()
+    assert [review["comment"] for review in reviews] == ["<i>Nice</i> &amp; light", "Flimsy"]
+    assert {review["moderation_status"] for review in reviews} == {"Pending"}
+    for review in reviews:
+        client.delete(f"/api/reviews/{review['id']}", headers=HEADERS)
+
 def test_get_customer_reviews():
     """
     Test retrieving reviews by a specific customer.
@@ -161,3 +279,62 @@ def test_delete_review():
 
     execute()
     lp.print_stats()
+
+def test_moderation_queue():
+    """
+    Test the leased moderation queue.
+
+    - Verifies that a claimed review is not handed out again while its lease runs.
+    - Verifies that decisions need the lease that holds the review.
+    - Verifies that a review whose lease expired returns to the queue.
+    """
+    ids = [
+        client.post(
+            "/api/reviews",
+            json={"product_id": 9503, "customer_id": 1, "rating": rating, "comment": "Queued"},
+            headers=HEADERS,
+        ).json()["review"]["id"]
+        for rating in (5, 2, 4)
+    ]
+    first = client.post("/api/reviews/moderation/claim", json={"limit": 100}, headers=HEADERS).json()
+    claimed = [review["id"] for review in first["reviews"]]
+    assert set(ids) <= set(claimed)
+    second = client.post("/api/reviews/moderation/claim", json={"limit": 100}, headers=HEADERS).json()
+    assert not set(claimed) & {review["id"] for review in second["reviews"]}
+
+    response = client.post(
+        "/api/reviews/moderation/complete",
+        json={"lease_id": second["lease_id"], "decisions": [{"review_id": ids[0], "status": "Approved"}]},
+        headers=HEADERS,
+    )
+    assert response.json() == {"completed": [], "failed": [{"review_id": ids[0], "error": "Lease expired or not held"}]}
+    response = client.post(
+        "/api/reviews/moderation/complete",
+        json={"lease_id": first["lease_id"], "decisions": [
+            {"review_id": ids[0], "status": "Approved"}, {"review_id": ids[1], "status": "Rejected"},
+        ]},
+        headers=HEADERS,
+    )
+    assert response.json() == {"completed": ids[:2], "failed": []}
+    assert client.get("/api/reviews/product/9503/summary", headers=HEADERS).json()["count"] == 1
+    response = client.post(
+        "/api/reviews/moderation/complete",
+        json={"lease_id": first["lease_id"], "decisions": [{"review_id": ids[2], "status": "Pending"}]},
+        headers=HEADERS,
+    )
+    assert response.status_code == 400
+
+    db = SessionLocal()
+    later = datetime.utcnow() + timedelta(hours=1)
+    reclaimed = service.claim_reviews(db, 100, now=later)
+    assert ids[2] in [review["id"] for review in reclaimed["reviews"]]
+    assert ids[0] not in [review["id"] for review in reclaimed["reviews"]]
+    result = service.complete_reviews(db, first["lease_id"], [{"review_id": ids[2], "status": "Approved"}], now=later)
+    assert result["completed"] == []
+    result = service.complete_reviews(db, reclaimed["lease_id"], [{"review_id": ids[2], "status": "Approved"}], now=later)
+    assert result["completed"] == [ids[2]]
+    db.close()
+    assert client.get("/api/reviews/product/9503/summary", headers=HEADERS).json()["count"] == 2
+
+    for review_id in ids:
+        client.delete(f"/api/reviews/{review_id}", headers=HEADERS)
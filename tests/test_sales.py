@@ -1,5 +1,11 @@
 import sys
 import os
+import pytest
+import io
+import json
+import uuid
+import numpy as np
+from datetime import datetime
 from decouple import config
 from fastapi.testclient import TestClient
 from line_profiler import LineProfiler
@@ -16,6 +22,16 @@ Tested Endpoints:
     - GET /api/sales/item/{item_id}: Retrieve sales for a specific item.
     - PUT /api/sales/{sale_id}: Update an existing sale.
     - DELETE /api/sales/{sale_id}: Delete a specific sale.
+    - POST /api/sales with an Idempotency-Key header: Replay retried sales, never repeat a write.
+    - POST /api/sales/purchase: Sell an item to a customer in one transaction.
+    - POST /api/sales/batch: Record many sales from a JSON array or NDJSON.
+    - GET /api/sales/stats: Aggregate sales per item, customer or period.
+    - GET /api/sales/rollups/{by}: Read item or customer totals from the daily rollups.
+    - GET /api/sales/top-items: Rank the best-selling items of a time window.
+    - GET /api/sales/customer/{customer_id}/history: Page through a purchase history with item details.
+    - GET /api/sales/item/{item_id} after archival: Read archived months, pruned by time range.
+    - GET /api/sales/customer/{customer_id}/history and /api/sales/export after archival: Include archived months.
+    - GET /api/sales/export: Export the sales to a columnar file.
 
 Performance Profiling:
     - Utilizes `LineProfiler` to measure the performance of:
@@ -39,6 +55,13 @@ Usage:
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app_sales.app_sales import app
+from database import SessionLocal
+from models.customer import Customer, WalletLedgerEntry
+from models.inventory import Item
+from models.sales import Sale, SalesPartition
+from services.sales_service import SalesService
+from services.auth_service import AuthService
+from services.idempotency_service import IdempotencyService
 
 client = TestClient(app)
 
@@ -71,6 +94,406 @@ def test_create_sale():
     execute()
     lp.print_stats()
 
+def test_create_sale_idempotent():
+    """
+    Test that retried sales with the same Idempotency-Key are recorded once.
+
+    - Sends the same sale twice with one key and verifies the second response is a replay.
+    - Verifies that reusing the key for a different sale is rejected.
+    """
+    headers = {**HEADERS, "Idempotency-Key": str(uuid.uuid4())}
+    data = {"customer_id": 424242, "item_id": 1, "amount": 12.5}
+    first = client.post("api/sales", json=data, headers=headers)
+    assert first.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+
+    retry = client.post("api/sales", json=data, headers=headers)
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert len(client.get("api/sales/customer/424242", headers=HEADERS).json()) == 1
+
+    response = client.post("api/sales", json={**data, "amount": 99.0}, headers=headers)
+    assert response.status_code == 422
+
+    client.delete(f"api/sales/{first.json()['sale']['id']}", headers=HEADERS)
+
+def test_idempotency_key_executed_once(monkeypatch):
+    """
+    Test that an Idempotency-Key cannot repeat a write, and is scoped to its caller.
+
+    - Fails storing the response after the sale commits, and verifies a retry
+      is rejected instead of recording the sale again.
+    - Verifies that another caller using the same key gets its own execution.
+    """
+    key = str(uuid.uuid4())
+    data = {"customer_id": 424243, "item_id": 1, "amount": 5.0}
+
+    def lost_response(*args, **kwargs):
+        raise RuntimeError("response store failed")
+
+    monkeypatch.setattr(IdempotencyService, "complete", lost_response)
+    with pytest.raises(RuntimeError):
+        client.post("api/sales", json=data, headers={**HEADERS, "Idempotency-Key": key})
+    monkeypatch.undo()
+    retry = client.post("api/sales", json=data, headers={**HEADERS, "Idempotency-Key": key})
+    assert retry.status_code == 409
+    assert len(client.get("api/sales/customer/424243", headers=HEADERS).json()) == 1
+
+    other = {"Authorization": f"Bearer {AuthService().create_access_token({'sub': 'other-client'})}"}
+    response = client.post("api/sales", json=data, headers={**other, "Idempotency-Key": key})
+    assert response.status_code == 200
+    assert "Idempotent-Replayed" not in response.headers
+    for sale in client.get("api/sales/customer/424243", headers=HEADERS).json():
+        client.delete(f"api/sales/{sale['id']}", headers=HEADERS)
+
+def test_create_sales_batch():
+    """
+    Test recording sales in batches.
+
+    - Sends a JSON array with an invalid row and verifies the other rows are recorded.
+    - Sends the same sales as NDJSON and verifies the per-line results.
+    """
+    sales = [
+        {"customer_id": 9031, "item_id": 9401, "amount": 3.0},
+        {"customer_id": 9031, "item_id": 9401, "amount": "free"},
+        {"customer_id": 9032, "item_id": 9402, "amount": 7.5, "quantity": 3, "created_at": "2003-02-01T10:00:00Z"},
+    ]
+    response = client.post("api/sales/batch", json=sales, headers=HEADERS)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 1)
+    assert [result["row"] for result in body["results"]] == [1, 2, 3]
+    assert body["results"][1]["error"].startswith("amount:")
+    ids = [body["results"][0]["id"], body["results"][2]["id"]]
+
+    ndjson = "\n".join(json.dumps(sale) for sale in sales) + "\n\n"
+    response = client.post(
+        "api/sales/batch", content=ndjson, headers={**HEADERS, "Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 1)
+    ids += [body["results"][0]["id"], body["results"][2]["id"]]
+
+    db = SessionLocal()
+    recorded = db.query(Sale).filter(Sale.id.in_(ids)).order_by(Sale.id).all()
+    assert [(sale.item_id, sale.quantity) for sale in recorded] == [(9401, 1), (9402, 3), (9401, 1), (9402, 3)]
+    assert recorded[1].created_at == datetime(2003, 2, 1, 10)
+    db.close()
+
+    response = client.get("api/sales/rollups/item", params={"id": 9402}, headers=HEADERS)
+    assert response.json() == [{"key": "2003-02-01", "revenue": 15.0, "units": 6, "sales": 2}]
+
+    response = client.post("api/sales/batch", content="{\"not\": \"a list\"", headers=HEADERS)
+    assert response.json()["failed"] == 1
+
+    for sale_id in ids:
+        client.delete(f"api/sales/{sale_id}", headers=HEADERS)
+
+def test_purchase():
+    """
+    Test purchasing an item at its catalog price.
+
+    - Verifies that the stock, the wallet and the sale are updated together.
+    - Verifies that a failed purchase leaves the stock and the wallet unchanged.
+    """
+    db = SessionLocal()
+    db.query(Customer).filter(Customer.username == "buyer").delete()
+    customer = Customer(
+        full_name="Buyer", username="buyer", password="pw", age=30, address="1 Shop St",
+        gender="Female", marital_status="Single", wallet_balance=100.0,
+    )
+    item = Item(name="Purchasable", category="Test", price=30.0, description="", stock_count=5)
+    db.add_all([customer, item])
+    db.commit()
+    item_id = item.id
+
+    response = client.post("api/sales/purchase", json={"username": "buyer", "item_id": item_id, "quantity": 2}, headers=HEADERS)
+    assert response.status_code == 200
+    sale = response.json()["sale"]
+    assert sale["amount"] == 60.0
+    assert sale["quantity"] == 2
+    assert sale["customer_id"] == customer.id
+
+    response = client.post("api/sales/purchase", json={"username": "buyer", "item_id": item_id, "quantity": 2}, headers=HEADERS)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Insufficient funds"
+    response = client.post("api/sales/purchase", json={"username": "buyer", "item_id": item_id, "quantity": 9}, headers=HEADERS)
+    assert response.json()["detail"] == "Insufficient stock available"
+    response = client.post("api/sales/purchase", json={"username": "nobody", "item_id": item_id}, headers=HEADERS)
+    assert response.status_code == 404
+
+    db.expire_all()
+    assert db.get(Item, item_id).stock_count == 3
+    assert db.get(Customer, customer.id).wallet_balance == 40.0
+
+    client.delete(f"api/sales/{sale['id']}", headers=HEADERS)
+    db.delete(db.get(Item, item_id))
+    db.query(WalletLedgerEntry).filter(WalletLedgerEntry.customer_id == customer.id).delete()
+    db.delete(db.get(Customer, customer.id))
+    db.commit()
+    db.close()
+
+def test_sales_stats():
+    """
+    Test sales statistics grouped by item, customer and period.
+
+    - Records sales at known times and verifies the per-group totals.
+    - Verifies that the time range excludes sales outside of it.
+    """
+    db = SessionLocal()
+    sales = [
+        Sale(customer_id=9001, item_id=9101, amount=10.0, quantity=1, created_at=datetime(2001, 3, 5, 10)),
+        Sale(customer_id=9002, item_id=9101, amount=20.0, quantity=2, created_at=datetime(2001, 3, 11, 23)),
+        Sale(customer_id=9001, item_id=9102, amount=5.5, quantity=1, created_at=datetime(2001, 4, 2, 8)),
+        Sale(customer_id=9001, item_id=9102, amount=99.0, quantity=1, created_at=datetime(2002, 1, 1)),
+    ]
+    db.add_all(sales)
+    db.commit()
+    params = {"start": "2001-01-01T00:00:00", "end": "2002-01-01T00:00:00"}
+
+    response = client.get("api/sales/stats", params={**params, "group_by": "item"}, headers=HEADERS)
+    assert response.status_code == 200
+    assert response.json() == [
+        {"key": 9101, "revenue": 30.0, "units": 3, "sales": 2, "buyers": 2},
+        {"key": 9102, "revenue": 5.5, "units": 1, "sales": 1, "buyers": 1},
+    ]
+    response = client.get("api/sales/stats", params={**params, "group_by": "customer"}, headers=HEADERS)
+    assert [(row["key"], row["revenue"]) for row in response.json()] == [(9002, 20.0), (9001, 15.5)]
+    response = client.get("api/sales/stats", params={**params, "group_by": "day"}, headers=HEADERS)
+    assert [row["key"] for row in response.json()] == ["2001-03-05", "2001-03-11", "2001-04-02"]
+    response = client.get("api/sales/stats", params={**params, "group_by": "week"}, headers=HEADERS)
+    assert [(row["key"], row["sales"]) for row in response.json()] == [("2001-03-05", 2), ("2001-04-02", 1)]
+    response = client.get("api/sales/stats", params={**params, "group_by": "month"}, headers=HEADERS)
+    assert [(row["key"], row["revenue"]) for row in response.json()] == [("2001-03", 30.0), ("2001-04", 5.5)]
+
+    response = client.get("api/sales/stats", params={"group_by": "year"}, headers=HEADERS)
+    assert response.status_code == 400
+
+    for sale in sales:
+        db.delete(sale)
+    db.commit()
+    db.close()
+
+def test_sales_rollups():
+    """
+    Test the daily sales rollups.
+
+    - Creates, updates and deletes a sale and verifies the rollups follow.
+    - Verifies that a rebuild from the sales table gives the same totals.
+    """
+    sale_data = {"customer_id": 9011, "item_id": 9201, "amount": 12.5, "quantity": 2}
+    response = client.post("api/sales", json=sale_data, headers=HEADERS)
+    assert response.status_code == 200
+    sale_id = response.json()["sale"]["id"]
+    today = response.json()["sale"]["created_at"][:10]
+
+    response = client.get("api/sales/rollups/item", params={"id": 9201}, headers=HEADERS)
+    assert response.status_code == 200
+    assert response.json() == [{"key": today, "revenue": 12.5, "units": 2, "sales": 1}]
+
+    response = client.put(f"api/sales/{sale_id}", json={"amount": 20.0}, headers=HEADERS)
+    assert response.status_code == 200
+    response = client.get("api/sales/rollups/customer", params={"id": 9011}, headers=HEADERS)
+    assert response.json() == [{"key": today, "revenue": 20.0, "units": 2, "sales": 1}]
+
+    db = SessionLocal()
+    SalesService().rebuild_rollups(db)
+    db.close()
+    response = client.get("api/sales/rollups/item", params={"id": 9201}, headers=HEADERS)
+    assert response.json() == [{"key": today, "revenue": 20.0, "units": 2, "sales": 1}]
+
+    response = client.delete(f"api/sales/{sale_id}", headers=HEADERS)
+    assert response.status_code == 200
+    response = client.get("api/sales/rollups/item", params={"id": 9201}, headers=HEADERS)
+    assert response.json() == []
+
+    response = client.get("api/sales/rollups/region", headers=HEADERS)
+    assert response.status_code == 400
+
+def test_top_items():
+    """
+    Test the best-selling items leaderboard.
+
+    - Records sales and verifies the ranking by units and by revenue.
+    - Verifies that updated and deleted sales are reflected in the ranking.
+    """
+    sales = [
+        {"customer_id": 9041, "item_id": 9501, "amount": 1000.0, "quantity": 500},
+        {"customer_id": 9041, "item_id": 9502, "amount": 5000.0, "quantity": 400},
+    ]
+    ids = [client.post("api/sales", json=sale, headers=HEADERS).json()["sale"]["id"] for sale in sales]
+
+    def top(**params):
+        response = client.get("api/sales/top-items", params={"limit": 2, **params}, headers=HEADERS)
+        assert response.status_code == 200
+        return [(row["item_id"], row["units"]) for row in response.json()]
+
+    assert top(window="24h") == [(9501, 500), (9502, 400)]
+    assert top(window="30d", by="revenue") == [(9502, 400), (9501, 500)]
+
+    client.put(f"api/sales/{ids[0]}", json={"quantity": 300}, headers=HEADERS)
+    assert top(window="7d") == [(9502, 400), (9501, 300)]
+    client.delete(f"api/sales/{ids[1]}", headers=HEADERS)
+    assert (9502, 400) not in top(window="7d")
+
+    response = client.get("api/sales/top-items", params={"window": "1y"}, headers=HEADERS)
+    assert response.status_code == 400
+
+    client.delete(f"api/sales/{ids[0]}", headers=HEADERS)
+
+def test_customer_history():
+    """
+    Test the cursor-paginated purchase history.
+
+    - Records sales of a known item and verifies each page carries the item details.
+    - Follows the `X-Next-Cursor` header until the last page, newest sale first.
+    """
+    db = SessionLocal()
+    item = Item(name="History Lamp", category="Lighting", price=12.5, description="", stock_count=1)
+    db.add(item)
+    db.commit()
+    sales = [
+        Sale(customer_id=9051, item_id=item.id, amount=12.5, quantity=1, created_at=datetime(2004, 1, day))
+        for day in (1, 2, 2, 3)
+    ]
+    db.add_all(sales)
+    db.commit()
+    expected = [sales[3].id, max(sales[1].id, sales[2].id), min(sales[1].id, sales[2].id), sales[0].id]
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = client.get("api/sales/customer/9051/history", params=params, headers=HEADERS)
+        assert response.status_code == 200
+        for sale in response.json():
+            assert (sale["item_name"], sale["item_category"], sale["item_price"]) == ("History Lamp", "Lighting", 12.5)
+            seen.append(sale["id"])
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == expected
+
+    response = client.get("api/sales/customer/9051/history", params={"cursor": "bogus"}, headers=HEADERS)
+    assert response.status_code == 400
+
+    for sale in sales:
+        db.delete(sale)
+    db.delete(item)
+    db.commit()
+    db.close()
+
+def test_archived_sales(tmp_path):
+    """
+    Test archiving a closed month of sales.
+
+    - Archives a month and verifies its sales left the sales table for a read-only file.
+    - Verifies item and customer lookups, the purchase history and the export
+      still return them, and that a time range outside the month does not read the archive.
+    - Verifies statistics over the month, with or without a range, include it,
+      and that a relative archive directory is rejected.
+    """
+    db = SessionLocal()
+    sales = [
+        Sale(customer_id=9061, item_id=9701, amount=2.0, quantity=1, created_at=datetime(1999, 3, day))
+        for day in (1, 15, 31)
+    ]
+    sales.append(Sale(customer_id=9061, item_id=9701, amount=4.0, quantity=2, created_at=datetime(1999, 4, 1)))
+    db.add_all(sales)
+    db.commit()
+    ids = [sale.id for sale in sales]
+
+    service = SalesService()
+    with pytest.raises(ValueError):
+        service.archive_month(db, datetime(1999, 3, 9).date(), "archive")
+    partition = service.archive_month(db, datetime(1999, 3, 9).date(), str(tmp_path))
+    assert (partition.month, partition.row_count) == ("1999-03", 3)
+    assert not os.access(partition.path, os.W_OK) or os.geteuid() == 0
+    assert db.query(Sale).filter(Sale.id.in_(ids)).count() == 1
+
+    response = client.get("api/sales/item/9701", headers=HEADERS)
+    assert [sale["id"] for sale in response.json()] == ids
+    response = client.get("api/sales/customer/9061", params={"start": "1999-03-15T00:00:00"}, headers=HEADERS)
+    assert [sale["id"] for sale in response.json()] == ids[1:]
+
+    response = client.get("api/sales/customer/9061/history", params={"limit": 2}, headers=HEADERS)
+    assert [sale["id"] for sale in response.json()] == [ids[3], ids[2]]
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get("api/sales/customer/9061/history", params={"limit": 2, "cursor": cursor}, headers=HEADERS)
+    assert [sale["id"] for sale in response.json()] == [ids[1], ids[0]]
+    assert response.json()[0]["created_at"].startswith("1999-03-15")
+    assert "X-Next-Cursor" not in response.headers
+
+    params = {"format": "npz", "start": "1999-03-10T00:00:00", "end": "1999-05-01T00:00:00"}
+    response = client.get("api/sales/export", params=params, headers=HEADERS)
+    assert response.status_code == 200
+    assert np.load(io.BytesIO(response.content))["id"].tolist() == ids[1:]
+
+    params = {"group_by": "item", "start": "1999-01-01T00:00:00", "end": "1999-05-01T00:00:00"}
+    response = client.get("api/sales/stats", params=params, headers=HEADERS)
+    assert response.json() == [{"key": 9701, "revenue": 10.0, "units": 5, "sales": 4, "buyers": 1}]
+    response = client.get("api/sales/stats", params=dict(params, group_by="month"), headers=HEADERS)
+    assert [(group["key"], group["sales"], group["buyers"]) for group in response.json()] == [
+        ("1999-03", 3, 1),
+        ("1999-04", 1, 1),
+    ]
+    response = client.get("api/sales/stats", params={"group_by": "customer", "end": params["end"]}, headers=HEADERS)
+    assert {"key": 9061, "revenue": 10.0, "units": 5, "sales": 4, "buyers": 1} in response.json()
+
+    os.chmod(partition.path, 0o600)
+    os.remove(partition.path)
+    response = client.get("api/sales/item/9701", params={"start": "1999-04-01T00:00:00"}, headers=HEADERS)
+    assert [sale["id"] for sale in response.json()] == ids[3:]
+    response = client.get("api/sales/item/9701", headers=HEADERS)
+    assert response.status_code == 500
+
+    db.query(SalesPartition).filter(SalesPartition.month == "1999-03").delete()
+    db.delete(sales[3])
+    db.commit()
+    db.close()
+
+def test_export_sales():
+    """
+    Test exporting sales to a NumPy archive.
+
+    - Records sales at known times and exports a time range containing some of them.
+    - Verifies the exported columns, that an offset bound is converted to UTC,
+      and that an unknown format is rejected.
+    """
+    db = SessionLocal()
+    sales = [
+        Sale(customer_id=9021, item_id=9301, amount=4.0, quantity=1, created_at=datetime(2000, 6, 1, 12)),
+        Sale(customer_id=9022, item_id=9302, amount=8.5, quantity=2, created_at=datetime(2000, 6, 2, 12)),
+        Sale(customer_id=9023, item_id=9303, amount=1.0, quantity=1, created_at=datetime(2000, 7, 1)),
+    ]
+    db.add_all(sales)
+    db.commit()
+
+    params = {"format": "npz", "start": "2000-06-01T00:00:00", "end": "2000-07-01T00:00:00"}
+    response = client.get("api/sales/export", params=params, headers=HEADERS)
+    assert response.status_code == 200
+    assert response.headers["X-Row-Count"] == "2"
+    arrays = np.load(io.BytesIO(response.content))
+    assert arrays["id"].tolist() == [sales[0].id, sales[1].id]
+    assert arrays["customer_id"].tolist() == [9021, 9022]
+    assert arrays["amount"].tolist() == [4.0, 8.5]
+    assert str(arrays["created_at"][1]) == "2000-06-02T12:00:00.000000"
+
+    # An offset bound is converted to UTC, and may be mixed with a naive one.
+    params = dict(params, start="2000-06-02T15:00:00+05:00")
+    response = client.get("api/sales/export", params=params, headers=HEADERS)
+    assert np.load(io.BytesIO(response.content))["id"].tolist() == [sales[1].id]
+
+    response = client.get("api/sales/export", params={"format": "csv"}, headers=HEADERS)
+    assert response.status_code == 400
+
+    for sale in sales:
+        db.delete(sale)
+    db.commit()
+    db.close()
+
 def test_get_sales_by_customer():
     """
     Test retrieving sales for a specific customer.